@@ -0,0 +1,41 @@
+"""add cloud scene results
+
+Revision ID: 3c9e41d7a2b8
+Revises: 725a9a5f4fd3
+Create Date: 2026-10-17 12:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e41d7a2b8'
+down_revision: Union[str, None] = '725a9a5f4fd3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('cloud_scene_results',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cell_row', sa.Integer(), nullable=False),
+    sa.Column('cell_col', sa.Integer(), nullable=False),
+    sa.Column('radius_bucket', sa.Integer(), nullable=False),
+    sa.Column('aoi_geometry', sa.Boolean(), nullable=False),
+    sa.Column('grid_side', sa.Integer(), nullable=False),
+    sa.Column('acquisition_date', sa.Date(), nullable=False),
+    sa.Column('cloud_fraction', sa.Float(), nullable=True),
+    sa.Column('valid_ratio', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cell_row', 'cell_col', 'radius_bucket', 'aoi_geometry', 'grid_side', 'acquisition_date', name='uq_cloud_scene_results_site_date')
+    )
+    op.create_index(op.f('ix_cloud_scene_results_id'), 'cloud_scene_results', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_cloud_scene_results_id'), table_name='cloud_scene_results')
+    op.drop_table('cloud_scene_results')
@@ -0,0 +1,63 @@
+"""add analyses geohash
+
+Revision ID: 8f2d6b0e5c71
+Revises: 3c9e41d7a2b8
+Create Date: 2026-10-17 13:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core import geohash
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2d6b0e5c71'
+down_revision: Union[str, None] = '3c9e41d7a2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 5000
+
+
+def upgrade() -> None:
+    op.add_column('analyses', sa.Column('geohash', sa.String(length=12), nullable=True))
+
+    # backfill existing rows in id order, one batch at a time
+    bind = op.get_bind()
+    analyses = sa.table(
+        'analyses',
+        sa.column('id', sa.Integer),
+        sa.column('latitude', sa.Float),
+        sa.column('longitude', sa.Float),
+        sa.column('geohash', sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(analyses.c.id, analyses.c.latitude, analyses.c.longitude)
+            .where(analyses.c.id > last_id)
+            .order_by(analyses.c.id)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            analyses.update()
+            .where(analyses.c.id == sa.bindparam('_id'))
+            .values(geohash=sa.bindparam('_geohash')),
+            [{'_id': r.id, '_geohash': geohash.encode(r.latitude, r.longitude)} for r in rows],
+        )
+        last_id = rows[-1].id
+
+    op.create_index(
+        'ix_analyses_geohash', 'analyses', ['geohash'], unique=False,
+        postgresql_ops={'geohash': 'varchar_pattern_ops'},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analyses_geohash', table_name='analyses')
+    op.drop_column('analyses', 'geohash')
@@ -0,0 +1,26 @@
+"""add analyses created_at id index
+
+Revision ID: b41a7e9c0d23
+Revises: 8f2d6b0e5c71
+Create Date: 2026-10-17 14:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41a7e9c0d23'
+down_revision: Union[str, None] = '8f2d6b0e5c71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_analyses_created_at_id', 'analyses', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analyses_created_at_id', table_name='analyses')
@@ -1,8 +1,10 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import analyses
+from app.api.v1.endpoints import analyses, metrics, site_score
 
 api_router = APIRouter()
 
 # Include all endpoint routers
 api_router.include_router(analyses.router, prefix="/analyses", tags=["analyses"])
+api_router.include_router(site_score.router, tags=["site-score"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
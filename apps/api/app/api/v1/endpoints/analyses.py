@@ -1,20 +1,41 @@
-from typing import List
+import base64
+import json
+import math
+from datetime import datetime
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, case, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core import geohash
+from app.core.config import settings
+from app.core.database import get_async_db
 from app.models.analysis import Analysis
-from app.schemas.analysis import AnalysisCreate, AnalysisResponse, AnalysisUpdate, CloudinessTestRequest, CloudinessStats
-from app.services.cloud_service import compute_cloudiness_for_circle
+from app.schemas.analysis import (
+    AnalysisBulkCreateRequest,
+    AnalysisBulkResponse,
+    AnalysisBulkUpdateRequest,
+    AnalysisCreate,
+    AnalysisListItem,
+    AnalysisNearbyResponse,
+    AnalysisPage,
+    AnalysisResponse,
+    AnalysisUpdate,
+    CloudinessStats,
+    CloudinessTestRequest,
+)
+from app.services.analysis_bulk import bulk_create, bulk_update
+from app.services.cloud_service import compute_cloudiness_for_circle_async
+from app.services.geometry import circle_to_bbox, haversine_m
 
 router = APIRouter()
 
 
 @router.post("/", response_model=AnalysisResponse, status_code=201)
-def create_analysis(
+async def create_analysis(
     analysis_data: AnalysisCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Create a new solar panel suitability analysis.
@@ -22,55 +43,244 @@ def create_analysis(
     This endpoint initiates an analysis for a specific location.
     The actual analysis computation can be done asynchronously.
     """
-    analysis = Analysis(**analysis_data.model_dump())
+    analysis = Analysis(
+        **analysis_data.model_dump(),
+        geohash=geohash.encode(analysis_data.latitude, analysis_data.longitude),
+    )
     db.add(analysis)
-    db.commit()
-    db.refresh(analysis)
+    await db.commit()
+    await db.refresh(analysis)
     return analysis
 
 
+def _check_bulk_size(n_items: int) -> None:
+    if n_items > settings.ANALYSIS_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.ANALYSIS_BULK_MAX_ITEMS} items per request",
+        )
+
+
+@router.post("/bulk", response_model=AnalysisBulkResponse)
+async def create_analyses_bulk(
+    body: AnalysisBulkCreateRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Create many analyses in one request.
+
+    Rows are inserted in chunks, one multi-row INSERT ... RETURNING and one
+    transaction per chunk. `results` gives the new id (or the error) of every
+    item, in request order; a failed chunk does not roll back the others.
+    """
+    _check_bulk_size(len(body.items))
+    return AnalysisBulkResponse(results=await bulk_create(db, body.items))
+
+
+@router.patch("/bulk", response_model=AnalysisBulkResponse)
+async def update_analyses_bulk(
+    body: AnalysisBulkUpdateRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Update many analyses in one request.
+
+    Each item carries an `id` and the fields to change. Updates run as
+    executemany UPDATEs by primary key, in chunked transactions; unknown ids
+    are reported as `not_found`.
+    """
+    _check_bulk_size(len(body.items))
+    return AnalysisBulkResponse(results=await bulk_update(db, body.items))
+
+
+# Always selected: the keyset pagination key
+_KEY_FIELDS = ("id", "created_at")
+_LIST_FIELDS = tuple(AnalysisListItem.model_fields)
+# Default projection: everything but the potentially large extra_data
+_DEFAULT_FIELDS = tuple(f for f in _LIST_FIELDS if f != "extra_data")
+
+
+def _encode_cursor(created_at: datetime, analysis_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), analysis_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, analysis_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/", response_model=List[AnalysisResponse])
-def list_analyses(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+async def list_analyses(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Retrieve a list of all analyses.
+    Retrieve a list of all analyses, by id.
+
+    Offset pagination: deep offsets scan every skipped row, so large tables
+    are better walked with `GET /page`.
 
     - **skip**: Number of records to skip (pagination)
     - **limit**: Maximum number of records to return
     """
-    analyses = db.query(Analysis).offset(skip).limit(limit).all()
-    return analyses
+    query = select(Analysis).order_by(Analysis.id).offset(skip).limit(limit)
+    return (await db.execute(query)).scalars().all()
+
+
+@router.get("/page", response_model=AnalysisPage, response_model_exclude_unset=True)
+async def list_analyses_page(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Retrieve analyses, newest first, one page at a time.
+
+    Returns `{"items": [...], "next_cursor": "..."}`; `next_cursor` is null on
+    the last page.
+
+    - **limit**: Maximum number of records to return
+    - **cursor**: `next_cursor` of the previous page
+    - **fields**: Comma-separated fields to return (`id` and `created_at` are
+      always included); by default all but `extra_data`
+    """
+    if fields is None:
+        selected = list(_DEFAULT_FIELDS)
+    else:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = sorted(set(requested) - set(_LIST_FIELDS))
+        if unknown:
+            raise HTTPException(
+                status_code=422, detail=f"Unknown fields: {', '.join(unknown)}"
+            )
+        selected = list(_KEY_FIELDS) + [f for f in requested if f not in _KEY_FIELDS]
+
+    # keyset pagination on (created_at, id): a row comparison against the
+    # last row seen, served by ix_analyses_created_at_id however deep the page
+    query = select(*(getattr(Analysis, f) for f in selected))
+    if cursor is not None:
+        created_at, analysis_id = _decode_cursor(cursor)
+        query = query.where(
+            tuple_(Analysis.created_at, Analysis.id) < (created_at, analysis_id)
+        )
+    query = query.order_by(Analysis.created_at.desc(), Analysis.id.desc())
+    query = query.limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    items = [AnalysisListItem(**row._asdict()) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = _encode_cursor(last.created_at, last.id)
+    return AnalysisPage(items=items, next_cursor=next_cursor)
+
+
+def _bbox_filter(lat: float, lon: float, radius_m: float):
+    """Latitude/longitude range predicate for the circle's bounding box."""
+    min_lon, min_lat, max_lon, max_lat = circle_to_bbox(lat, lon, radius_m)
+    in_lat = Analysis.latitude.between(min_lat, max_lat)
+    if max_lon - min_lon >= 360.0:
+        # the box spans every meridian (next to the poles)
+        return in_lat
+    if min_lon < -180.0:
+        in_lon = or_(
+            Analysis.longitude >= min_lon + 360.0, Analysis.longitude <= max_lon
+        )
+    elif max_lon > 180.0:
+        in_lon = or_(
+            Analysis.longitude >= min_lon, Analysis.longitude <= max_lon - 360.0
+        )
+    else:
+        in_lon = Analysis.longitude.between(min_lon, max_lon)
+    return and_(in_lat, in_lon)
+
+
+def _approx_distance(lat: float, lon: float):
+    """Squared equirectangular distance in degrees; orders like the true distance."""
+    d_lat = Analysis.latitude - lat
+    d_lon = Analysis.longitude - lon
+    d_lon = case(
+        (d_lon > 180.0, d_lon - 360.0), (d_lon < -180.0, d_lon + 360.0), else_=d_lon
+    )
+    k = math.cos(math.radians(lat))
+    return d_lat * d_lat + (d_lon * k) * (d_lon * k)
+
+
+@router.get(
+    "/nearby",
+    response_model=List[AnalysisNearbyResponse],
+    response_model_exclude_unset=True,
+)
+async def list_nearby_analyses(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(1000.0, gt=0, le=100_000),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Retrieve analyses within `radius_m` of a point, nearest first.
+
+    Candidates come from geohash prefix matches on the cell holding the point
+    and its 8 neighbours (an index range scan each), narrowed to the circle's
+    bounding box, ordered by approximate distance and limited in SQL, then
+    filtered by exact distance. Fields are those of the list endpoint's
+    default projection (no `extra_data`).
+    """
+    query = select(*(getattr(Analysis, f) for f in _DEFAULT_FIELDS)).where(
+        _bbox_filter(lat, lon, radius_m)
+    )
+    cells = geohash.covering_cells(lat, lon, radius_m)
+    if cells:
+        query = query.where(or_(*(Analysis.geohash.like(f"{cell}%") for cell in cells)))
+    # else: no geohash cell is wide enough this close to a pole; the latitude
+    # band of the bounding box is the only prefilter
+    query = query.order_by(_approx_distance(lat, lon)).limit(limit)
+
+    nearby = []
+    for row in (await db.execute(query)).all():
+        distance_m = haversine_m(lat, lon, row.latitude, row.longitude)
+        if distance_m <= radius_m:
+            nearby.append(
+                AnalysisNearbyResponse(**row._asdict(), distance_m=distance_m)
+            )
+    nearby.sort(key=lambda item: item.distance_m)
+    return nearby
 
 
 @router.get("/{analysis_id}", response_model=AnalysisResponse)
-def get_analysis(
+async def get_analysis(
     analysis_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Retrieve a specific analysis by ID.
     """
-    analysis = db.query(Analysis).filter(Analysis.id == analysis_id).first()
+    analysis = await db.get(Analysis, analysis_id)
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
     return analysis
 
 
 @router.patch("/{analysis_id}", response_model=AnalysisResponse)
-def update_analysis(
+async def update_analysis(
     analysis_id: int,
     analysis_update: AnalysisUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update an existing analysis with computed results.
 
     This endpoint is typically called after the analysis computation is complete.
     """
-    analysis = db.query(Analysis).filter(Analysis.id == analysis_id).first()
+    analysis = await db.get(Analysis, analysis_id)
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
 
@@ -79,33 +289,34 @@ def update_analysis(
     for field, value in update_data.items():
         setattr(analysis, field, value)
 
-    db.commit()
-    db.refresh(analysis)
+    await db.commit()
+    await db.refresh(analysis)
     return analysis
 
 
 @router.delete("/{analysis_id}", status_code=204)
-def delete_analysis(
+async def delete_analysis(
     analysis_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Delete a specific analysis.
     """
-    analysis = db.query(Analysis).filter(Analysis.id == analysis_id).first()
+    analysis = await db.get(Analysis, analysis_id)
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
 
-    db.delete(analysis)
-    db.commit()
+    await db.delete(analysis)
+    await db.commit()
     return None
 
 @router.post("/cloudiness-test", response_model=CloudinessStats)
-def cloudiness_test(body: CloudinessTestRequest) -> CloudinessStats:
-    return compute_cloudiness_for_circle(
+async def cloudiness_test(body: CloudinessTestRequest) -> CloudinessStats:
+    return await compute_cloudiness_for_circle_async(
         center_lat=body.center_lat,
         center_lon=body.center_lon,
         radius_m=body.radius_m,
         start_date=body.start_date,
         end_date=body.end_date,
+        tolerance=body.tolerance,
     )
@@ -0,0 +1,36 @@
+from typing import Any, Dict, Union
+
+from fastapi import APIRouter
+
+from app.core.database import pool_status
+from app.services.catalogue_cache import catalogue_cache
+from app.services.raster_cache import raster_cache
+
+router = APIRouter()
+
+
+@router.get("/db-pool")
+async def db_pool_metrics() -> Dict[str, Union[int, float]]:
+    """
+    Async database pool occupancy and connection checkout wait times
+    (per worker process), for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW.
+    """
+    return pool_status()
+
+
+@router.get("/raster-cache")
+async def raster_cache_metrics() -> Dict[str, Any]:
+    """
+    Process API raster cache hits, misses, evictions and disk usage
+    (counters are per worker process), for sizing RASTER_CACHE_MAX_BYTES.
+    """
+    return raster_cache.stats()
+
+
+@router.get("/catalogue-cache")
+async def catalogue_cache_metrics() -> Dict[str, Any]:
+    """
+    Catalogue search cache hits, misses and entries (per worker process),
+    for sizing CDS_CATALOG_CACHE_MAX_ENTRIES.
+    """
+    return catalogue_cache.stats()
@@ -1,9 +1,90 @@
-from fastapi import APIRouter
-from app.schemas.site_score import SiteScoreRequest, SiteScoreResponse
-from app.services.scoring_service import compute_site_score
+from typing import Iterator
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+from app.core.config import settings
+from app.schemas.site_score import (
+    HeatmapRequest,
+    SiteScoreBatchItem,
+    SiteScoreBatchRequest,
+    SiteScoreRequest,
+    SiteScoreResponse,
+)
+from app.services.heatmap_service import compute_heatmap, encode_npy, encode_png
+from app.services.scoring_service import compute_site_score, score_sites
 
 router = APIRouter()
 
 @router.post("/site-score", response_model=SiteScoreResponse)
 def get_site_score(request: SiteScoreRequest) -> SiteScoreResponse:
     return compute_site_score(request)
+
+
+@router.post("/site-score/batch")
+def get_site_scores_batch(request: SiteScoreBatchRequest) -> StreamingResponse:
+    """
+    Scores many locations over one time range.
+
+    Streams newline-delimited JSON, one SiteScoreBatchItem per location, in
+    completion order (use `index` to match requests). Failed sites carry
+    `error` instead of `result`.
+    """
+    if len(request.locations) > settings.SITE_BATCH_MAX_SITES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.SITE_BATCH_MAX_SITES} locations per batch",
+        )
+
+    def lines() -> Iterator[str]:
+        for index, result in score_sites(request.locations, request.time_range):
+            item = SiteScoreBatchItem(index=index, location=request.locations[index])
+            if isinstance(result, Exception):
+                item.error = f"{type(result).__name__}: {result}"
+            else:
+                item.result = result
+            yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/site-score/heatmap",
+    response_class=Response,
+    responses={200: {"content": {"image/png": {}, "application/octet-stream": {}}}},
+)
+def get_site_score_heatmap(request: HeatmapRequest) -> Response:
+    """
+    Suitability raster over a bbox, one value per `cell_size_m` cell.
+
+    Returns a PNG or a .npy array (see HeatmapRequest.format); rows run
+    north → south. Grid size, failed layers and layers with missing cells
+    come back in X-Heatmap-* headers.
+    """
+    try:
+        heatmap = compute_heatmap(
+            bbox=request.bbox,
+            cell_size_m=request.cell_size_m,
+            start_date=request.time_range.start_date,
+            end_date=request.time_range.end_date,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+    height, width = heatmap.score.shape
+    headers = {
+        "X-Heatmap-Width": str(width),
+        "X-Heatmap-Height": str(height),
+        "X-Heatmap-Bbox": ",".join(f"{v:.7f}" for v in heatmap.bbox),
+        "X-Heatmap-Degraded": ",".join(heatmap.degraded),
+        "X-Heatmap-Partial": ",".join(heatmap.partial),
+    }
+    if request.format == "npy":
+        return Response(
+            encode_npy(heatmap.score),
+            media_type="application/octet-stream",
+            headers=headers,
+        )
+    return Response(encode_png(heatmap.score), media_type="image/png", headers=headers)
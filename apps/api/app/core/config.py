@@ -19,11 +19,34 @@ class Settings(BaseSettings):
     # CORS
     ALLOWED_ORIGINS: list[str] = ["http://localhost:5173", "http://frontend:5173"]
 
+    # Async pool serving the API routes (per worker): persistent connections,
+    # extra connections under load, seconds to wait for one, max connection
+    # age, liveness check on checkout (costs a round trip), and asyncpg's
+    # prepared statement cache per connection
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_S: float = 30.0
+    DB_POOL_RECYCLE_S: int = 1800
+    DB_POOL_PRE_PING: bool = False
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Sync pool (per worker), only for background services in worker threads
+    # (e.g. the cloud result store); always pre-pings
+    DB_SYNC_POOL_SIZE: int = 2
+    DB_SYNC_MAX_OVERFLOW: int = 3
+
     @property
     def DATABASE_URL(self) -> str:
         """Construct database URL"""
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """Database URL for the asyncpg driver"""
+        return (
+            f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+            f"?prepared_statement_cache_size={self.DB_STATEMENT_CACHE_SIZE}"
+        )
+
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
@@ -42,6 +65,127 @@ class Settings(BaseSettings):
     )
     CDS_PROCESS_URL: str = "https://sh.dataspace.copernicus.eu/api/v1/process"
 
+    # OAuth tokens: refresh this long before expiry; optional file to keep
+    # tokens across restarts (contains credentials, keep it private)
+    CDS_TOKEN_REFRESH_MARGIN_S: float = 60.0
+    CDS_TOKEN_CACHE_PATH: str | None = None
+
+    # HTTP transport to CDSE: connection pool, retries and per-endpoint timeouts
+    CDS_HTTP_POOL_SIZE: int = 16
+    CDS_HTTP_MAX_RETRIES: int = 4
+    CDS_HTTP_BACKOFF_BASE_S: float = 0.5
+    CDS_HTTP_BACKOFF_MAX_S: float = 30.0
+    CDS_CONNECT_TIMEOUT_S: float = 5.0
+    CDS_TOKEN_TIMEOUT_S: float = 15.0
+    CDS_CATALOG_TIMEOUT_S: float = 30.0
+    CDS_PROCESS_TIMEOUT_S: float = 120.0
+
+    # Catalogue search: page size, and the per-AOI month-bucket cache
+    CDS_CATALOG_PAGE_SIZE: int = 1000
+    CDS_CATALOG_CACHE_MAX_ENTRIES: int = 10000
+    CDS_CATALOG_RECENT_TTL_S: float = 3600.0
+    CDS_CATALOG_SETTLE_DAYS: int = 7
+
+    # Max number of Process API requests in flight per process (the sync and
+    # async clients each get this many), and per cloudiness computation
+    CDS_PROCESS_MAX_WORKERS: int = 8
+    # Fetch many dates per Process API request (ORBIT mosaicking, 2 bands per date)
+    CDS_MULTI_TEMPORAL: bool = True
+    CDS_MULTI_TEMPORAL_MAX_DATES: int = 30
+    # Output grid: native SCL pixel size, bounds on the grid side, and the
+    # largest side of a single request (bigger grids are split into tiles)
+    SCL_RESOLUTION_M: float = 20.0
+    CDS_MIN_PIXELS_PER_SIDE: int = 16
+    CDS_MAX_GRID_SIDE: int = 4096
+    CDS_MAX_PIXELS_PER_SIDE: int = 512
+    # Progressive cloudiness (tolerance set): coarse grid = full grid / factor,
+    # dates evaluated per round, minimum valid scenes before stopping,
+    # extremes refined at full resolution, z-score of the confidence interval
+    CLOUD_PROGRESSIVE_COARSE_FACTOR: int = 4
+    CLOUD_PROGRESSIVE_ROUND_SIZE: int = 8
+    CLOUD_PROGRESSIVE_MIN_SCENES: int = 6
+    CLOUD_PROGRESSIVE_REFINE: int = 2
+    CLOUD_CONFIDENCE_Z: float = 1.96
+    # Send the circular AOI polygon (not only its bbox) to the Process API
+    CDS_SEND_AOI_GEOMETRY: bool = True
+    # Per-scene cloud fractions kept in the database (cloud_scene_results),
+    # keyed by a cell of the AOI centre and the radius rounded to a step
+    # (default: one SCL pixel), the AOI mode and the output grid size
+    CLOUD_STORE_ENABLED: bool = True
+    CLOUD_STORE_CELL_M: float = 20.0
+    CLOUD_STORE_RADIUS_STEP_M: float = 20.0
+
+    # Site score: feature weights, and the cloud scorer's progressive tolerance
+    W_CLOUD: float = 0.4
+    W_ELEVATION: float = 0.2
+    W_ROAD: float = 0.2
+    W_GRID: float = 0.2
+    CLOUD_SCORE_TOLERANCE: float | None = 0.03
+    # Feature scorers run concurrently; each gets its own time budget (seconds,
+    # keyed by response field, counted from when it starts running), falling
+    # back to SCORER_TIMEOUT_S. SCORER_MAX_WORKERS sizes the pool of
+    # interactive /site-score requests; batches get their own pool
+    SCORER_MAX_WORKERS: int = 16
+    SCORER_TIMEOUT_S: float = 30.0
+    SCORER_TIMEOUTS_S: dict[str, float] = {"cloud": 120.0}
+    # Batch site scoring: max sites per request, sites scored concurrently,
+    # and the grid cell size used to group nearby sites
+    SITE_BATCH_MAX_SITES: int = 50000
+    SITE_BATCH_MAX_WORKERS: int = 4
+    SITE_BATCH_GROUP_CELL_M: float = 10000.0
+    # Bulk analysis create / update: max items per request, rows per transaction
+    ANALYSIS_BULK_MAX_ITEMS: int = 50000
+    ANALYSIS_BULK_CHUNK_SIZE: int = 1000
+    # Heatmap: largest grid side in cells
+    HEATMAP_MAX_SIDE: int = 2048
+
+    # Local DEM: directory of .hgt / GeoTIFF tiles, block size of the
+    # windowed reads, and the in-memory budget for decoded blocks
+    DEM_DIR: str = "data/dem"
+    DEM_BLOCK_SIZE: int = 256
+    DEM_CACHE_MAX_BYTES: int = 256 * 1024**2
+    # Precomputed slope/aspect pyramids (python -m app.services.dem_pyramid build);
+    # queries use the coarsest level that still gives this many pixels
+    # across the AOI disk / a heatmap cell
+    DEM_PYRAMID_DIR: str = "data/dem_pyramid"
+    DEM_PYRAMID_MIN_DISK_ROWS: int = 32
+    DEM_PYRAMID_MIN_CELL_PIXELS: int = 4
+
+    # Road / power infrastructure from a local OSM extract (.gpkg or .pbf).
+    # For GeoPackages: layer -> SQL WHERE selecting the features (defaults
+    # match an ogr2ogr export of a .pbf); for .pbf: highway classes to keep
+    INFRA_DATA_PATH: str | None = None
+    INFRA_ROAD_LAYERS: dict[str, str] = {
+        "lines": "highway IS NOT NULL AND highway NOT IN "
+        "('footway', 'path', 'steps', 'cycleway', 'bridleway', 'pedestrian', "
+        "'corridor', 'proposed', 'construction')",
+    }
+    INFRA_GRID_LAYERS: dict[str, str] = {
+        "lines": "other_tags LIKE '%\"power\"=>\"line\"%' "
+        "OR other_tags LIKE '%\"power\"=>\"minor_line\"%' "
+        "OR other_tags LIKE '%\"power\"=>\"cable\"%'",
+        "points": "other_tags LIKE '%\"power\"=>\"substation\"%'",
+        "multipolygons": "other_tags LIKE '%\"power\"=>\"substation\"%'",
+    }
+    INFRA_ROAD_CLASSES: list[str] = [
+        "motorway", "trunk", "primary", "secondary", "tertiary", "unclassified",
+        "residential", "service", "track", "motorway_link", "trunk_link",
+        "primary_link", "secondary_link", "tertiary_link",
+    ]
+    # Nearest-distance searches stop here (beyond it access scores 0 anyway)
+    INFRA_MAX_SEARCH_M: float = 20000.0
+    # Prebuilt flat indexes (python -m app.services.infra_store build);
+    # workers memory-map these instead of building STRtrees at start-up
+    INFRA_STORE_DIR: str = "data/infra_index"
+    INFRA_STORE_CELL_M: float = 2000.0
+    # Working memory budget of one candidate pass of a flat-index query
+    INFRA_QUERY_MAX_BYTES: int = 64 * 1024**2
+
+    # On-disk cache of decoded Process API rasters
+    RASTER_CACHE_ENABLED: bool = True
+    RASTER_CACHE_DIR: str = ".cache/rasters"
+    RASTER_CACHE_MAX_BYTES: int = 2 * 1024**3
+
     model_config = SettingsConfigDict(
         env_file=".env",
         case_sensitive=True,
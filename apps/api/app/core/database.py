@@ -1,26 +1,127 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Union
+
+import numpy as np
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
-# Create SQLAlchemy engine
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+# Create SQLAlchemy engine (sync: services running in worker threads). Kept
+# small, since request traffic goes through async_engine; each worker holds
+# at most DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW of these connections
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_size=settings.DB_SYNC_POOL_SIZE,
+    max_overflow=settings.DB_SYNC_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_S,
+    pool_recycle=settings.DB_POOL_RECYCLE_S,
+    pool_pre_ping=True,
+)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine (asyncpg) for the API routes
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_S,
+    pool_recycle=settings.DB_POOL_RECYCLE_S,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
+
+# expire_on_commit=False: attributes can be read after commit without
+# another (implicit, and in async code impossible) load
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 # Create Base class for models
 Base = declarative_base()
 
 
+class PoolWaitStats:
+    """
+    Time requests spend waiting for a pooled connection (including opening a
+    new one), over the last `window` checkouts. Used to size the pool.
+    """
+
+    def __init__(self, window: int = 4096) -> None:
+        self._lock = threading.Lock()
+        self._recent: deque = deque(maxlen=window)
+        self._count = 0
+        self._total_s = 0.0
+        self._max_s = 0.0
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._recent.append(seconds)
+            self._count += 1
+            self._total_s += seconds
+            self._max_s = max(self._max_s, seconds)
+
+    def snapshot(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            recent = np.array(self._recent, dtype=np.float64) * 1000.0
+            count, total_s, max_s = self._count, self._total_s, self._max_s
+
+        p50, p95, p99 = (
+            np.percentile(recent, [50, 95, 99]) if recent.size else (0.0, 0.0, 0.0)
+        )
+        return {
+            "checkouts": count,
+            "mean_wait_ms": total_s * 1000.0 / count if count else 0.0,
+            "max_wait_ms": max_s * 1000.0,
+            "p50_wait_ms": float(p50),
+            "p95_wait_ms": float(p95),
+            "p99_wait_ms": float(p99),
+        }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+def pool_status() -> Dict[str, Union[int, float]]:
+    """Async pool occupancy plus checkout wait times."""
+    pool = async_engine.sync_engine.pool
+    status = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+    # QueuePool-style counters; other pool classes (e.g. NullPool) lack them
+    for name in ("checkedout", "checkedin", "overflow"):
+        counter = getattr(pool, name, None)
+        if counter is not None:
+            status[name] = counter()
+    status.update(pool_wait_stats.snapshot())
+    return status
+
+
 def get_db():
     """
-    Dependency to get database session.
-    Use this in FastAPI routes.
+    Dependency to get a sync database session (small pool, see engine).
+    API routes use get_async_db.
     """
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency to get an async database session.
+    The connection is checked out up front, so its pool wait is measured.
+    """
+    async with AsyncSessionLocal() as db:
+        t0 = time.perf_counter()
+        await db.connection()
+        pool_wait_stats.observe(time.perf_counter() - t0)
+        yield db
@@ -0,0 +1,134 @@
+"""
+Geohash encoding for index-backed proximity queries.
+
+A geohash is a base-32 string; every extra character splits the cell into
+32 sub-cells, so points in one cell share a prefix and a B-tree index answers
+`geohash LIKE 'u2fk%'` with a range scan.
+"""
+
+import math
+from typing import List, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+MAX_PRECISION = 12
+# metres per degree of latitude on the sphere of app.services.geometry
+_M_PER_DEG = math.pi * 6_371_000.0 / 180.0
+
+
+def encode(lat: float, lon: float, precision: int = MAX_PRECISION) -> str:
+    """Geohash of a point, `precision` characters long."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    n_bits = 0
+    even = True  # bits alternate lon, lat, starting with lon
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                bits = bits * 2 + 1
+                lon_lo = mid
+            else:
+                bits = bits * 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = bits * 2 + 1
+                lat_lo = mid
+            else:
+                bits = bits * 2
+                lat_hi = mid
+        even = not even
+        n_bits += 1
+        if n_bits == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            n_bits = 0
+
+    return "".join(chars)
+
+
+def decode_bbox(geohash: str) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+
+    for c in geohash:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+
+    return lat_lo, lon_lo, lat_hi, lon_hi
+
+
+def cell_size_deg(precision: int) -> Tuple[float, float]:
+    """(height, width) of a cell in degrees at `precision`."""
+    bits = 5 * precision
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def neighbors(geohash: str) -> List[str]:
+    """The up to 8 cells around `geohash` (fewer next to the poles)."""
+    lat_lo, lon_lo, lat_hi, lon_hi = decode_bbox(geohash)
+    d_lat, d_lon = lat_hi - lat_lo, lon_hi - lon_lo
+    lat_c, lon_c = (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+
+    cells = []
+    for dy in (-1, 0, 1):
+        lat = lat_c + dy * d_lat
+        if not -90.0 < lat < 90.0:
+            continue
+        for dx in (-1, 0, 1):
+            if dx == 0 and dy == 0:
+                continue
+            lon = (lon_c + dx * d_lon + 180.0) % 360.0 - 180.0  # wrap the antimeridian
+            cells.append(encode(lat, lon, len(geohash)))
+    return cells
+
+
+def precision_for_radius(lat: float, radius_m: float) -> int:
+    """
+    Longest precision whose cells are at least `radius_m` tall and wide over
+    the whole circle, so a circle centred in a cell lies within that cell and
+    its 8 neighbours. 0 means no cell is large enough.
+
+    Degrees of longitude shrink towards the poles, so the width is checked at
+    the circle's poleward edge rather than at `lat`.
+    """
+    edge_lat = min(abs(lat) + radius_m / _M_PER_DEG, 90.0)
+    cos_lat = max(math.cos(math.radians(edge_lat)), 1e-6)
+    for precision in range(MAX_PRECISION, 0, -1):
+        h_deg, w_deg = cell_size_deg(precision)
+        if h_deg * _M_PER_DEG >= radius_m and w_deg * _M_PER_DEG * cos_lat >= radius_m:
+            return precision
+    return 0
+
+
+def covering_cells(lat: float, lon: float, radius_m: float) -> List[str]:
+    """Geohash prefixes whose union covers the circle (empty: whole globe)."""
+    precision = precision_for_radius(lat, radius_m)
+    if precision == 0:
+        return []
+    center = encode(lat, lon, precision)
+    return [center] + neighbors(center)
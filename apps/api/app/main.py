@@ -1,13 +1,30 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api.v1 import api_router
+from app.services.raster_cache import raster_cache
+from app.services.sentinel_async import async_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Index the raster cache (and clear temp files of crashed writes) up front
+    await asyncio.to_thread(raster_cache.load_index)
+    yield
+    # Close the shared CDSE connection pool and stop token refreshes on shutdown
+    await async_client.aclose()
+    async_client.tokens.close()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     description="Solar Panel Detection API - Analyze areas for solar panel suitability",
+    lifespan=lifespan,
 )
 
 # Configure CORS
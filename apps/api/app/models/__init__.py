@@ -1,3 +1,4 @@
 from app.models.analysis import Analysis
+from app.models.cloud_scene import CloudSceneResult
 
-__all__ = ["Analysis"]
+__all__ = ["Analysis", "CloudSceneResult"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Index
 from sqlalchemy.sql import func
 
 from app.core.database import Base
@@ -8,11 +8,24 @@ class Analysis(Base):
     """Solar panel suitability analysis model"""
 
     __tablename__ = "analyses"
+    __table_args__ = (
+        # varchar_pattern_ops so `geohash LIKE 'prefix%'` uses the index
+        # whatever the database collation
+        Index(
+            "ix_analyses_geohash",
+            "geohash",
+            postgresql_ops={"geohash": "varchar_pattern_ops"},
+        ),
+        # keyset pagination order, see list_analyses
+        Index("ix_analyses_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     location_name = Column(String, index=True, nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    # app.core.geohash.encode(latitude, longitude)
+    geohash = Column(String(12), nullable=True)
 
     # Analysis results
     suitability_score = Column(Float, nullable=True)  # 0-100 score
@@ -0,0 +1,52 @@
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    Integer,
+    UniqueConstraint,
+)
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class CloudSceneResult(Base):
+    """Cloud fraction of one acquisition date over one (quantised) circular AOI"""
+
+    __tablename__ = "cloud_scene_results"
+    __table_args__ = (
+        UniqueConstraint(
+            "cell_row", "cell_col", "radius_bucket", "aoi_geometry", "grid_side",
+            "acquisition_date",
+            name="uq_cloud_scene_results_site_date",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Site key, see app.services.cloud_store.site_key
+    cell_row = Column(Integer, nullable=False)
+    cell_col = Column(Integer, nullable=False)
+    # radius in CLOUD_STORE_RADIUS_STEP_M steps
+    radius_bucket = Column(Integer, nullable=False)
+    # request mode: circle polygon sent to the Process API (else its bbox),
+    # and the side in pixels of the output grid
+    aoi_geometry = Column(Boolean, nullable=False)
+    grid_side = Column(Integer, nullable=False)
+    acquisition_date = Column(Date, nullable=False)
+
+    # NULL cloud_fraction: no valid pixels, or coverage below the
+    # min_valid_ratio of the request that computed it
+    cloud_fraction = Column(Float, nullable=True)
+    valid_ratio = Column(Float, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return (
+            f"<CloudSceneResult ({self.cell_row}, {self.cell_col}, "
+            f"r{self.radius_bucket}, {self.grid_side}px) "
+            f"{self.acquisition_date}: {self.cloud_fraction}>"
+        )
@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -28,6 +28,39 @@ class AnalysisUpdate(BaseModel):
     extra_data: Optional[dict] = None
 
 
+class AnalysisBulkCreateRequest(BaseModel):
+    """Schema for creating many analyses at once"""
+
+    items: List[AnalysisCreate] = Field(..., min_length=1)
+
+
+class AnalysisBulkUpdateItem(AnalysisUpdate):
+    """Update of one analysis, by id"""
+
+    id: int
+
+
+class AnalysisBulkUpdateRequest(BaseModel):
+    """Schema for updating many analyses at once"""
+
+    items: List[AnalysisBulkUpdateItem] = Field(..., min_length=1)
+
+
+class AnalysisBulkItemResult(BaseModel):
+    """Outcome of one item of a bulk request"""
+
+    index: int  # position in the request's items
+    id: Optional[int] = None
+    status: Literal["created", "updated", "not_found", "error"]
+    error: Optional[str] = None
+
+
+class AnalysisBulkResponse(BaseModel):
+    """Per-item outcomes of a bulk request, in request order"""
+
+    results: List[AnalysisBulkItemResult]
+
+
 class AnalysisResponse(AnalysisBase):
     """Schema for analysis response"""
 
@@ -43,6 +76,36 @@ class AnalysisResponse(AnalysisBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class AnalysisListItem(BaseModel):
+    """Analysis in a list page; fields left out by the projection are omitted"""
+
+    id: int
+    created_at: datetime
+    location_name: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    suitability_score: Optional[float] = None
+    annual_sunlight_hours: Optional[float] = None
+    roof_area: Optional[float] = None
+    estimated_capacity: Optional[float] = None
+    extra_data: Optional[dict] = None
+    updated_at: Optional[datetime] = None
+
+
+class AnalysisPage(BaseModel):
+    """One page of analyses, newest first"""
+
+    items: List[AnalysisListItem]
+    # pass as `cursor` to get the next page; None on the last page
+    next_cursor: Optional[str] = None
+
+
+class AnalysisNearbyResponse(AnalysisListItem):
+    """Analysis with its distance from the query point"""
+
+    distance_m: float
+
+
 class CloudinessStats(BaseModel):
     scenes_used: int
     dates: List[str]
@@ -61,9 +124,17 @@ class CloudinessStats(BaseModel):
     near_mean_date: str
     near_mean_fraction: float
 
+    scenes_total: Optional[int] = None  # acquisition days found in the catalogue
+    scenes_failed: int = 0  # scenes whose Process API request failed
+    # progressive mode: confidence half-width on mean_cloudiness
+    # (None = all scenes used)
+    mean_error_bound: Optional[float] = None
+
 class CloudinessTestRequest(BaseModel):
     center_lat: float
     center_lon: float
     radius_m: float
     start_date: date
-    end_date: date
\ No newline at end of file
+    end_date: date
+    # stop sampling dates once mean_cloudiness is known to ±tolerance
+    tolerance: Optional[float] = Field(None, gt=0, le=1)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import date
-from typing import Optional
+from typing import Dict, List, Literal, Optional, Tuple
 
 class SiteLocation(BaseModel):
     lat: float
@@ -13,10 +13,17 @@ class TimeRange(BaseModel):
     end_date: date
 
 class FeatureScore(BaseModel):
-    raw_value: float       # e.g. mean cloud fraction 0.42
+    raw_value: Optional[float]  # e.g. mean cloud fraction 0.42 (None if degraded)
     normalized: float      # mapped to 0–1
     weight: float          # e.g. 0.4
     contribution: float    # normalized * weight
+    # scorer-specific extras, e.g. elevation / aspect for the elevation scorer
+    details: Optional[Dict[str, float]] = None
+
+    # filled in by the scoring engine
+    status: Literal["ok", "timeout", "error"] = "ok"
+    elapsed_ms: Optional[float] = None
+    error: Optional[str] = None
 
 class SiteScoreRequest(BaseModel):
     location: SiteLocation
@@ -24,7 +31,35 @@ class SiteScoreRequest(BaseModel):
 
 class SiteScoreResponse(BaseModel):
     final_score: float
-    cloud: FeatureScore
-    elevation: FeatureScore
-    road_access: FeatureScore
-    grid_access: FeatureScore
+    # every registered scorer, by name
+    features: Dict[str, FeatureScore] = {}
+
+    # built-in scorers, also listed in `features`
+    cloud: Optional[FeatureScore] = None
+    elevation: Optional[FeatureScore] = None
+    road_access: Optional[FeatureScore] = None
+    grid_access: Optional[FeatureScore] = None
+
+    # names of features that timed out or failed; their weight is spread
+    # over the remaining features so final_score stays on the same scale
+    degraded: List[str] = []
+    timings_ms: Dict[str, float] = {}
+
+class SiteScoreBatchRequest(BaseModel):
+    locations: List[SiteLocation] = Field(..., min_length=1)
+    time_range: TimeRange
+
+class SiteScoreBatchItem(BaseModel):
+    """One NDJSON line of the batch response."""
+    index: int                 # position in SiteScoreBatchRequest.locations
+    location: SiteLocation
+    result: Optional[SiteScoreResponse] = None
+    error: Optional[str] = None
+
+class HeatmapRequest(BaseModel):
+    # (min_lon, min_lat, max_lon, max_lat), EPSG:4326
+    bbox: Tuple[float, float, float, float]
+    cell_size_m: float = Field(..., gt=0)
+    time_range: TimeRange
+    # png: 8-bit grey score with transparent no-data; npy: float32, NaN = no data
+    format: Literal["png", "npy"] = "png"
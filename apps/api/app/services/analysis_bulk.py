@@ -0,0 +1,137 @@
+# app/services/analysis_bulk.py
+
+from __future__ import annotations
+
+import logging
+from typing import Iterator, List, Sequence, TypeVar
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import geohash
+from app.core.config import settings
+from app.models.analysis import Analysis
+from app.schemas.analysis import (
+    AnalysisBulkItemResult,
+    AnalysisBulkUpdateItem,
+    AnalysisCreate,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bulk writes for the ingest pipeline. Items are written in chunks of
+# ANALYSIS_BULK_CHUNK_SIZE, one transaction and one multi-row statement per
+# chunk; a chunk that fails is rolled back and reported item by item, the
+# others still commit.
+
+T = TypeVar("T")
+
+
+def _chunks(items: Sequence[T], size: int) -> Iterator[range]:
+    for start in range(0, len(items), max(1, size)):
+        yield range(start, min(start + size, len(items)))
+
+
+def _error(exc: Exception) -> str:
+    return f"{type(exc).__name__}: {exc}".splitlines()[0]
+
+
+async def bulk_create(
+    db: AsyncSession, items: Sequence[AnalysisCreate]
+) -> List[AnalysisBulkItemResult]:
+    """
+    Inserts `items` with INSERT ... RETURNING id; results are aligned with
+    `items`.
+    """
+    results: List[AnalysisBulkItemResult] = []
+    # sort_by_parameter_order: returned ids come back in parameter order
+    stmt = insert(Analysis).returning(Analysis.id, sort_by_parameter_order=True)
+
+    for chunk in _chunks(items, settings.ANALYSIS_BULK_CHUNK_SIZE):
+        rows = [
+            {
+                **items[i].model_dump(),
+                "geohash": geohash.encode(items[i].latitude, items[i].longitude),
+            }
+            for i in chunk
+        ]
+        try:
+            ids = (await db.execute(stmt, rows)).scalars().all()
+            await db.commit()
+        except Exception as exc:
+            await db.rollback()
+            logger.warning(
+                "Bulk insert of items %d..%d failed", chunk[0], chunk[-1], exc_info=True
+            )
+            results.extend(
+                AnalysisBulkItemResult(index=i, status="error", error=_error(exc))
+                for i in chunk
+            )
+            continue
+        results.extend(
+            AnalysisBulkItemResult(index=i, id=analysis_id, status="created")
+            for i, analysis_id in zip(chunk, ids)
+        )
+
+    return results
+
+
+async def bulk_update(
+    db: AsyncSession, items: Sequence[AnalysisBulkUpdateItem]
+) -> List[AnalysisBulkItemResult]:
+    """
+    Applies partial updates by primary key (ORM bulk UPDATE, executemany);
+    only the fields set on each item are written. Results are aligned with
+    `items`; ids that don't exist are reported as not_found.
+
+    The chunk's rows are locked (SELECT ... FOR UPDATE, in id order) before
+    the update, so a row deleted concurrently is either reported as
+    not_found or deleted only after this chunk commits; the bulk UPDATE
+    never matches fewer rows than it was given.
+    """
+    results: List[AnalysisBulkItemResult] = []
+
+    for chunk in _chunks(items, settings.ANALYSIS_BULK_CHUNK_SIZE):
+        try:
+            existing = set(
+                (
+                    await db.execute(
+                        select(Analysis.id)
+                        .where(Analysis.id.in_({items[i].id for i in chunk}))
+                        .order_by(Analysis.id)
+                        .with_for_update()
+                    )
+                ).scalars()
+            )
+            found = [i for i in chunk if items[i].id in existing]
+            rows = [
+                items[i].model_dump(exclude_unset=True) | {"id": items[i].id}
+                for i in found
+            ]
+            # rows with only an id have nothing to update
+            rows = [row for row in rows if len(row) > 1]
+            if rows:
+                await db.execute(update(Analysis), rows)
+            await db.commit()
+        except Exception as exc:
+            await db.rollback()
+            logger.warning(
+                "Bulk update of items %d..%d failed", chunk[0], chunk[-1], exc_info=True
+            )
+            results.extend(
+                AnalysisBulkItemResult(
+                    index=i, id=items[i].id, status="error", error=_error(exc)
+                )
+                for i in chunk
+            )
+            continue
+        results.extend(
+            AnalysisBulkItemResult(
+                index=i,
+                id=items[i].id,
+                status="updated" if items[i].id in existing else "not_found",
+            )
+            for i in chunk
+        )
+
+    return results
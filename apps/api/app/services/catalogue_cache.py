@@ -0,0 +1,170 @@
+# app/services/catalogue_cache.py
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# (first day of month, last day of month)
+Bucket = Tuple[date, date]
+# (expires_at or None, features)
+Entry = Tuple[Optional[float], List[Dict[str, Any]]]
+
+
+def month_buckets(start: date, end: date) -> List[Bucket]:
+    """Splits [start, end] into the calendar months it touches."""
+    buckets: List[Bucket] = []
+    first = start.replace(day=1)
+    while first <= end:
+        next_first = (first + timedelta(days=32)).replace(day=1)
+        buckets.append((first, next_first - timedelta(days=1)))
+        first = next_first
+    return buckets
+
+
+def contiguous_runs(buckets: List[Bucket]) -> List[Bucket]:
+    """Merges adjacent month buckets into (from, to) ranges, one query each."""
+    runs: List[Bucket] = []
+    for b_start, b_end in sorted(buckets):
+        if runs and runs[-1][1] + timedelta(days=1) == b_start:
+            runs[-1] = (runs[-1][0], b_end)
+        else:
+            runs.append((b_start, b_end))
+    return runs
+
+
+def feature_day(feature: Dict[str, Any]) -> Optional[date]:
+    props = feature.get("properties", {})
+    start_iso = props.get("startDate") or props.get("startdate") or ""
+    try:
+        return date.fromisoformat(start_iso[:10])
+    except ValueError:
+        return None
+
+
+def split_by_bucket(
+    features: List[Dict[str, Any]], buckets: List[Bucket]
+) -> Dict[Bucket, List[Dict[str, Any]]]:
+    """Assigns features to the month bucket of their acquisition day."""
+    out: Dict[Bucket, List[Dict[str, Any]]] = {bucket: [] for bucket in buckets}
+    for feature in features:
+        day = feature_day(feature)
+        if day is None:
+            continue
+        bucket = month_buckets(day, day)[0]
+        if bucket in out:
+            out[bucket].append(feature)
+    return out
+
+
+def select_features(
+    by_bucket: Dict[Bucket, List[Dict[str, Any]]],
+    start: date,
+    end: date,
+    max_records: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Flattens bucketed features to those acquired in [start, end], ordered by
+    acquisition time and without duplicate product ids.
+    """
+    seen = set()
+    selected: List[Dict[str, Any]] = []
+    for bucket in sorted(by_bucket):
+        for feature in by_bucket[bucket]:
+            day = feature_day(feature)
+            if day is None or not (start <= day <= end):
+                continue
+            fid = feature.get("id")
+            if fid is not None:
+                if fid in seen:
+                    continue
+                seen.add(fid)
+            selected.append(feature)
+
+    selected.sort(key=lambda f: f.get("properties", {}).get("startDate") or "")
+    if max_records is not None:
+        selected = selected[:max_records]
+    return selected
+
+
+class CatalogueCache:
+    """
+    In-memory cache of catalogue search results, stored per AOI key and
+    calendar month.
+
+    Months that ended more than CDS_CATALOG_SETTLE_DAYS ago are treated as
+    final and kept until evicted (LRU, bounded by entry count). More recent
+    months can still gain products, so they expire after `recent_ttl_s`.
+    """
+
+    def __init__(self, max_entries: int, recent_ttl_s: float, settle_days: int) -> None:
+        self.max_entries = max_entries
+        self.recent_ttl_s = recent_ttl_s
+        self.settle_days = settle_days
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Bucket], Entry]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def aoi_key(geometry_wkt: str, product_type: str) -> str:
+        raw = f"{product_type}|{geometry_wkt}".encode("utf-8")
+        return hashlib.sha1(raw).hexdigest()
+
+    def lookup(
+        self, aoi_key: str, buckets: List[Bucket]
+    ) -> Tuple[Dict[Bucket, List[Dict[str, Any]]], List[Bucket]]:
+        """Returns (cached features per bucket, buckets that must be queried)."""
+        found: Dict[Bucket, List[Dict[str, Any]]] = {}
+        missing: List[Bucket] = []
+        now = time.monotonic()
+
+        with self._lock:
+            for bucket in buckets:
+                entry = self._entries.get((aoi_key, bucket))
+                if entry is None or (entry[0] is not None and entry[0] < now):
+                    self._entries.pop((aoi_key, bucket), None)
+                    missing.append(bucket)
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end((aoi_key, bucket))
+                found[bucket] = entry[1]
+                self.hits += 1
+
+        return found, missing
+
+    def store(
+        self, aoi_key: str, bucket: Bucket, features: List[Dict[str, Any]]
+    ) -> None:
+        settled = bucket[1] + timedelta(days=self.settle_days) < date.today()
+        expires_at = None if settled else time.monotonic() + self.recent_ttl_s
+
+        with self._lock:
+            self._entries[(aoi_key, bucket)] = (expires_at, features)
+            self._entries.move_to_end((aoi_key, bucket))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
+
+# Singleton instance shared by the Sentinel clients
+catalogue_cache = CatalogueCache(
+    max_entries=settings.CDS_CATALOG_CACHE_MAX_ENTRIES,
+    recent_ttl_s=settings.CDS_CATALOG_RECENT_TTL_S,
+    settle_days=settings.CDS_CATALOG_SETTLE_DAYS,
+)
@@ -0,0 +1,214 @@
+# app/services/cdse_auth.py
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Treat tokens this close to expiry as expired (clock skew, request latency)
+_EXPIRY_SKEW_S = 10.0
+
+
+class TokenManager:
+    """
+    Thread-safe OAuth token lifecycle for the CDSE identity endpoint.
+
+    - Tracks `expires_in` / `refresh_expires_in` of every token response.
+    - Refreshes proactively in a background timer `refresh_margin_s` before
+      the access token expires, as long as the token is being used.
+    - Single-flight: at most one login/refresh runs at a time, concurrent
+      callers wait for it and reuse its result.
+    - Optionally persists tokens to `cache_path` so a restarted process can
+      skip the password login.
+    """
+
+    def __init__(
+        self,
+        request_token: Callable[[Dict[str, str]], Dict[str, Any]],
+        client_id: str,
+        username: str,
+        password: str,
+        refresh_margin_s: float = 60.0,
+        cache_path: Optional[str] = None,
+    ) -> None:
+        self._request_token = request_token
+        self.client_id = client_id
+        self.username = username
+        self.password = password
+        self.refresh_margin_s = refresh_margin_s
+        self.cache_path = cache_path
+
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+        self._access_token: Optional[str] = None
+        self._access_expires_at = 0.0  # wall clock, seconds
+        self._refresh_token: Optional[str] = None
+        self._refresh_expires_at = 0.0
+        self._used_since_renew = False
+
+        self._load()
+
+    # ------------------------ public API ------------------------ #
+
+    def peek_token(self) -> Optional[str]:
+        """Returns the current access token if still valid, without blocking."""
+        token = self._access_token
+        if token and time.time() < self._access_expires_at - _EXPIRY_SKEW_S:
+            self._used_since_renew = True
+            return token
+        return None
+
+    def get_token(self) -> str:
+        """Returns a valid access token, logging in or refreshing if needed."""
+        token = self.peek_token()
+        if token:
+            return token
+
+        with self._lock:
+            # another thread may have renewed while we waited for the lock
+            token = self.peek_token()
+            if token:
+                return token
+            self._renew_locked()
+            self._used_since_renew = True
+            assert self._access_token is not None
+            return self._access_token
+
+    def invalidate(self, stale_token: Optional[str]) -> None:
+        """
+        Marks `stale_token` as expired (e.g. after a 401). A no-op when the
+        token was already replaced, so concurrent 401s trigger one refresh.
+        """
+        with self._lock:
+            if self._access_token == stale_token:
+                self._access_expires_at = 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    # ------------------------ renewal ------------------------ #
+
+    def _renew_locked(self) -> None:
+        now = time.time()
+        if self._refresh_token and now < self._refresh_expires_at - _EXPIRY_SKEW_S:
+            try:
+                self._store(
+                    self._request_token(
+                        {
+                            "client_id": self.client_id,
+                            "grant_type": "refresh_token",
+                            "refresh_token": self._refresh_token,
+                        }
+                    )
+                )
+                return
+            except Exception:
+                logger.warning(
+                    "CDSE token refresh failed, logging in again", exc_info=True
+                )
+
+        self._store(
+            self._request_token(
+                {
+                    "client_id": self.client_id,
+                    "username": self.username,
+                    "password": self.password,
+                    "grant_type": "password",
+                }
+            )
+        )
+
+    def _store(self, data: Dict[str, Any]) -> None:
+        now = time.time()
+        self._access_token = data["access_token"]
+        self._access_expires_at = now + float(data.get("expires_in", 300))
+        self._refresh_token = data.get("refresh_token")
+        self._refresh_expires_at = now + float(data.get("refresh_expires_in", 0))
+        self._used_since_renew = False
+
+        self._schedule()
+        self._save()
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(1.0, self._access_expires_at - self.refresh_margin_s - time.time())
+        self._timer = threading.Timer(delay, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self) -> None:
+        with self._lock:
+            if not self._used_since_renew:
+                # idle: let the token lapse, the next request renews on demand
+                self._timer = None
+                return
+            try:
+                self._renew_locked()
+            except Exception:
+                logger.warning("Background CDSE token refresh failed", exc_info=True)
+                self._timer = None
+
+    # ------------------------ persistence ------------------------ #
+
+    def _load(self) -> None:
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (
+            data.get("username") != self.username
+            or data.get("client_id") != self.client_id
+        ):
+            return
+
+        self._access_token = data.get("access_token")
+        self._access_expires_at = float(data.get("access_expires_at", 0))
+        self._refresh_token = data.get("refresh_token")
+        self._refresh_expires_at = float(data.get("refresh_expires_at", 0))
+        if self._access_token:
+            self._schedule()
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        data = {
+            "username": self.username,
+            "client_id": self.client_id,
+            "access_token": self._access_token,
+            "access_expires_at": self._access_expires_at,
+            "refresh_token": self._refresh_token,
+            "refresh_expires_at": self._refresh_expires_at,
+        }
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        tmp = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:  # mkstemp creates the file with mode 0600
+                json.dump(data, f)
+            os.replace(tmp, self.cache_path)
+        except (OSError, TypeError, ValueError):
+            # don't leave a half-written token file behind
+            if tmp is not None:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            logger.warning(
+                "Could not persist CDSE tokens to %s", self.cache_path, exc_info=True
+            )
@@ -1,16 +1,42 @@
 from __future__ import annotations
 
-import io
+import asyncio
+import json
+import logging
 import math
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import date
-from typing import List, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
-from shapely.geometry import box
-from PIL import Image
+from shapely.geometry import box, shape
 
+from app.core.config import settings
 from app.schemas.analysis import CloudinessStats
+from app.schemas.site_score import FeatureScore
+from app.services import cloud_store
+from app.services.geometry import circle_to_bbox, circle_to_polygon, disk_mask
+from app.services.raster_cache import raster_cache
+from app.services.scorer_registry import register_layer, register_scorer
+from app.services.sentinel_async import async_client
 from app.services.sentinel_client import client
+from app.services.site_context import GridContext, SiteContext
+from app.services.tiff_reader import decode_tiff
+
+logger = logging.getLogger(__name__)
 
 
 # --- Evalscripts (adapted from your Colab notebook) ---
@@ -36,6 +62,45 @@ function evaluatePixel(sample) {
 }
 """
 
+# Multi-temporal variant: one request covers many days. __DATES__ is replaced
+# with a JSON list of 'YYYY-MM-DD' strings; the output holds 2 bands per date,
+# (dataMask, cloud flag), in the order of that list.
+EVALSCRIPT_CLOUD_MULTI = """
+//VERSION=3
+var DATES = __DATES__;
+var CLOUD_CLASSES = [3, 8, 9, 10];
+
+function setup() {
+  return {
+    input: [{ bands: ["SCL", "dataMask"] }],
+    output: { bands: DATES.length * 2, sampleType: "UINT8" },
+    mosaicking: "ORBIT"
+  };
+}
+
+function preProcessScenes(collections) {
+  collections.scenes.orbits = collections.scenes.orbits.filter(function (orbit) {
+    return DATES.indexOf(orbit.dateFrom.slice(0, 10)) !== -1;
+  });
+  return collections;
+}
+
+function evaluatePixel(samples, scenes) {
+  let out = new Array(DATES.length * 2).fill(0);
+
+  for (let i = 0; i < samples.length; i++) {
+    let j = DATES.indexOf(scenes.orbits[i].dateFrom.slice(0, 10));
+    // keep the first orbit with valid data for each date
+    if (j === -1 || out[2 * j] === 1 || samples[i].dataMask !== 1) {
+      continue;
+    }
+    out[2 * j] = 1;
+    out[2 * j + 1] = CLOUD_CLASSES.indexOf(samples[i].SCL) !== -1 ? 1 : 0;
+  }
+  return out;
+}
+"""
+
 EVALSCRIPT_RGB = """
 //VERSION=3
 function setup() {
@@ -62,57 +127,187 @@ function evaluatePixel(sample) {
 """
 
 
-# ---------- geometry helper: circle → bbox ---------- #
+# ---------- scene planning: catalogue features → unique days ---------- #
+
+# MGRS tile id inside a product name, e.g. "S2A_MSIL2A_20230105T..._T34TFS_20230105T..."
+_TILE_RE = re.compile(r"_T(\d{2}[A-Z]{3})_")
+
+
+@dataclass
+class ScenePlan:
+    """One acquisition day and the catalogue products that fall on it."""
+
+    day: str  # 'YYYY-MM-DD'
+    product_ids: List[str] = field(default_factory=list)
+    tiles: List[str] = field(default_factory=list)
 
-def circle_to_bbox(lat_deg: float, lon_deg: float, radius_m: float) -> Tuple[float, float, float, float]:
+
+def plan_scenes(features: List[Dict[str, Any]]) -> List[ScenePlan]:
     """
-    Approximate a circle on the Earth's surface with a bbox in EPSG:4326.
-    Good enough for relatively small radii.
-    Returns (min_lon, min_lat, max_lon, max_lat).
+    Collapses catalogue features to one ScenePlan per acquisition day.
+
+    Adjacent MGRS tiles and reprocessed baselines of the same day all end up
+    in a single plan, because the Process API mosaics the whole day anyway.
+    Plans are returned in chronological order.
     """
-    R = 6371000.0
-    dlat = (radius_m / R) * (180.0 / math.pi)
-    dlon = dlat / math.cos(math.radians(lat_deg))
+    plans: Dict[str, ScenePlan] = {}
 
-    min_lat = lat_deg - dlat
-    max_lat = lat_deg + dlat
-    min_lon = lon_deg - dlon
-    max_lon = lon_deg + dlon
-    return min_lon, min_lat, max_lon, max_lat
+    for p in features:
+        # The catalogue uses 'startDate' ISO string, e.g. "2023-01-05T10:12:34.000Z"
+        props = p.get("properties", {})
+        start_iso = props.get("startDate") or props.get("startdate") or ""
+        if len(start_iso) < 10:
+            continue
+        day = start_iso[:10]  # 'YYYY-MM-DD'
 
+        plan = plans.setdefault(day, ScenePlan(day=day))
 
-# ---------- low-level helper: cloud fraction for a single date ---------- #
+        product_id = p.get("id") or props.get("title")
+        if product_id and product_id not in plan.product_ids:
+            plan.product_ids.append(product_id)
 
-def _get_cloud_fraction_for_date(
-    date_str: str,
-    bbox: Tuple[float, float, float, float],
-    width: int = 256,
-    height: int = 256,
-    min_valid_ratio: float = 0.8,
-) -> Tuple[float | None, float]:
+        match = _TILE_RE.search(props.get("title") or "")
+        if match and match.group(1) not in plan.tiles:
+            plan.tiles.append(match.group(1))
+
+    return [plans[day] for day in sorted(plans)]
+
+
+def features_covering(
+    features: List[Dict[str, Any]], bbox: Bbox
+) -> List[Dict[str, Any]]:
     """
-    Returns (cloud_fraction, valid_ratio) for a given date and bbox.
-    If valid_ratio < min_valid_ratio, returns (None, valid_ratio).
+    Keeps the catalogue features whose footprint intersects `bbox`, e.g. to
+    reuse a search over a larger area for one site inside it. Features
+    without a footprint are kept.
+    """
+    aoi = box(*bbox)
+    covering = []
+    for feature in features:
+        footprint = feature.get("geometry")
+        if footprint is None or shape(footprint).intersects(aoi):
+            covering.append(feature)
+    return covering
+
+
+# ---------- resolution planning: output size and sub-tiles ---------- #
+
+Bbox = Tuple[float, float, float, float]
+SceneResult = Tuple[Optional[float], float]  # (cloud_fraction or None, valid_ratio)
+# per-date valid pixel counts, per-date cloudy pixel counts, AOI pixel count
+Counts = Tuple[np.ndarray, np.ndarray, int]
+
+
+@dataclass(eq=False)
+class GridTile:
+    """One Process API output window of the AOI grid."""
 
-    This is the cleaned-up version of your per-date processing from the Colab script.
+    bbox: Bbox
+    width: int
+    height: int
+    aoi_mask: Optional[np.ndarray] = None  # (height, width) window of the AOI mask
+    x0: int = 0  # pixel offset of the tile in the full grid
+    y0: int = 0
+
+
+def plan_resolution(
+    radius_m: float, resolution_m: Optional[float] = None
+) -> Tuple[int, int]:
+    """
+    Output (width, height) for a circle so one pixel covers about
+    `resolution_m` (default: the native 20 m of the SCL band). The grid side
+    is clamped to [CDS_MIN_PIXELS_PER_SIDE, CDS_MAX_GRID_SIDE]; very large
+    AOIs therefore get coarser pixels rather than unbounded requests.
+    """
+    res = resolution_m or settings.SCL_RESOLUTION_M
+    side = math.ceil(2.0 * radius_m / res)
+    side = min(max(side, settings.CDS_MIN_PIXELS_PER_SIDE), settings.CDS_MAX_GRID_SIDE)
+    return side, side
+
+
+def plan_tiles(
+    bbox: Bbox,
+    width: int,
+    height: int,
+    aoi_mask: Optional[np.ndarray] = None,
+    max_side: Optional[int] = None,
+) -> List[GridTile]:
+    """
+    Splits a (width × height) grid over `bbox` into tiles of at most
+    `max_side` (default CDS_MAX_PIXELS_PER_SIDE) pixels per side.
+
+    Tile edges fall on pixel boundaries of the full grid, so summing the
+    per-tile pixel counts gives exactly the full-grid counts. Tiles that
+    do not touch the AOI mask (corners of a circle) are dropped.
     """
+    max_side = max_side or settings.CDS_MAX_PIXELS_PER_SIDE
+    nx = math.ceil(width / max_side)
+    ny = math.ceil(height / max_side)
+    xs = np.linspace(0, width, nx + 1).round().astype(int).tolist()
+    ys = np.linspace(0, height, ny + 1).round().astype(int).tolist()
+
     minx, miny, maxx, maxy = bbox
+    dx = (maxx - minx) / width
+    dy = (maxy - miny) / height
+
+    tiles: List[GridTile] = []
+    for y0, y1 in zip(ys[:-1], ys[1:]):  # rows run north → south
+        for x0, x1 in zip(xs[:-1], xs[1:]):
+            mask = None
+            if aoi_mask is not None:
+                mask = aoi_mask[y0:y1, x0:x1]
+                if not mask.any():
+                    continue
+            tile_bbox = (minx + x0 * dx, maxy - y1 * dy, minx + x1 * dx, maxy - y0 * dy)
+            tiles.append(GridTile(tile_bbox, x1 - x0, y1 - y0, mask, x0, y0))
+    return tiles
+
+
+# ---------- Process API payloads and per-date reductions ---------- #
+
+
+def _cloud_payload(
+    days: Sequence[str],
+    bbox: Bbox,
+    width: int,
+    height: int,
+    multi_temporal: bool,
+    geometry: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Process API payload for the cloud evalscripts: EVALSCRIPT_CLOUD for a
+    single date, EVALSCRIPT_CLOUD_MULTI otherwise. `days` must be sorted.
+    With a GeoJSON `geometry`, pixels outside it come back with dataMask 0.
+
+    Both return UINT8 bands as TIFF, which decode_tiff maps straight onto
+    the response buffer instead of going through PNG → PIL → NumPy.
+    """
+    minx, miny, maxx, maxy = bbox
+
+    if multi_temporal:
+        evalscript = EVALSCRIPT_CLOUD_MULTI.replace("__DATES__", json.dumps(list(days)))
+    else:
+        evalscript = EVALSCRIPT_CLOUD
 
-    payload = {
+    bounds: Dict[str, Any] = {
+        "bbox": [minx, miny, maxx, maxy],
+        "properties": {
+            "crs": "http://www.opengis.net/def/crs/EPSG/0/4326"
+        },
+    }
+    if geometry is not None:
+        bounds["geometry"] = geometry
+
+    return {
         "input": {
-            "bounds": {
-                "bbox": [minx, miny, maxx, maxy],
-                "properties": {
-                    "crs": "http://www.opengis.net/def/crs/EPSG/0/4326"
-                },
-            },
+            "bounds": bounds,
             "data": [
                 {
                     "type": "sentinel-2-l2a",
                     "dataFilter": {
                         "timeRange": {
-                            "from": f"{date_str}T00:00:00Z",
-                            "to": f"{date_str}T23:59:59Z",
+                            "from": f"{days[0]}T00:00:00Z",
+                            "to": f"{days[-1]}T23:59:59Z",
                         }
                     },
                 }
@@ -122,91 +317,307 @@ def _get_cloud_fraction_for_date(
             "width": width,
             "height": height,
             "responses": [
-                {"identifier": "default", "format": {"type": "image/png"}}
+                {"identifier": "default", "format": {"type": "image/tiff"}}
             ],
         },
-        "evalscript": EVALSCRIPT_CLOUD,
+        "evalscript": evalscript,
     }
 
-    raw = client.process_request(payload)
-    img = Image.open(io.BytesIO(raw))
-    arr = np.array(img)
 
-    if arr.ndim != 3 or arr.shape[2] < 2:
-        raise RuntimeError(f"Unexpected array shape: {arr.shape}")
+def _count_stack(stack: np.ndarray, n_days: int, tile: GridTile) -> Counts:
+    """
+    (2 * dates, H, W) uint8 stack of (dataMask, cloud flag) band pairs →
+    per-date valid / cloudy pixel counts inside the tile's AOI mask.
 
-    data_mask = arr[:, :, 0].astype(bool)
-    cloud_mask = arr[:, :, 1].astype(np.float32)
+    Works on strided views of the decoded buffer and counts with integer
+    count_nonzero; counts from several tiles can be summed exactly.
+    """
+    if stack.shape != (2 * n_days, tile.height, tile.width):
+        raise RuntimeError(f"Unexpected array shape: {stack.shape}")
 
-    valid_ratio = float(data_mask.mean())
-    if valid_ratio == 0:
-        return None, valid_ratio
-    if valid_ratio < min_valid_ratio:
-        return None, valid_ratio
+    data_mask = stack[0::2]  # (dates, H, W), values 0/1
+    cloud_mask = stack[1::2]
 
-    cloud_fraction = float(cloud_mask[data_mask].mean())
-    return cloud_fraction, valid_ratio
+    if tile.aoi_mask is not None:
+        data_mask = data_mask & tile.aoi_mask
+        n_pixels = int(np.count_nonzero(tile.aoi_mask))
+    else:
+        n_pixels = tile.width * tile.height
 
+    valid_counts = np.count_nonzero(data_mask, axis=(1, 2))
+    cloud_counts = np.count_nonzero(data_mask & cloud_mask, axis=(1, 2))
+    return valid_counts, cloud_counts, n_pixels
 
-# ---------- main function: cloudiness for a circle & time range ---------- #
 
-def compute_cloudiness_for_circle(
-    center_lat: float,
-    center_lon: float,
-    radius_m: float,
-    start_date: date,
-    end_date: date,
-    min_valid_ratio: float = 0.8,
-    width: int = 256,
-    height: int = 256,
-    max_records: int = 50,
-) -> CloudinessStats:
+def _counts_to_results(counts: Counts, min_valid_ratio: float) -> List[SceneResult]:
     """
-    1. Builds a bbox from circle.
-    2. Searches Sentinel-2 L2A products in the given date interval.
-    3. For each product's acquisition day, computes cloud fraction.
-    4. Filters scenes with low coverage (valid_ratio < min_valid_ratio).
-    5. Returns CloudinessStats (mean, min, max, near-mean, etc.).
+    Per-date (cloud_fraction, valid_ratio); cloud_fraction is None when the
+    date has no valid pixels or valid_ratio < min_valid_ratio.
+    valid_ratio is relative to the AOI's pixel count.
     """
+    valid_counts, cloud_counts, n_pixels = counts
 
-    # 1. bbox
-    min_lon, min_lat, max_lon, max_lat = circle_to_bbox(center_lat, center_lon, radius_m)
-    aoi = box(min_lon, min_lat, max_lon, max_lat)
+    results: List[SceneResult] = []
+    for valid, cloudy in zip(valid_counts.tolist(), cloud_counts.tolist()):
+        vr = valid / n_pixels if n_pixels else 0.0
+        if valid == 0 or vr < min_valid_ratio:
+            results.append((None, vr))
+        else:
+            results.append((cloudy / valid, vr))
+    return results
 
-    # 2. catalogue search
-    features = client.search_s2_products(
-        geometry_wkt=aoi.wkt,
-        start_date=start_date.isoformat(),
-        end_date=end_date.isoformat(),
-        max_records=max_records,
+
+# ---------- raster fetch through the local cache ---------- #
+
+# Process-wide caps on Process API requests in flight; the per-computation
+# pools below only bound the fan-out of a single site or grid
+_process_slots = threading.BoundedSemaphore(settings.CDS_PROCESS_MAX_WORKERS)
+_process_slots_async = asyncio.Semaphore(settings.CDS_PROCESS_MAX_WORKERS)
+
+
+def _process_cached(
+    payload: Dict[str, Any],
+    decode: Callable[[bytes], np.ndarray],
+) -> np.ndarray:
+    """
+    Returns the decoded raster for a Process API payload, serving it from
+    raster_cache when the same request was made before. Cache misses wait
+    for one of the CDS_PROCESS_MAX_WORKERS process-wide request slots.
+    """
+    key = raster_cache.key_for(payload)
+    arr = raster_cache.get(key)
+    if arr is None:
+        with _process_slots:
+            raw = client.process_request(payload)
+        arr = decode(raw)
+        raster_cache.put(key, arr)
+    return arr
+
+
+async def _process_cached_async(
+    payload: Dict[str, Any],
+    decode: Callable[[bytes], np.ndarray],
+) -> np.ndarray:
+    """Async version of _process_cached; disk and CPU work runs off the loop."""
+    key = raster_cache.key_for(payload)
+    arr = await asyncio.to_thread(raster_cache.get, key)
+    if arr is None:
+        async with _process_slots_async:
+            raw = await async_client.process_request(payload)
+
+        def decode_and_store() -> np.ndarray:
+            decoded = decode(raw)
+            raster_cache.put(key, decoded)
+            return decoded
+
+        arr = await asyncio.to_thread(decode_and_store)
+    return arr
+
+
+# ---------- low-level helpers: pixel counts per tile and dates ---------- #
+
+def _fetch_counts(
+    batch: Sequence[str],
+    tile: GridTile,
+    multi_temporal: bool,
+    geometry: Optional[Dict[str, Any]] = None,
+) -> Counts:
+    payload = _cloud_payload(
+        batch, tile.bbox, tile.width, tile.height, multi_temporal, geometry
     )
+    stack = _process_cached(payload, decode_tiff)
+    return _count_stack(stack, len(batch), tile)
 
-    if not features:
-        raise RuntimeError("No Sentinel-2 products found for this area/time range")
 
-    dates_filtered: List[str] = []
-    cloud_fractions: List[float] = []
-    valid_ratios: List[float] = []
+async def _fetch_counts_async(
+    batch: Sequence[str],
+    tile: GridTile,
+    multi_temporal: bool,
+    geometry: Optional[Dict[str, Any]] = None,
+) -> Counts:
+    payload = _cloud_payload(
+        batch, tile.bbox, tile.width, tile.height, multi_temporal, geometry
+    )
+    stack = await _process_cached_async(payload, decode_tiff)
+    return _count_stack(stack, len(batch), tile)
 
-    # 3. per-scene cloud fraction
-    for p in features:
-        # The catalogue uses 'startDate' ISO string, e.g. "2023-01-05T10:12:34.000Z"
-        props = p.get("properties", {})
-        start_iso = props.get("startDate") or props.get("startdate") or ""
-        if len(start_iso) < 10:
+
+# ---------- fetch engine: many dates × tiles, bounded concurrency ---------- #
+
+# Counts of one (batch, tile) request, or the exception it raised
+JobResult = Union[Counts, Exception]
+
+
+class CloudFetchError(RuntimeError):
+    """Every Process API request of a cloudiness computation failed."""
+
+
+def _raise_if_all_failed(job_results: Sequence[JobResult]) -> None:
+    errors = [r for r in job_results if isinstance(r, Exception)]
+    if errors and len(errors) == len(job_results):
+        raise CloudFetchError(
+            f"All {len(errors)} Process API requests failed: {errors[0]}"
+        ) from errors[0]
+
+
+def _batch_days(days: Sequence[str], multi_temporal: bool) -> List[List[str]]:
+    """Sorted unique days, split into one batch per Process API request."""
+    ordered = sorted(set(days))
+    batch_size = max(1, settings.CDS_MULTI_TEMPORAL_MAX_DATES) if multi_temporal else 1
+    return [ordered[i : i + batch_size] for i in range(0, len(ordered), batch_size)]
+
+
+def _combine_jobs(
+    days: Sequence[str],
+    batches: List[List[str]],
+    n_tiles: int,
+    job_results: List[JobResult],
+    min_valid_ratio: float,
+) -> List[Optional[SceneResult]]:
+    """
+    Sums the tile counts of every batch (jobs are batch-major) and aligns
+    the per-date results with `days`. If any tile of a batch failed, its
+    dates are reported as None: partial counts would bias the fraction.
+    """
+    by_day: Dict[str, Optional[SceneResult]] = {}
+
+    for bi, batch in enumerate(batches):
+        parts = job_results[bi * n_tiles : (bi + 1) * n_tiles]
+        if any(isinstance(part, Exception) for part in parts):
+            by_day.update({day: None for day in batch})
             continue
-        day = start_iso[:10]  # 'YYYY-MM-DD'
 
-        cf, vr = _get_cloud_fraction_for_date(
-            day,
-            bbox=(min_lon, min_lat, max_lon, max_lat),
-            width=width,
-            height=height,
-            min_valid_ratio=min_valid_ratio,
+        counts: Counts = (
+            sum(part[0] for part in parts),
+            sum(part[1] for part in parts),
+            sum(part[2] for part in parts),
         )
+        by_day.update(zip(batch, _counts_to_results(counts, min_valid_ratio)))
+
+    return [by_day[day] for day in days]
+
+
+def _fetch_cloud_fractions(
+    days: Sequence[str],
+    tiles: List[GridTile],
+    min_valid_ratio: float,
+    max_workers: Optional[int] = None,
+    multi_temporal: Optional[bool] = None,
+    geometry: Optional[Dict[str, Any]] = None,
+) -> List[Optional[SceneResult]]:
+    """
+    Computes (cloud_fraction, valid_ratio) for every day over all `tiles`
+    with at most `max_workers` of its requests in flight (all computations
+    together share the CDS_PROCESS_MAX_WORKERS slots of _process_cached).
+
+    In multi-temporal mode the days are sent in batches of
+    CDS_MULTI_TEMPORAL_MAX_DATES per request, otherwise one request per day;
+    every batch is requested once per tile.
+
+    The result list is aligned with `days`. A request that raises is logged
+    and its dates are reported as None, so one failure does not sink the
+    rest; if every request fails, CloudFetchError is raised from the first
+    error.
+    """
+    if max_workers is None:
+        max_workers = settings.CDS_PROCESS_MAX_WORKERS
+    if multi_temporal is None:
+        multi_temporal = settings.CDS_MULTI_TEMPORAL
+
+    if not days or not tiles:
+        return [None] * len(days)
+
+    batches = _batch_days(days, multi_temporal)
+    jobs = [(batch, tile) for batch in batches for tile in tiles]
+
+    def fetch(job: Tuple[List[str], GridTile]) -> JobResult:
+        batch, tile = job
+        try:
+            return _fetch_counts(batch, tile, multi_temporal, geometry)
+        except Exception as exc:
+            logger.exception(
+                "Cloud fraction request failed for %s..%s", batch[0], batch[-1]
+            )
+            return exc
+
+    workers = max(1, min(max_workers, len(jobs)))
+    if workers == 1:
+        job_results = [fetch(job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="cdse-process"
+        ) as pool:
+            # map() yields results in submission order, which keeps output deterministic
+            job_results = list(pool.map(fetch, jobs))
+
+    _raise_if_all_failed(job_results)
+    return _combine_jobs(days, batches, len(tiles), job_results, min_valid_ratio)
+
+
+async def _fetch_cloud_fractions_async(
+    days: Sequence[str],
+    tiles: List[GridTile],
+    min_valid_ratio: float,
+    max_workers: Optional[int] = None,
+    multi_temporal: Optional[bool] = None,
+    geometry: Optional[Dict[str, Any]] = None,
+) -> List[Optional[SceneResult]]:
+    """Async version of _fetch_cloud_fractions (a semaphore bounds concurrency)."""
+    if max_workers is None:
+        max_workers = settings.CDS_PROCESS_MAX_WORKERS
+    if multi_temporal is None:
+        multi_temporal = settings.CDS_MULTI_TEMPORAL
+
+    if not days or not tiles:
+        return [None] * len(days)
 
+    batches = _batch_days(days, multi_temporal)
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def fetch(batch: List[str], tile: GridTile) -> JobResult:
+        async with semaphore:
+            try:
+                return await _fetch_counts_async(batch, tile, multi_temporal, geometry)
+            except Exception as exc:
+                logger.exception(
+                    "Cloud fraction request failed for %s..%s", batch[0], batch[-1]
+                )
+                return exc
+
+    job_results = await asyncio.gather(
+        *(fetch(batch, tile) for batch in batches for tile in tiles)
+    )
+    _raise_if_all_failed(job_results)
+    return _combine_jobs(days, batches, len(tiles), list(job_results), min_valid_ratio)
+
+
+# ---------- statistics ---------- #
+
+def _summarize(
+    days: Sequence[str],
+    results: Sequence[Optional[SceneResult]],
+    scenes_total: Optional[int] = None,
+    mean_error_bound: Optional[float] = None,
+) -> CloudinessStats:
+    """
+    Drops failed (None) and low-coverage (cloud_fraction None) scenes and
+    builds CloudinessStats from the rest. `days` must be sorted.
+    """
+    dates_filtered: List[str] = []
+    cloud_fractions: List[float] = []
+    valid_ratios: List[float] = []
+    failed = 0
+    skipped = 0
+
+    for day, result in zip(days, results):
+        if result is None:
+            # request failed
+            failed += 1
+            continue
+        cf, vr = result
         if cf is None:
             # scene skipped
+            skipped += 1
             continue
 
         dates_filtered.append(day)
@@ -214,6 +625,13 @@ def compute_cloudiness_for_circle(
         valid_ratios.append(vr)
 
     if not cloud_fractions:
+        if failed and not skipped:
+            raise CloudFetchError(f"Requests failed for all {failed} scenes")
+        if failed:
+            raise RuntimeError(
+                f"No usable scenes: {skipped} skipped due to low coverage, "
+                f"{failed} failed"
+            )
         raise RuntimeError("All scenes were skipped due to low coverage")
 
     cloud_arr = np.array(cloud_fractions, dtype=np.float32)
@@ -238,4 +656,554 @@ def compute_cloudiness_for_circle(
         most_cloudy_fraction=float(cloud_arr[i_max]),
         near_mean_date=dates_filtered[i_mean],
         near_mean_fraction=float(cloud_arr[i_mean]),
+        scenes_total=len(days) if scenes_total is None else scenes_total,
+        scenes_failed=failed,
+        mean_error_bound=mean_error_bound,
     )
+
+
+# ---------- progressive mode: sample dates until the mean is tight enough ---------- #
+
+# what the progressive driver asks for: (days, tiles) to evaluate
+FetchRequest = Tuple[List[str], List[GridTile]]
+
+
+def _radical_inverse(k: int) -> float:
+    """Base-2 van der Corput sequence: 0, 1/2, 1/4, 3/4, 1/8, ..."""
+    result, f = 0.0, 0.5
+    while k:
+        result += f * (k & 1)
+        k >>= 1
+        f *= 0.5
+    return result
+
+
+def _stratified_order(n: int) -> List[int]:
+    """
+    Permutation of range(n) whose every prefix is spread evenly over the
+    range, so a sorted list of days is sampled across the whole season.
+    """
+    order: List[int] = []
+    seen = set()
+    k = 0
+    while len(order) < n:
+        i = int(_radical_inverse(k) * n)
+        k += 1
+        if i not in seen:
+            seen.add(i)
+            order.append(i)
+    return order
+
+
+def _mean_half_width(values: Sequence[float], population: int) -> float:
+    """
+    Half-width of the CLOUD_CONFIDENCE_Z confidence interval on the mean of
+    a sample without replacement from `population` scenes.
+    """
+    n = len(values)
+    if n >= population:
+        return 0.0
+    if n < 2:
+        return math.inf
+    s = float(np.std(values, ddof=1))
+    fpc = math.sqrt((population - n) / (population - 1))
+    return settings.CLOUD_CONFIDENCE_Z * s / math.sqrt(n) * fpc
+
+
+def _progressive(
+    days: List[str],
+    coarse_tiles: List[GridTile],
+    full_tiles: List[GridTile],
+    tolerance: float,
+) -> Generator[
+    FetchRequest,
+    List[Optional[SceneResult]],
+    Tuple[List[str], List[Optional[SceneResult]], Optional[float]],
+]:
+    """
+    Progressive evaluation, written as a generator so the sync and async
+    paths share it: it yields (days, tiles) requests and is sent back the
+    per-day results.
+
+    1. Evaluates days on the coarse grid, in rounds of
+       CLOUD_PROGRESSIVE_ROUND_SIZE, in stratified order across the period.
+    2. Stops once at least CLOUD_PROGRESSIVE_MIN_SCENES scenes are valid and
+       the confidence half-width of the mean is <= `tolerance`.
+    3. Re-evaluates the CLOUD_PROGRESSIVE_REFINE least and most cloudy
+       sampled days on the full grid, for least/most_cloudy_* accuracy.
+
+    Returns (sampled days sorted, their results, error bound on the mean).
+    The bound covers date sampling only, not the coarse pixel grid; it is
+    None when every day was evaluated, as there is no sampling error then.
+    """
+    order = [days[i] for i in _stratified_order(len(days))]
+    round_size = max(1, settings.CLOUD_PROGRESSIVE_ROUND_SIZE)
+    results: Dict[str, Optional[SceneResult]] = {}
+    half_width = math.inf
+
+    for start in range(0, len(order), round_size):
+        chunk = order[start : start + round_size]
+        results.update(zip(chunk, (yield chunk, coarse_tiles)))
+
+        valid = [r[0] for r in results.values() if r is not None and r[0] is not None]
+        half_width = _mean_half_width(valid, len(days))
+        if (
+            len(valid) >= settings.CLOUD_PROGRESSIVE_MIN_SCENES
+            and half_width <= tolerance
+        ):
+            break
+
+    if coarse_tiles is not full_tiles:
+        ranked = sorted(
+            (r[0], day)
+            for day, r in results.items()
+            if r is not None and r[0] is not None
+        )
+        k = settings.CLOUD_PROGRESSIVE_REFINE
+        extremes = sorted({day for _, day in ranked[:k] + ranked[-k:]})
+        if extremes:
+            refined = yield extremes, full_tiles
+            for day, result in zip(extremes, refined):
+                if result is not None:
+                    results[day] = result
+
+    sampled = sorted(results)
+    bound = None if len(sampled) == len(days) else half_width
+    return sampled, [results[day] for day in sampled], bound
+
+
+def _coarse_size(width: int, height: int) -> Tuple[int, int]:
+    factor = max(1, settings.CLOUD_PROGRESSIVE_COARSE_FACTOR)
+    min_side = settings.CDS_MIN_PIXELS_PER_SIDE
+    return max(min_side, width // factor), max(min_side, height // factor)
+
+
+# ---------- stored results (see cloud_store) ---------- #
+
+def _store_key(
+    center_lat: float,
+    center_lon: float,
+    radius_m: float,
+    width: Optional[int],
+    height: Optional[int],
+    circular: bool,
+) -> Optional[cloud_store.SiteKey]:
+    """
+    Store key of a request, or None when its results are not comparable with
+    stored ones: only circular AOIs on the default grid are stored.
+    """
+    if not circular or width is not None or height is not None:
+        return None
+    grid_side, _ = plan_resolution(radius_m)
+    return cloud_store.site_key(
+        center_lat, center_lon, radius_m, settings.CDS_SEND_AOI_GEOMETRY, grid_side
+    )
+
+
+def _merge_stored(
+    days: Sequence[str],
+    stored: Dict[str, SceneResult],
+    missing: Sequence[str],
+    fetched: Sequence[Optional[SceneResult]],
+) -> List[Optional[SceneResult]]:
+    """Per-day results aligned with `days`, from the store or the fetch."""
+    by_day: Dict[str, Optional[SceneResult]] = dict(stored)
+    by_day.update(zip(missing, fetched))
+    return [by_day[day] for day in days]
+
+
+# ---------- main function: cloudiness for a circle & time range ---------- #
+
+
+def _grid_size(
+    radius_m: float, width: Optional[int], height: Optional[int]
+) -> Tuple[int, int]:
+    if width is None or height is None:
+        return plan_resolution(radius_m)
+    return width, height
+
+
+def _plan_circle(
+    center_lat: float,
+    center_lon: float,
+    radius_m: float,
+    width: Optional[int],
+    height: Optional[int],
+    circular: bool,
+    site: Optional[SiteContext] = None,
+) -> Tuple[Bbox, List[GridTile], Optional[Dict[str, Any]]]:
+    """
+    bbox, request tiles and (optional) Process API geometry for a circle.
+    Without an explicit width/height the grid follows plan_resolution.
+    With `site`, its cached bbox, mask and AOI polygon are used.
+    """
+    if site is not None:
+        bbox = site.bbox
+    else:
+        bbox = circle_to_bbox(center_lat, center_lon, radius_m)
+    width, height = _grid_size(radius_m, width, height)
+
+    geometry = None
+    aoi_mask = None
+    if circular:
+        if site is not None:
+            aoi_mask = site.disk_mask(width, height)
+        else:
+            aoi_mask = disk_mask(width, height)
+        if settings.CDS_SEND_AOI_GEOMETRY:
+            if site is not None:
+                geometry = site.aoi_geojson
+            else:
+                geometry = circle_to_polygon(center_lat, center_lon, radius_m)
+
+    return bbox, plan_tiles(bbox, width, height, aoi_mask), geometry
+
+
+def compute_cloudiness_for_circle(
+    center_lat: float,
+    center_lon: float,
+    radius_m: float,
+    start_date: date,
+    end_date: date,
+    min_valid_ratio: float = 0.8,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    max_records: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    multi_temporal: Optional[bool] = None,
+    circular: bool = True,
+    tolerance: Optional[float] = None,
+    features: Optional[List[Dict[str, Any]]] = None,
+    site: Optional[SiteContext] = None,
+) -> CloudinessStats:
+    """
+    1. Builds a bbox from circle; with `circular` (default) statistics only
+       use pixels inside the circle, and the circle polygon is sent to the
+       Process API when CDS_SEND_AOI_GEOMETRY is set. Output size follows
+       the AOI extent (see plan_resolution) unless width/height are given;
+       large grids are split into sub-tiles (see plan_tiles).
+    2. Searches Sentinel-2 L2A products in the given date interval.
+    3. Collapses products to unique acquisition days and computes the cloud
+       fraction of each day (batched into multi-temporal requests unless
+       `multi_temporal` is False; up to `max_workers` requests run concurrently).
+    4. Filters scenes with low coverage (valid_ratio < min_valid_ratio)
+       and scenes whose request failed.
+    5. Returns CloudinessStats (mean, min, max, near-mean, etc.).
+
+    With `tolerance`, step 3 is progressive (see _progressive): only as many
+    dates as needed for a mean within ±tolerance are evaluated, on a coarser
+    grid, and `mean_error_bound` reports the achieved bound.
+
+    `features` skips step 2 with catalogue results the caller already has
+    (e.g. one search shared by nearby sites, see features_covering).
+
+    `site` (the scorers' SiteContext for this circle) supplies the bbox,
+    AOI mask and polygon instead of recomputing them.
+
+    Step 3 reuses per-scene results stored by earlier requests over the same
+    circle and only fetches the missing dates; full-grid results are stored
+    for later requests (see cloud_store).
+    """
+
+    # 1. bbox, grid and circle
+    bbox, tiles, geometry = _plan_circle(
+        center_lat, center_lon, radius_m, width, height, circular, site
+    )
+    aoi = box(*bbox)
+
+    # 2. catalogue search
+    if features is None:
+        features = client.search_s2_products(
+            geometry_wkt=aoi.wkt,
+            start_date=start_date.isoformat(),
+            end_date=end_date.isoformat(),
+            max_records=max_records,
+        )
+    elif max_records is not None:
+        features = features[:max_records]
+
+    if not features:
+        raise RuntimeError("No Sentinel-2 products found for this area/time range")
+
+    # 3. cloud fraction per unique acquisition day
+    days = [plan.day for plan in plan_scenes(features)]
+    key = _store_key(center_lat, center_lon, radius_m, width, height, circular)
+
+    def fetch(request: FetchRequest) -> List[Optional[SceneResult]]:
+        request_days, request_tiles = request
+        stored = cloud_store.load(key, request_days, min_valid_ratio) if key else {}
+        missing = [day for day in request_days if day not in stored]
+        fetched = _fetch_cloud_fractions(
+            missing,
+            request_tiles,
+            min_valid_ratio=min_valid_ratio,
+            max_workers=max_workers,
+            multi_temporal=multi_temporal,
+            geometry=geometry,
+        ) if missing else []
+        if key and request_tiles is tiles:
+            cloud_store.save(key, missing, fetched)
+        return _merge_stored(request_days, stored, missing, fetched)
+
+    if tolerance is None:
+        # 4. + 5. filter and summarize
+        return _summarize(days, fetch((days, tiles)))
+
+    coarse_w, coarse_h = _coarse_size(*_grid_size(radius_m, width, height))
+    _, coarse_tiles, _ = _plan_circle(
+        center_lat, center_lon, radius_m, coarse_w, coarse_h, circular, site
+    )
+
+    progressive = _progressive(days, coarse_tiles, tiles, tolerance)
+    try:
+        request = next(progressive)
+        while True:
+            request = progressive.send(fetch(request))
+    except StopIteration as done:
+        sampled, results, bound = done.value
+
+    return _summarize(sampled, results, scenes_total=len(days), mean_error_bound=bound)
+
+
+async def compute_cloudiness_for_circle_async(
+    center_lat: float,
+    center_lon: float,
+    radius_m: float,
+    start_date: date,
+    end_date: date,
+    min_valid_ratio: float = 0.8,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    max_records: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    multi_temporal: Optional[bool] = None,
+    circular: bool = True,
+    tolerance: Optional[float] = None,
+    features: Optional[List[Dict[str, Any]]] = None,
+    site: Optional[SiteContext] = None,
+) -> CloudinessStats:
+    """
+    Same as compute_cloudiness_for_circle, but all CDSE I/O goes through
+    async_client so it can be awaited from the event loop.
+    """
+    bbox, tiles, geometry = _plan_circle(
+        center_lat, center_lon, radius_m, width, height, circular, site
+    )
+    aoi = box(*bbox)
+
+    if features is None:
+        features = await async_client.search_s2_products(
+            geometry_wkt=aoi.wkt,
+            start_date=start_date.isoformat(),
+            end_date=end_date.isoformat(),
+            max_records=max_records,
+        )
+    elif max_records is not None:
+        features = features[:max_records]
+
+    if not features:
+        raise RuntimeError("No Sentinel-2 products found for this area/time range")
+
+    days = [plan.day for plan in plan_scenes(features)]
+    key = _store_key(center_lat, center_lon, radius_m, width, height, circular)
+
+    async def fetch(request: FetchRequest) -> List[Optional[SceneResult]]:
+        request_days, request_tiles = request
+        stored = (
+            await asyncio.to_thread(
+                cloud_store.load, key, request_days, min_valid_ratio
+            )
+            if key
+            else {}
+        )
+        missing = [day for day in request_days if day not in stored]
+        fetched = await _fetch_cloud_fractions_async(
+            missing,
+            request_tiles,
+            min_valid_ratio=min_valid_ratio,
+            max_workers=max_workers,
+            multi_temporal=multi_temporal,
+            geometry=geometry,
+        ) if missing else []
+        if key and request_tiles is tiles:
+            await asyncio.to_thread(cloud_store.save, key, missing, fetched)
+        return _merge_stored(request_days, stored, missing, fetched)
+
+    if tolerance is None:
+        return _summarize(days, await fetch((days, tiles)))
+
+    coarse_w, coarse_h = _coarse_size(*_grid_size(radius_m, width, height))
+    _, coarse_tiles, _ = _plan_circle(
+        center_lat, center_lon, radius_m, coarse_w, coarse_h, circular, site
+    )
+
+    progressive = _progressive(days, coarse_tiles, tiles, tolerance)
+    try:
+        request = next(progressive)
+        while True:
+            request = progressive.send(await fetch(request))
+    except StopIteration as done:
+        sampled, results, bound = done.value
+
+    return _summarize(sampled, results, scenes_total=len(days), mean_error_bound=bound)
+
+
+# ---------- site scoring: cloudiness → feature score ---------- #
+
+@register_scorer("cloud", weight_setting="W_CLOUD")
+def compute_cloud_score(ctx: SiteContext, weight: float) -> FeatureScore:
+    """Mean cloud fraction over the period; clear sky (0.0) scores 1.0."""
+    if ctx.start_date is None or ctx.end_date is None:
+        raise ValueError("Cloud score needs a time range")
+
+    tolerance = settings.CLOUD_SCORE_TOLERANCE
+    features = None
+    if ctx.group is not None:
+        # one catalogue search for the whole group, filtered to this site
+        group_bbox = ctx.group.bbox
+        features = features_covering(
+            ctx.group.fetch(
+                ("catalogue", ctx.start_date, ctx.end_date),
+                lambda: client.search_s2_products(
+                    geometry_wkt=box(*group_bbox).wkt,
+                    start_date=ctx.start_date.isoformat(),
+                    end_date=ctx.end_date.isoformat(),
+                ),
+            ),
+            ctx.bbox,
+        )
+
+    stats = ctx.fetch(
+        ("cloudiness", ctx.start_date, ctx.end_date, tolerance),
+        lambda: compute_cloudiness_for_circle(
+            center_lat=ctx.lat,
+            center_lon=ctx.lon,
+            radius_m=ctx.radius_m,
+            start_date=ctx.start_date,
+            end_date=ctx.end_date,
+            tolerance=tolerance,
+            features=features,
+            site=ctx,
+        ),
+    )
+
+    normalized = float(normalize_cloud(stats.mean_cloudiness))
+    contribution = normalized * weight
+
+    return FeatureScore(
+        raw_value=stats.mean_cloudiness,
+        normalized=normalized,
+        weight=weight,
+        contribution=contribution,
+    )
+
+
+def normalize_cloud(cloud_fraction):
+    """Cloud fraction (scalar or array) → 0–1 score, clear sky = 1.0."""
+    return np.clip(1.0 - np.asarray(cloud_fraction, dtype=np.float64), 0.0, 1.0)
+
+
+# ---------- heatmap: per-pixel cloud fraction over a grid ---------- #
+
+@dataclass
+class CloudGrid:
+    """Result of cloud_fraction_grid."""
+
+    fraction: np.ndarray  # (height, width) float32, NaN = no complete data
+    requests: int  # Process API requests made
+    failed: int  # of which failed; their tiles are NaN in `fraction`
+
+
+def cloud_fraction_grid(
+    bbox: Bbox,
+    width: int,
+    height: int,
+    start_date: date,
+    end_date: date,
+    max_workers: Optional[int] = None,
+    multi_temporal: Optional[bool] = None,
+) -> CloudGrid:
+    """
+    Per pixel share of valid observations that were cloudy, over all
+    acquisition days in the period (NaN where a pixel was never observed).
+
+    One catalogue search for the whole bbox, then the same batched and tiled
+    Process API requests as the circle path, reduced per pixel instead of
+    per date. A tile with a failed request would be averaged over fewer
+    days, so it is left NaN and counted in `failed`; CloudFetchError is
+    raised when every request fails.
+    """
+    if max_workers is None:
+        max_workers = settings.CDS_PROCESS_MAX_WORKERS
+    if multi_temporal is None:
+        multi_temporal = settings.CDS_MULTI_TEMPORAL
+
+    features = client.search_s2_products(
+        geometry_wkt=box(*bbox).wkt,
+        start_date=start_date.isoformat(),
+        end_date=end_date.isoformat(),
+    )
+    days = [plan.day for plan in plan_scenes(features)]
+    if not days:
+        raise RuntimeError("No Sentinel-2 products found for this area/time range")
+
+    tiles = plan_tiles(bbox, width, height)
+    jobs = [
+        (batch, tile) for batch in _batch_days(days, multi_temporal) for tile in tiles
+    ]
+
+    def fetch(job: Tuple[List[str], GridTile]) -> Union[np.ndarray, Exception]:
+        batch, tile = job
+        payload = _cloud_payload(
+            batch, tile.bbox, tile.width, tile.height, multi_temporal
+        )
+        try:
+            stack = _process_cached(payload, decode_tiff)
+            if stack.shape != (2 * len(batch), tile.height, tile.width):
+                raise RuntimeError(f"Unexpected array shape: {stack.shape}")
+        except Exception as exc:
+            logger.exception(
+                "Cloud grid request failed for %s..%s", batch[0], batch[-1]
+            )
+            return exc
+        return stack
+
+    workers = max(1, min(max_workers, len(jobs)))
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="cdse-process"
+    ) as pool:
+        job_results = list(pool.map(fetch, jobs))
+    _raise_if_all_failed(job_results)
+
+    valid = np.zeros((height, width), dtype=np.int32)
+    cloudy = np.zeros((height, width), dtype=np.int32)
+    incomplete = np.zeros((height, width), dtype=bool)
+    for (_, tile), stack in zip(jobs, job_results):
+        window = np.s_[tile.y0 : tile.y0 + tile.height, tile.x0 : tile.x0 + tile.width]
+        if isinstance(stack, Exception):
+            incomplete[window] = True
+            continue
+        data_mask = stack[0::2].astype(bool)
+        valid[window] += np.count_nonzero(data_mask, axis=0)
+        cloudy[window] += np.count_nonzero(
+            data_mask & stack[1::2].astype(bool), axis=0
+        )
+
+    fraction = np.full((height, width), np.nan, dtype=np.float32)
+    np.divide(cloudy, valid, out=fraction, where=(valid > 0) & ~incomplete)
+    failed = sum(isinstance(r, Exception) for r in job_results)
+    return CloudGrid(fraction=fraction, requests=len(jobs), failed=failed)
+
+
+@register_layer("cloud")
+def cloud_layer(grid: GridContext) -> np.ndarray:
+    if grid.start_date is None or grid.end_date is None:
+        raise ValueError("Cloud layer needs a time range")
+    result = cloud_fraction_grid(
+        grid.bbox, grid.width, grid.height, grid.start_date, grid.end_date
+    )
+    if result.failed:
+        grid.partial["cloud"] = (
+            f"{result.failed} of {result.requests} Process API requests failed"
+        )
+    return normalize_cloud(result.fraction)
@@ -0,0 +1,126 @@
+# app/services/cloud_store.py
+
+from __future__ import annotations
+
+import logging
+import math
+from datetime import date
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.cloud_scene import CloudSceneResult
+from app.services.geometry import EARTH_RADIUS_M
+
+logger = logging.getLogger(__name__)
+
+# Per-scene cloud fractions persisted in cloud_scene_results, so a later
+# request over the same (quantised) circle only fetches the dates that are
+# not stored yet.
+#
+# Sites are keyed by a CLOUD_STORE_CELL_M grid cell of their centre plus the
+# radius rounded to CLOUD_STORE_RADIUS_STEP_M; requests inside one key are
+# treated as the same AOI. With the defaults (one 20 m SCL pixel) their
+# centres are at most a pixel apart per axis and their radii within half a
+# pixel. The key also holds what changes the per-scene result besides the
+# disk: whether the circle polygon was sent to the Process API and the
+# output grid size. The store is best effort: database errors are logged and
+# behave like a miss.
+
+# (cell_row, cell_col, radius_bucket, aoi_geometry, grid_side)
+SiteKey = Tuple[int, int, int, bool, int]
+SceneResult = Tuple[Optional[float], float]  # as in cloud_service
+
+_KEY_COLUMNS = ("cell_row", "cell_col", "radius_bucket", "aoi_geometry", "grid_side")
+
+
+def site_key(
+    lat: float, lon: float, radius_m: float, aoi_geometry: bool, grid_side: int
+) -> SiteKey:
+    cell_deg = settings.CLOUD_STORE_CELL_M / EARTH_RADIUS_M * (180.0 / math.pi)
+    row = math.floor(lat / cell_deg)
+    # cell width in degrees of longitude grows towards the poles
+    lon_cell = cell_deg / max(math.cos(math.radians((row + 0.5) * cell_deg)), 1e-6)
+    radius_bucket = int(round(radius_m / settings.CLOUD_STORE_RADIUS_STEP_M))
+    return row, math.floor(lon / lon_cell), radius_bucket, aoi_geometry, grid_side
+
+
+def load(
+    key: SiteKey, days: Sequence[str], min_valid_ratio: float
+) -> Dict[str, SceneResult]:
+    """
+    Stored results of `days` usable at `min_valid_ratio`, by day.
+
+    A scene stored as low-coverage (NULL cloud_fraction) is only reused when
+    its valid_ratio is below this request's threshold too; otherwise its
+    cloud fraction is unknown and the day counts as missing.
+    """
+    if not settings.CLOUD_STORE_ENABLED or not days:
+        return {}
+
+    try:
+        with SessionLocal() as db:
+            rows = (
+                db.query(CloudSceneResult)
+                .filter_by(**dict(zip(_KEY_COLUMNS, key)))
+                .filter(
+                    CloudSceneResult.acquisition_date.in_(
+                        [date.fromisoformat(d) for d in days]
+                    ),
+                )
+                .all()
+            )
+    except Exception:
+        logger.warning("Cloud store lookup failed", exc_info=True)
+        return {}
+
+    found: Dict[str, SceneResult] = {}
+    for r in rows:
+        day = r.acquisition_date.isoformat()
+        if r.valid_ratio < min_valid_ratio:
+            found[day] = (None, r.valid_ratio)
+        elif r.cloud_fraction is not None:
+            found[day] = (r.cloud_fraction, r.valid_ratio)
+    return found
+
+
+def save(
+    key: SiteKey, days: Sequence[str], results: Sequence[Optional[SceneResult]]
+) -> None:
+    """Upserts per-day results; failed requests (None) are not stored."""
+    if not settings.CLOUD_STORE_ENABLED:
+        return
+
+    values = [
+        {
+            **dict(zip(_KEY_COLUMNS, key)),
+            "acquisition_date": date.fromisoformat(day),
+            "cloud_fraction": result[0],
+            "valid_ratio": result[1],
+        }
+        for day, result in zip(days, results)
+        if result is not None
+    ]
+    if not values:
+        return
+
+    stmt = insert(CloudSceneResult).values(values)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_cloud_scene_results_site_date",
+        set_={
+            # a low-coverage result at a stricter threshold keeps a known fraction
+            "cloud_fraction": func.coalesce(
+                stmt.excluded.cloud_fraction, CloudSceneResult.cloud_fraction
+            ),
+            "valid_ratio": stmt.excluded.valid_ratio,
+        },
+    )
+    try:
+        with SessionLocal() as db:
+            db.execute(stmt)
+            db.commit()
+    except Exception:
+        logger.warning("Cloud store write failed", exc_info=True)
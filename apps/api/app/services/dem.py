@@ -0,0 +1,562 @@
+# app/services/dem.py
+
+from __future__ import annotations
+
+import abc
+import logging
+import math
+import mmap
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.geometry import EARTH_RADIUS_M, to_local_m
+from app.services.tiff_reader import (
+    _COMPRESSION_DEFLATE,
+    _COMPRESSION_NONE,
+    _TAG_COMPRESSION,
+    _TAG_IMAGE_LENGTH,
+    _TAG_IMAGE_WIDTH,
+    _TAG_PREDICTOR,
+    _TAG_ROWS_PER_STRIP,
+    _TAG_SAMPLES_PER_PIXEL,
+    _TAG_STRIP_BYTE_COUNTS,
+    _TAG_STRIP_OFFSETS,
+    _TAG_TILE_BYTE_COUNTS,
+    _TAG_TILE_LENGTH,
+    _TAG_TILE_OFFSETS,
+    _TAG_TILE_WIDTH,
+    read_tiff_tags,
+    sample_dtype,
+    undo_predictor,
+)
+
+logger = logging.getLogger(__name__)
+
+# Local DEM tiles, read offline.
+#
+# Supported inputs, dropped into DEM_DIR:
+# - SRTM-style .hgt files (N46E023.hgt): big-endian int16, 1201 or 3601
+#   samples square, grid-registered on whole degrees.
+# - Single-band GeoTIFFs in EPSG:4326 (e.g. Copernicus GLO-30), strips or
+#   tiles, uncompressed or deflate. Uncompressed strip images are mapped
+#   as one array; everything else is read block by block.
+#
+# Files are memory-mapped and only the blocks a query touches are decoded,
+# into an LRU cache bounded by DEM_CACHE_MAX_BYTES.
+
+_TAG_MODEL_PIXEL_SCALE = 33550
+_TAG_MODEL_TIEPOINT = 33922
+_TAG_GEO_KEY_DIRECTORY = 34735
+_TAG_GDAL_NODATA = 42113
+
+_GEOKEY_RASTER_TYPE = 1025
+_RASTER_PIXEL_IS_POINT = 2
+
+_HGT_RE = re.compile(r"^([NS])(\d{2})([EW])(\d{3})\.hgt$", re.IGNORECASE)
+_HGT_NODATA = -32768
+
+Bounds = Tuple[float, float, float, float]  # (min_lon, min_lat, max_lon, max_lat)
+
+
+# ---------- block cache ---------- #
+
+class BlockCache:
+    """Thread-safe LRU of decoded DEM blocks, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._blocks: "OrderedDict[Tuple[str, int, int], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, int, int]) -> Optional[np.ndarray]:
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None:
+                self.misses += 1
+                return None
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return block
+
+    def put(self, key: Tuple[str, int, int], block: np.ndarray) -> None:
+        with self._lock:
+            old = self._blocks.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._blocks[key] = block
+            self._bytes += block.nbytes
+            while self._bytes > self.max_bytes and len(self._blocks) > 1:
+                _, evicted = self._blocks.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "blocks": len(self._blocks),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+block_cache = BlockCache(settings.DEM_CACHE_MAX_BYTES)
+
+
+# ---------- tiles ---------- #
+
+class DemTile(abc.ABC):
+    """
+    One DEM file. Pixel (row, col) is centred on
+    (lon0 + col * dlon, lat0 - row * dlat); rows run north → south.
+    Subclasses implement _read_block for their storage layout.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        width: int,
+        height: int,
+        lon0: float,
+        lat0: float,
+        dlon: float,
+        dlat: float,
+        nodata: Optional[float],
+        block_shape: Tuple[int, int],
+    ) -> None:
+        self.path = path
+        self.width = width
+        self.height = height
+        self.lon0 = lon0
+        self.lat0 = lat0
+        self.dlon = dlon
+        self.dlat = dlat
+        self.nodata = nodata
+        self.block_h, self.block_w = block_shape
+
+    @property
+    def bounds(self) -> Bounds:
+        """Outer pixel edges."""
+        return (
+            self.lon0 - self.dlon / 2,
+            self.lat0 - (self.height - 0.5) * self.dlat,
+            self.lon0 + (self.width - 0.5) * self.dlon,
+            self.lat0 + self.dlat / 2,
+        )
+
+    @abc.abstractmethod
+    def _read_block(self, by: int, bx: int) -> np.ndarray:
+        """Raw samples of block (by, bx), clipped at the tile edges."""
+
+    def _to_float(self, raw: np.ndarray) -> np.ndarray:
+        block = raw.astype(np.float32)
+        if self.nodata is not None:
+            block[raw == self.nodata] = np.nan
+        return block
+
+    def block(self, by: int, bx: int) -> np.ndarray:
+        key = (self.path, by, bx)
+        block = block_cache.get(key)
+        if block is None:
+            block = self._read_block(by, bx)
+            block.flags.writeable = False
+            block_cache.put(key, block)
+        return block
+
+    def read_window(self, r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+        """Elevations of rows [r0, r1) × cols [c0, c1) as float32 (NaN = no data)."""
+        out = np.empty((r1 - r0, c1 - c0), dtype=np.float32)
+        for by in range(r0 // self.block_h, (r1 - 1) // self.block_h + 1):
+            y0 = by * self.block_h
+            for bx in range(c0 // self.block_w, (c1 - 1) // self.block_w + 1):
+                x0 = bx * self.block_w
+                blk = self.block(by, bx)
+                ys, ye = max(r0, y0), min(r1, y0 + blk.shape[0])
+                xs, xe = max(c0, x0), min(c1, x0 + blk.shape[1])
+                out[ys - r0 : ye - r0, xs - c0 : xe - c0] = blk[
+                    ys - y0 : ye - y0, xs - x0 : xe - x0
+                ]
+        return out
+
+    def sample(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """Nearest-pixel elevations at points inside the tile."""
+        rows = np.clip(
+            np.rint((self.lat0 - lat) / self.dlat).astype(np.int64), 0, self.height - 1
+        )
+        cols = np.clip(
+            np.rint((lon - self.lon0) / self.dlon).astype(np.int64), 0, self.width - 1
+        )
+        if rows.size == 0:
+            return np.empty(rows.shape, dtype=np.float32)
+        r0, r1 = int(rows.min()), int(rows.max()) + 1
+        c0, c1 = int(cols.min()), int(cols.max()) + 1
+        return self.read_window(r0, r1, c0, c1)[rows - r0, cols - c0]
+
+
+class _ArrayTile(DemTile):
+    """Tile whose samples form one contiguous (height, width) array on disk."""
+
+    def __init__(self, data: np.ndarray, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._data = data  # np.memmap
+
+    def _read_block(self, by: int, bx: int) -> np.ndarray:
+        y0, x0 = by * self.block_h, bx * self.block_w
+        return self._to_float(
+            self._data[y0 : y0 + self.block_h, x0 : x0 + self.block_w]
+        )
+
+
+class _ChunkedTiffTile(DemTile):
+    """GeoTIFF read by its own strips or tiles (compressed or scattered)."""
+
+    def __init__(
+        self,
+        buf: mmap.mmap,
+        dtype: np.dtype,
+        offsets: Tuple[int, ...],
+        counts: Tuple[int, ...],
+        compression: int,
+        predictor: int,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._buf = buf
+        self._dtype = dtype
+        self._offsets = offsets
+        self._counts = counts
+        self._compression = compression
+        self._predictor = predictor
+        self._across = -(-self.width // self.block_w)
+
+    def _read_block(self, by: int, bx: int) -> np.ndarray:
+        i = by * self._across + bx
+        off, nbytes = self._offsets[i], self._counts[i]
+        if self._compression == _COMPRESSION_NONE:
+            raw = np.frombuffer(
+                self._buf,
+                dtype=self._dtype,
+                count=nbytes // self._dtype.itemsize,
+                offset=off,
+            )
+        else:
+            raw = np.frombuffer(
+                zlib.decompress(self._buf[off : off + nbytes]), dtype=self._dtype
+            )
+        # the last strip may be short
+        rows = min(self.block_h, raw.size // self.block_w)
+        raw = raw[: rows * self.block_w].reshape(rows, self.block_w, 1)
+        raw = undo_predictor(raw, self._predictor)[..., 0]
+
+        # crop padding of edge tiles
+        rows = min(raw.shape[0], self.height - by * self.block_h)
+        cols = min(self.block_w, self.width - bx * self.block_w)
+        return self._to_float(raw[:rows, :cols])
+
+
+def open_hgt(path: str) -> DemTile:
+    match = _HGT_RE.match(os.path.basename(path))
+    if match is None:
+        raise RuntimeError(f"Unrecognised .hgt name: {path}")
+    ns, lat, ew, lon = match.groups()
+    south = int(lat) * (-1 if ns.upper() == "S" else 1)
+    west = int(lon) * (-1 if ew.upper() == "W" else 1)
+
+    side = math.isqrt(os.path.getsize(path) // 2)
+    data = np.memmap(path, dtype=">i2", mode="r", shape=(side, side))
+    step = 1.0 / (side - 1)
+    block = settings.DEM_BLOCK_SIZE
+    return _ArrayTile(
+        data,
+        path=path,
+        width=side,
+        height=side,
+        lon0=float(west),
+        lat0=float(south + 1),
+        dlon=step,
+        dlat=step,
+        nodata=_HGT_NODATA,
+        block_shape=(block, block),
+    )
+
+
+def open_geotiff(path: str) -> DemTile:
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    order, tags = read_tiff_tags(buf)
+
+    if tags.get(_TAG_SAMPLES_PER_PIXEL, (1,))[0] != 1:
+        raise RuntimeError(f"{path}: DEM must have a single band")
+    if _TAG_MODEL_PIXEL_SCALE not in tags or _TAG_MODEL_TIEPOINT not in tags:
+        raise RuntimeError(
+            f"{path}: no ModelPixelScale/ModelTiepoint, not a north-up GeoTIFF"
+        )
+
+    width = tags[_TAG_IMAGE_WIDTH][0]
+    height = tags[_TAG_IMAGE_LENGTH][0]
+    dtype = sample_dtype(tags, order)
+    compression = tags.get(_TAG_COMPRESSION, (_COMPRESSION_NONE,))[0]
+    predictor = tags.get(_TAG_PREDICTOR, (1,))[0]
+    if compression != _COMPRESSION_NONE and compression not in _COMPRESSION_DEFLATE:
+        raise RuntimeError(
+            f"{path}: unsupported compression {compression}, re-save uncompressed"
+        )
+    if predictor not in (1, 2) or (predictor == 2 and dtype.kind == "f"):
+        raise RuntimeError(
+            f"{path}: unsupported predictor {predictor}, re-save uncompressed"
+        )
+
+    sx, sy = tags[_TAG_MODEL_PIXEL_SCALE][:2]
+    i, j, _, x, y = tags[_TAG_MODEL_TIEPOINT][:5]
+    lon0 = x + (0 - i) * sx
+    lat0 = y - (0 - j) * sy
+    if _raster_type(tags) != _RASTER_PIXEL_IS_POINT:
+        # tiepoint is the corner of pixel (0, 0), move to its centre
+        lon0 += sx / 2
+        lat0 -= sy / 2
+
+    nodata = None
+    if _TAG_GDAL_NODATA in tags:
+        text = b"".join(tags[_TAG_GDAL_NODATA]).rstrip(b"\0").decode("ascii").strip()
+        if text and text.lower() != "nan":
+            nodata = float(text)
+
+    geo = dict(
+        path=path,
+        width=width,
+        height=height,
+        lon0=lon0,
+        lat0=lat0,
+        dlon=sx,
+        dlat=sy,
+        nodata=nodata,
+    )
+
+    if _TAG_TILE_OFFSETS in tags:
+        block_shape = (tags[_TAG_TILE_LENGTH][0], tags[_TAG_TILE_WIDTH][0])
+        offsets, counts = tags[_TAG_TILE_OFFSETS], tags[_TAG_TILE_BYTE_COUNTS]
+    else:
+        block_shape = (min(tags.get(_TAG_ROWS_PER_STRIP, (height,))[0], height), width)
+        offsets, counts = tags[_TAG_STRIP_OFFSETS], tags[_TAG_STRIP_BYTE_COUNTS]
+
+        contiguous = all(
+            offsets[k] + counts[k] == offsets[k + 1] for k in range(len(offsets) - 1)
+        )
+        if compression == _COMPRESSION_NONE and predictor == 1 and contiguous:
+            data = np.ndarray(
+                (height, width), dtype=dtype, buffer=buf, offset=offsets[0]
+            )
+            block = settings.DEM_BLOCK_SIZE
+            return _ArrayTile(data, block_shape=(block, block), **geo)
+
+    return _ChunkedTiffTile(
+        buf,
+        dtype,
+        offsets,
+        counts,
+        compression,
+        predictor,
+        block_shape=block_shape,
+        **geo,
+    )
+
+
+def _raster_type(tags: Dict[int, Tuple]) -> int:
+    keys = tags.get(_TAG_GEO_KEY_DIRECTORY)
+    if not keys:
+        return 1
+    for k in range(4, len(keys) - 3, 4):
+        key_id, location, _, value = keys[k : k + 4]
+        if key_id == _GEOKEY_RASTER_TYPE and location == 0:
+            return value
+    return 1
+
+
+# ---------- index over DEM_DIR ---------- #
+
+class DemIndex:
+    """All DEM tiles in a directory, opened lazily on first use."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._tiles: Optional[List[DemTile]] = None
+
+    @property
+    def tiles(self) -> List[DemTile]:
+        with self._lock:
+            if self._tiles is None:
+                self._tiles = self._scan()
+            return self._tiles
+
+    def _scan(self) -> List[DemTile]:
+        tiles: List[DemTile] = []
+        if not os.path.isdir(self.directory):
+            logger.warning("DEM directory %s does not exist", self.directory)
+            return tiles
+
+        for root, _, files in os.walk(self.directory):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                lower = name.lower()
+                try:
+                    if lower.endswith(".hgt"):
+                        tiles.append(open_hgt(path))
+                    elif lower.endswith((".tif", ".tiff")):
+                        tiles.append(open_geotiff(path))
+                except Exception:
+                    logger.warning("Skipping DEM file %s", path, exc_info=True)
+
+        # finest first, so overlapping coverage uses the best data
+        tiles.sort(key=lambda t: t.dlat)
+        logger.info("Indexed %d DEM tiles in %s", len(tiles), self.directory)
+        return tiles
+
+    def tile_at(self, lon: float, lat: float) -> Optional[DemTile]:
+        for tile in self.tiles:
+            minx, miny, maxx, maxy = tile.bounds
+            if minx <= lon < maxx and miny < lat <= maxy:
+                return tile
+        return None
+
+    def sample(self, lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+        """Nearest-pixel elevation at each point (NaN where no tile has data)."""
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        out = np.full(lon.shape, np.nan, dtype=np.float32)
+
+        for tile in self.tiles:
+            minx, miny, maxx, maxy = tile.bounds
+            todo = (
+                np.isnan(out)
+                & (lon >= minx)
+                & (lon < maxx)
+                & (lat > miny)
+                & (lat <= maxy)
+            )
+            if todo.any():
+                out[todo] = tile.sample(lon[todo], lat[todo])
+        return out
+
+
+dem_index = DemIndex(settings.DEM_DIR)
+
+
+# ---------- terrain ---------- #
+
+
+def terrain(
+    z: np.ndarray, dx_m: float, dy_m: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Slope (degrees) and aspect (degrees clockwise from north, the direction
+    the slope faces) of a north-up elevation grid with cell size dx × dy
+    metres, by central differences. Also returns the (east, north) gradient
+    stacked as (2, H, W).
+    """
+    dz_drow, dz_dcol = np.gradient(z.astype(np.float64), dy_m, dx_m)
+    dz_east = dz_dcol
+    dz_north = -dz_drow  # rows run south
+
+    slope = np.degrees(np.arctan(np.hypot(dz_east, dz_north)))
+    aspect = np.degrees(np.arctan2(-dz_east, -dz_north)) % 360.0
+    return slope, aspect, np.stack([dz_east, dz_north])
+
+
+@dataclass
+class TerrainStats:
+    mean_elevation_m: Optional[float]  # None when served from the slope pyramid
+    mean_slope_deg: float
+    p90_slope_deg: float
+    # aspect of the AOI's mean gradient (best-fit plane), None when flat
+    aspect_deg: Optional[float]
+    valid_ratio: float  # share of AOI pixels with DEM data
+
+
+def site_terrain(lat: float, lon: float, radius_m: float) -> TerrainStats:
+    """
+    Terrain statistics over the circle, at the native resolution of the DEM
+    tile under its centre. Reads only the blocks around the AOI.
+    """
+    tile = dem_index.tile_at(lon, lat)
+    if tile is None:
+        raise RuntimeError(
+            f"No DEM tile covers ({lat:.5f}, {lon:.5f}); "
+            f"add tiles to {settings.DEM_DIR}"
+        )
+
+    m_per_deg = math.pi / 180.0 * EARTH_RADIUS_M
+    dy_m = tile.dlat * m_per_deg
+    dx_m = tile.dlon * m_per_deg * math.cos(math.radians(lat))
+
+    # pixel-aligned window around the centre, one pixel of margin for the gradient
+    ny = math.ceil(radius_m / dy_m) + 1
+    nx = math.ceil(radius_m / dx_m) + 1
+    row_c = round((tile.lat0 - lat) / tile.dlat)
+    col_c = round((lon - tile.lon0) / tile.dlon)
+    lats = tile.lat0 - (row_c + np.arange(-ny, ny + 1)) * tile.dlat
+    lons = tile.lon0 + (col_c + np.arange(-nx, nx + 1)) * tile.dlon
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+
+    if (
+        row_c - ny >= 0
+        and row_c + ny < tile.height
+        and col_c - nx >= 0
+        and col_c + nx < tile.width
+    ):
+        z = tile.read_window(row_c - ny, row_c + ny + 1, col_c - nx, col_c + nx + 1)
+    else:
+        # AOI crosses a tile edge
+        z = dem_index.sample(lon_grid, lat_grid)
+
+    slope, _, grad = terrain(z, dx_m, dy_m)
+
+    x, y = to_local_m(lon_grid, lat_grid, lon, lat)
+    disk = x**2 + y**2 <= radius_m**2
+    valid = disk & np.isfinite(slope)
+    n_disk = int(np.count_nonzero(disk))
+    if not valid.any():
+        raise RuntimeError(f"No DEM data inside the AOI at ({lat:.5f}, {lon:.5f})")
+
+    mean_east, mean_north = grad[0][valid].mean(), grad[1][valid].mean()
+    aspect = None
+    if math.hypot(mean_east, mean_north) > 1e-6:
+        aspect = math.degrees(math.atan2(-mean_east, -mean_north)) % 360.0
+
+    slopes = slope[valid]
+    return TerrainStats(
+        mean_elevation_m=float(z[valid].mean()),
+        mean_slope_deg=float(slopes.mean()),
+        p90_slope_deg=float(np.percentile(slopes, 90)),
+        aspect_deg=aspect,
+        valid_ratio=float(np.count_nonzero(valid)) / n_disk if n_disk else 0.0,
+    )
+
+
+def slope_grid(
+    lon: np.ndarray, lat: np.ndarray, dx_m: float, dy_m: float
+) -> np.ndarray:
+    """
+    Slope (degrees) on a regular north-up grid of cell centres, from
+    elevations sampled at those centres. Cells coarser than the DEM give a
+    smoothed slope at the cell scale.
+    """
+    z = dem_index.sample(lon, lat)
+    if np.isnan(z).all():
+        raise RuntimeError(
+            f"No DEM data for this area; add tiles to {settings.DEM_DIR}"
+        )
+    slope, _, _ = terrain(z, dx_m, dy_m)
+    return slope
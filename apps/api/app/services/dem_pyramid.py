@@ -0,0 +1,461 @@
+# app/services/dem_pyramid.py
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.dem import DemTile, TerrainStats, dem_index
+from app.services.geometry import EARTH_RADIUS_M
+
+logger = logging.getLogger(__name__)
+
+# Precomputed slope / aspect pyramids, built offline from the DEM tiles:
+#
+#     python -m app.services.dem_pyramid build
+#
+# One directory per DEM tile under DEM_PYRAMID_DIR, with meta.json and per
+# level k (pixels of 2^k × 2^k DEM samples):
+#   L{k}_slope.npy      int16, slope in centidegrees (-1 = no data)
+#   L{k}_aspect.npy     uint8, aspect in 360/256 degree steps
+#   L{k}_slope_sat.npy  int64 summed-area table of level-0 slope (centideg)
+#   L{k}_count_sat.npy  int32 summed-area table of level-0 valid pixels
+#
+# Level k tables are the level-0 tables sampled every 2^k rows/cols, so a
+# sum over any block-aligned rectangle is exact and costs four lookups.
+
+SLOPE_NODATA = -1
+ASPECT_STEP_DEG = 360.0 / 256.0
+
+_BAND_ROWS = 1024  # rows per slope band while building
+_MIN_LEVEL_SIDE = 64  # stop adding levels below this many pixels
+
+
+# ---------- build ---------- #
+
+def _slope_aspect(tile: DemTile) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Level-0 slope (degrees, NaN = no data) and east/north gradients for a
+    whole tile, computed in bands of rows to bound memory. The metres per
+    degree of longitude follow each row's latitude.
+    """
+    h, w = tile.height, tile.width
+    m_per_deg = math.pi / 180.0 * EARTH_RADIUS_M
+    dy_m = tile.dlat * m_per_deg
+
+    slope = np.empty((h, w), dtype=np.float32)
+    grad_e = np.empty((h, w), dtype=np.float32)
+    grad_n = np.empty((h, w), dtype=np.float32)
+
+    for r0 in range(0, h, _BAND_ROWS):
+        r1 = min(h, r0 + _BAND_ROWS)
+        # one row of halo on each side for central differences
+        h0, h1 = max(0, r0 - 1), min(h, r1 + 1)
+        z = tile.read_window(h0, h1, 0, w).astype(np.float64)
+
+        lats = tile.lat0 - np.arange(h0, h1) * tile.dlat
+        dx_m = tile.dlon * m_per_deg * np.cos(np.radians(lats))
+
+        dz_dcol = np.gradient(z, axis=1) / dx_m[:, np.newaxis]
+        dz_drow = np.gradient(z, axis=0) / dy_m
+
+        band = np.s_[r0 - h0 : r1 - h0]
+        e = dz_dcol[band]
+        n = -dz_drow[band]  # rows run south
+        grad_e[r0:r1] = e
+        grad_n[r0:r1] = n
+        slope[r0:r1] = np.degrees(np.arctan(np.hypot(e, n)))
+
+    return slope, grad_e, grad_n
+
+
+def _sat(values: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """(H+1, W+1) summed-area table with a leading row/column of zeros."""
+    sat = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=dtype)
+    np.cumsum(values, axis=0, dtype=dtype, out=sat[1:, 1:])
+    np.cumsum(sat[1:, 1:], axis=1, dtype=dtype, out=sat[1:, 1:])
+    return sat
+
+
+def _edges(n: int, factor: int) -> np.ndarray:
+    """Level-0 edges of level pixels: 0, f, 2f, ..., n (last block may be short)."""
+    return np.minimum(np.arange(0, n + factor, factor), n)[: -(-n // factor) + 1]
+
+
+def _block_sums(sat: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    s = sat[np.ix_(rows, cols)]
+    return s[1:, 1:] - s[:-1, 1:] - s[1:, :-1] + s[:-1, :-1]
+
+
+def _quantise(
+    slope_deg: np.ndarray, grad_e: np.ndarray, grad_n: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    valid = np.isfinite(slope_deg)
+    slope_q = np.full(slope_deg.shape, SLOPE_NODATA, dtype=np.int16)
+    slope_cdeg = np.rint(np.clip(slope_deg[valid], 0.0, 90.0) * 100.0)
+    slope_q[valid] = slope_cdeg.astype(np.int16)
+
+    aspect = (
+        np.degrees(np.arctan2(-np.nan_to_num(grad_e), -np.nan_to_num(grad_n))) % 360.0
+    )
+    aspect_steps = np.rint(aspect / ASPECT_STEP_DEG).astype(np.int64)
+    aspect_q = (aspect_steps % 256).astype(np.uint8)
+    return slope_q, aspect_q
+
+
+def build_tile(tile: DemTile, out_dir: str) -> int:
+    """Builds the pyramid of one DEM tile into `out_dir`; returns the level count."""
+    os.makedirs(out_dir, exist_ok=True)
+    h, w = tile.height, tile.width
+
+    slope, grad_e, grad_n = _slope_aspect(tile)
+    valid = np.isfinite(slope)
+
+    slope_q0, aspect_q0 = _quantise(slope, grad_e, grad_n)
+    slope_sat = _sat(np.where(valid, slope_q0, 0), np.int64)
+    count_sat = _sat(valid, np.int32)
+    # gradient tables only feed the coarse aspect rasters, not stored
+    grad_e_sat = _sat(np.where(valid, grad_e, 0.0), np.float64)
+    grad_n_sat = _sat(np.where(valid, grad_n, 0.0), np.float64)
+    del slope, grad_e, grad_n
+
+    levels = 0
+    while True:
+        factor = 2**levels
+        rows, cols = _edges(h, factor), _edges(w, factor)
+        if levels and max(len(rows), len(cols)) - 1 < _MIN_LEVEL_SIDE:
+            break
+
+        if levels == 0:
+            slope_q, aspect_q = slope_q0, aspect_q0
+        else:
+            counts = _block_sums(count_sat, rows, cols)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean_slope = _block_sums(slope_sat, rows, cols) / counts / 100.0
+            mean_slope[counts == 0] = np.nan
+            slope_q, aspect_q = _quantise(
+                mean_slope,
+                _block_sums(grad_e_sat, rows, cols),
+                _block_sums(grad_n_sat, rows, cols),
+            )
+
+        prefix = os.path.join(out_dir, f"L{levels}_")
+        np.save(prefix + "slope.npy", slope_q)
+        np.save(prefix + "aspect.npy", aspect_q)
+        np.save(
+            prefix + "slope_sat.npy",
+            np.ascontiguousarray(slope_sat[np.ix_(rows, cols)]),
+        )
+        np.save(
+            prefix + "count_sat.npy",
+            np.ascontiguousarray(count_sat[np.ix_(rows, cols)]),
+        )
+        levels += 1
+
+    meta = {
+        "source": os.path.abspath(tile.path),
+        "width": w,
+        "height": h,
+        "lon0": tile.lon0,
+        "lat0": tile.lat0,
+        "dlon": tile.dlon,
+        "dlat": tile.dlat,
+        "levels": levels,
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return levels
+
+
+def build_all(out_root: str, force: bool = False) -> None:
+    for tile in dem_index.tiles:
+        name = os.path.splitext(os.path.basename(tile.path))[0]
+        out_dir = os.path.join(out_root, name)
+        meta_path = os.path.join(out_dir, "meta.json")
+        if (
+            not force
+            and os.path.exists(meta_path)
+            and os.path.getmtime(meta_path) >= os.path.getmtime(tile.path)
+        ):
+            logger.info("%s is up to date", name)
+            continue
+        levels = build_tile(tile, out_dir)
+        logger.info("Built %s: %d levels", name, levels)
+
+
+# ---------- query ---------- #
+
+class SlopePyramid:
+    """Read side of one tile's pyramid; level arrays are memory-mapped on demand."""
+
+    def __init__(self, directory: str, meta: Dict) -> None:
+        self.directory = directory
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.lon0 = meta["lon0"]
+        self.lat0 = meta["lat0"]
+        self.dlon = meta["dlon"]
+        self.dlat = meta["dlat"]
+        self.levels = meta["levels"]
+        self._arrays: Dict[Tuple[int, str], np.ndarray] = {}
+
+    def array(self, level: int, name: str) -> np.ndarray:
+        key = (level, name)
+        arr = self._arrays.get(key)
+        if arr is None:
+            arr = np.load(
+                os.path.join(self.directory, f"L{level}_{name}.npy"), mmap_mode="r"
+            )
+            self._arrays[key] = arr
+        return arr
+
+    def covers(
+        self, lon_min: float, lat_min: float, lon_max: float, lat_max: float
+    ) -> bool:
+        return (
+            lon_min >= self.lon0 - self.dlon / 2
+            and lon_max <= self.lon0 + (self.width - 0.5) * self.dlon
+            and lat_max <= self.lat0 + self.dlat / 2
+            and lat_min >= self.lat0 - (self.height - 0.5) * self.dlat
+        )
+
+    def _level_for(self, pixels: float, min_pixels: float) -> int:
+        """Coarsest level at which `pixels` level-0 pixels still span `min_pixels`."""
+        if pixels <= min_pixels:
+            return 0
+        return int(min(self.levels - 1, math.floor(math.log2(pixels / min_pixels))))
+
+    def disk_terrain(
+        self, lat: float, lon: float, radius_m: float
+    ) -> Optional[TerrainStats]:
+        """
+        Slope statistics over the circle from summed-area tables, one row
+        span per level row. None when the circle is not fully inside the tile.
+        """
+        m_per_deg = math.pi / 180.0 * EARTH_RADIUS_M
+        ry = radius_m / (self.dlat * m_per_deg)  # radius in level-0 rows / cols
+        rx = radius_m / (self.dlon * m_per_deg * math.cos(math.radians(lat)))
+
+        dlat_deg = ry * self.dlat
+        dlon_deg = rx * self.dlon
+        if not self.covers(
+            lon - dlon_deg, lat - dlat_deg, lon + dlon_deg, lat + dlat_deg
+        ):
+            return None
+
+        level = self._level_for(2 * ry, settings.DEM_PYRAMID_MIN_DISK_ROWS)
+        f = 2**level
+        slope_sat = self.array(level, "slope_sat")
+        count_sat = self.array(level, "count_sat")
+        n_rows, n_cols = slope_sat.shape[0] - 1, slope_sat.shape[1] - 1
+
+        # disk centre in level-0 pixel coordinates
+        yc = (self.lat0 - lat) / self.dlat
+        xc = (lon - self.lon0) / self.dlon
+
+        # level pixel j has its centre at level-0 coordinate (j + 0.5) * f - 0.5
+        j = np.arange(
+            max(0, math.ceil((yc - ry + 0.5) / f - 0.5)),
+            min(n_rows, math.floor((yc + ry + 0.5) / f - 0.5) + 1),
+        )
+        y = (j + 0.5) * f - 0.5
+        half = rx * np.sqrt(np.clip(1.0 - ((y - yc) / ry) ** 2, 0.0, 1.0))
+        i0 = np.clip(np.ceil((xc - half + 0.5) / f - 0.5).astype(np.int64), 0, n_cols)
+        i1 = np.clip(
+            np.floor((xc + half + 0.5) / f - 0.5).astype(np.int64) + 1, 0, n_cols
+        )
+        keep = i1 > i0
+        j, i0, i1 = j[keep], i0[keep], i1[keep]
+        if j.size == 0:
+            return None
+
+        def span_sum(sat: np.ndarray) -> int:
+            return int(
+                (
+                    sat[j + 1, i1].astype(np.int64)
+                    - sat[j, i1]
+                    - sat[j + 1, i0]
+                    + sat[j, i0]
+                ).sum()
+            )
+
+        count = span_sum(count_sat)
+        if count == 0:
+            raise RuntimeError(f"No DEM data inside the AOI at ({lat:.5f}, {lon:.5f})")
+        mean_slope = span_sum(slope_sat) / count / 100.0
+
+        row_px = np.minimum((j + 1) * f, self.height) - j * f
+        area = int((row_px * (np.minimum(i1 * f, self.width) - i0 * f)).sum())
+
+        # distribution and aspect from the quantised level raster inside the spans
+        rows = np.repeat(j, i1 - i0)
+        cols = np.concatenate([np.arange(a, b) for a, b in zip(i0, i1)])
+        slope_px = self.array(level, "slope")[rows, cols]
+        aspect_px = self.array(level, "aspect")[rows, cols]
+        ok = slope_px != SLOPE_NODATA
+
+        aspect = None
+        if ok.any():
+            # gradient-weighted circular mean ≈ aspect of the mean gradient
+            weight = np.tan(np.radians(slope_px[ok] / 100.0))
+            theta = np.radians(aspect_px[ok] * ASPECT_STEP_DEG)
+            e, n = (weight * np.sin(theta)).sum(), (weight * np.cos(theta)).sum()
+            if math.hypot(e, n) > 1e-6 * ok.sum():
+                aspect = math.degrees(math.atan2(e, n)) % 360.0
+            p90 = float(np.percentile(slope_px[ok], 90)) / 100.0
+        else:
+            p90 = mean_slope
+
+        return TerrainStats(
+            mean_elevation_m=None,
+            mean_slope_deg=mean_slope,
+            p90_slope_deg=p90,
+            aspect_deg=aspect,
+            valid_ratio=count / area if area else 0.0,
+        )
+
+    def cell_mean_slope(
+        self, lon_edges: np.ndarray, lat_edges: np.ndarray
+    ) -> np.ndarray:
+        """
+        Mean slope (degrees) of every cell of a separable grid given by its
+        lon edges (west → east) and lat edges (north → south), four table
+        lookups per cell. Cells without data are NaN.
+        """
+        cell_px = min(
+            abs(float(np.diff(lat_edges).mean())) / self.dlat,
+            abs(float(np.diff(lon_edges).mean())) / self.dlon,
+        )
+        level = self._level_for(cell_px, settings.DEM_PYRAMID_MIN_CELL_PIXELS)
+        f = 2**level
+        slope_sat = self.array(level, "slope_sat")
+        count_sat = self.array(level, "count_sat")
+        n_rows, n_cols = slope_sat.shape[0] - 1, slope_sat.shape[1] - 1
+
+        # level pixels whose centre lies in the cell: edge e → first index ≥ e
+        def index(edge_px: np.ndarray, n: int) -> np.ndarray:
+            return np.clip(np.ceil((edge_px + 0.5) / f - 0.5).astype(np.int64), 0, n)
+
+        rows = index((self.lat0 - lat_edges) / self.dlat, n_rows)
+        cols = index((lon_edges - self.lon0) / self.dlon, n_cols)
+
+        counts = _block_sums(count_sat, rows, cols).astype(np.float64)
+        sums = _block_sums(slope_sat, rows, cols).astype(np.float64)
+        out = np.full(counts.shape, np.nan, dtype=np.float64)
+        np.divide(sums, counts * 100.0, out=out, where=counts > 0)
+        return out
+
+
+class PyramidIndex:
+    """All pyramids under a directory, loaded lazily."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pyramids: Optional[List[SlopePyramid]] = None
+
+    @property
+    def pyramids(self) -> List[SlopePyramid]:
+        with self._lock:
+            if self._pyramids is None:
+                self._pyramids = self._scan()
+            return self._pyramids
+
+    def _scan(self) -> List[SlopePyramid]:
+        found: List[SlopePyramid] = []
+        if not os.path.isdir(self.directory):
+            return found
+        for name in sorted(os.listdir(self.directory)):
+            meta_path = os.path.join(self.directory, name, "meta.json")
+            try:
+                with open(meta_path) as f:
+                    found.append(SlopePyramid(os.path.dirname(meta_path), json.load(f)))
+            except (OSError, ValueError, KeyError):
+                continue
+        found.sort(key=lambda p: p.dlat)  # finest first, like DemIndex
+        return found
+
+    def disk_terrain(
+        self, lat: float, lon: float, radius_m: float
+    ) -> Optional[TerrainStats]:
+        """Pyramid answer for a circle, or None if no single pyramid contains it."""
+        for pyramid in self.pyramids:
+            stats = pyramid.disk_terrain(lat, lon, radius_m)
+            if stats is not None:
+                return stats
+        return None
+
+    def cell_mean_slope(
+        self, bbox: Tuple[float, float, float, float], width: int, height: int
+    ) -> np.ndarray:
+        """
+        (height, width) mean slope per cell of a grid over `bbox`; each cell
+        is served by the pyramid containing its centre, NaN where none does.
+        """
+        minx, miny, maxx, maxy = bbox
+        lon_edges = np.linspace(minx, maxx, width + 1)
+        lat_edges = np.linspace(maxy, miny, height + 1)
+        lon_c = (lon_edges[:-1] + lon_edges[1:]) / 2
+        lat_c = (lat_edges[:-1] + lat_edges[1:]) / 2
+
+        out = np.full((height, width), np.nan)
+        for pyramid in self.pyramids:
+            todo = np.isnan(out)
+            if not todo.any():
+                break
+            # cells with centres inside the pyramid form a sub-rectangle
+            in_cols = np.nonzero(
+                (lon_c >= pyramid.lon0 - pyramid.dlon / 2)
+                & (lon_c < pyramid.lon0 + (pyramid.width - 0.5) * pyramid.dlon)
+            )[0]
+            in_rows = np.nonzero(
+                (lat_c <= pyramid.lat0 + pyramid.dlat / 2)
+                & (lat_c > pyramid.lat0 - (pyramid.height - 0.5) * pyramid.dlat)
+            )[0]
+            if in_rows.size == 0 or in_cols.size == 0:
+                continue
+            r0, r1 = in_rows[0], in_rows[-1] + 1
+            c0, c1 = in_cols[0], in_cols[-1] + 1
+            block = pyramid.cell_mean_slope(
+                lon_edges[c0 : c1 + 1], lat_edges[r0 : r1 + 1]
+            )
+            window = out[r0:r1, c0:c1]
+            fill = np.isnan(window)
+            window[fill] = block[fill]
+        return out
+
+
+pyramid_index = PyramidIndex(settings.DEM_PYRAMID_DIR)
+
+
+# ---------- CLI ---------- #
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.dem_pyramid")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser(
+        "build", help="build slope/aspect pyramids for every tile in DEM_DIR"
+    )
+    build.add_argument(
+        "--out", default=settings.DEM_PYRAMID_DIR, help="output directory"
+    )
+    build.add_argument(
+        "--force", action="store_true", help="rebuild up-to-date tiles too"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "build":
+        build_all(args.out, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
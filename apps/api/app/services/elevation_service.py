@@ -1,28 +1,77 @@
+import math
+
+import numpy as np
+
 from app.schemas.site_score import FeatureScore
+from app.services.dem import site_terrain, slope_grid
+from app.services.dem_pyramid import pyramid_index
+from app.services.geometry import EARTH_RADIUS_M
+from app.services.scorer_registry import register_layer, register_scorer
+from app.services.site_context import GridContext, SiteContext
+
+
+def normalize_slope(slope_deg):
+    """
+    Slope in degrees (scalar or array) → 0–1 score:
+    0–5 degrees = excellent (1.0), 20+ degrees = very bad (0.0).
+    """
+    slope = np.asarray(slope_deg, dtype=np.float64)
+    return np.clip(1.0 - (slope - 5.0) / 15.0, 0.0, 1.0)
+
+
+@register_scorer("elevation", weight_setting="W_ELEVATION")
+def compute_elevation_score(ctx: SiteContext, weight: float) -> FeatureScore:
+    # slope/aspect over the AOI disk: precomputed pyramid when one covers it,
+    # otherwise straight from the DEM tiles
+    terrain = ctx.fetch(
+        "terrain",
+        lambda: pyramid_index.disk_terrain(ctx.lat, ctx.lon, ctx.radius_m)
+        or site_terrain(ctx.lat, ctx.lon, ctx.radius_m),
+    )
+    mean_slope_deg = terrain.mean_slope_deg
 
-def compute_elevation_score(
-    lat: float,
-    lon: float,
-    radius_m: float,
-    weight: float,
-) -> FeatureScore:
-    # TODO: call DEM API, compute slope/mean elevation here
-    mean_slope_deg = 3.5  # placeholder
-
-    # Example normalization: 0–5 degrees = excellent (1.0),
-    # 20+ degrees = very bad (0.0)
-    if mean_slope_deg <= 5:
-        normalized = 1.0
-    elif mean_slope_deg >= 20:
-        normalized = 0.0
-    else:
-        normalized = 1.0 - (mean_slope_deg - 5) / 15.0
+    normalized = float(normalize_slope(mean_slope_deg))
 
     contribution = normalized * weight
 
+    details = {
+        "p90_slope_deg": terrain.p90_slope_deg,
+        "dem_coverage": terrain.valid_ratio,
+    }
+    if terrain.mean_elevation_m is not None:
+        details["mean_elevation_m"] = terrain.mean_elevation_m
+    if terrain.aspect_deg is not None:
+        details["aspect_deg"] = terrain.aspect_deg
+
     return FeatureScore(
         raw_value=mean_slope_deg,
         normalized=normalized,
         weight=weight,
         contribution=contribution,
+        details=details,
+    )
+
+
+@register_layer("elevation")
+def elevation_layer(grid: GridContext) -> np.ndarray:
+    minx, miny, maxx, maxy = grid.bbox
+    m_per_deg = math.pi / 180.0 * EARTH_RADIUS_M
+    dx_m = (
+        (maxx - minx)
+        / grid.width
+        * m_per_deg
+        * math.cos(math.radians((miny + maxy) / 2))
     )
+    dy_m = (maxy - miny) / grid.height * m_per_deg
+
+    # mean slope per cell from the pyramids; cells they miss fall back to the DEM
+    slope = pyramid_index.cell_mean_slope(grid.bbox, grid.width, grid.height)
+    missing = np.isnan(slope)
+    if missing.any():
+        lon, lat = grid.cell_centers
+        try:
+            slope = np.where(missing, slope_grid(lon, lat, dx_m, dy_m), slope)
+        except RuntimeError:
+            if missing.all():
+                raise
+    return normalize_slope(slope)
@@ -0,0 +1,99 @@
+# app/services/geometry.py
+
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+# Mean Earth radius, metres
+EARTH_RADIUS_M = 6371000.0
+
+
+# ---------- circle → bbox / polygon / pixel mask ---------- #
+
+
+def circle_to_bbox(
+    lat_deg: float, lon_deg: float, radius_m: float
+) -> Tuple[float, float, float, float]:
+    """
+    Approximate a circle on the Earth's surface with a bbox in EPSG:4326.
+    Good enough for relatively small radii.
+    Returns (min_lon, min_lat, max_lon, max_lat).
+    """
+    R = EARTH_RADIUS_M
+    dlat = (radius_m / R) * (180.0 / math.pi)
+    dlon = dlat / math.cos(math.radians(lat_deg))
+
+    min_lat = lat_deg - dlat
+    max_lat = lat_deg + dlat
+    min_lon = lon_deg - dlon
+    max_lon = lon_deg + dlon
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def circle_to_polygon(
+    lat_deg: float,
+    lon_deg: float,
+    radius_m: float,
+    segments: int = 64,
+) -> Dict[str, Any]:
+    """
+    GeoJSON polygon (EPSG:4326) approximating the circle, for the Process API
+    `bounds.geometry`. The polygon circumscribes the circle, so no pixel of
+    disk_mask falls outside it.
+    """
+    R = EARTH_RADIUS_M
+    r = radius_m / math.cos(math.pi / segments)
+    dlat = (r / R) * (180.0 / math.pi)
+    dlon = dlat / math.cos(math.radians(lat_deg))
+
+    ring = [
+        [
+            lon_deg + dlon * math.cos(2 * math.pi * i / segments),
+            lat_deg + dlat * math.sin(2 * math.pi * i / segments),
+        ]
+        for i in range(segments)
+    ]
+    ring.append(ring[0])
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+@lru_cache(maxsize=64)
+def disk_mask(width: int, height: int) -> np.ndarray:
+    """
+    Boolean (height, width) mask of the ellipse inscribed in the output grid,
+    i.e. the circular AOI when the grid spans circle_to_bbox(...).
+    Pixels count as inside when their centre is. Cached and read-only.
+    """
+    y = (np.arange(height) + 0.5) / height * 2.0 - 1.0
+    x = (np.arange(width) + 0.5) / width * 2.0 - 1.0
+    mask = (x[np.newaxis, :] ** 2 + y[:, np.newaxis] ** 2) <= 1.0
+    mask.flags.writeable = False
+    return mask
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in metres between two points."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+# ---------- local projection: lon/lat ↔ metres around a site ---------- #
+
+def to_local_m(
+    lon: np.ndarray, lat: np.ndarray, lon0: float, lat0: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Equirectangular projection centred on (lon0, lat0): metres east/north of
+    the centre. Accurate to well under 1% within a few tens of kilometres.
+    """
+    k = math.pi / 180.0 * EARTH_RADIUS_M
+    x = (np.asarray(lon, dtype=np.float64) - lon0) * k * math.cos(math.radians(lat0))
+    y = (np.asarray(lat, dtype=np.float64) - lat0) * k
+    return x, y
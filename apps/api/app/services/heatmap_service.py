@@ -0,0 +1,158 @@
+# app/services/heatmap_service.py
+
+from __future__ import annotations
+
+import io
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services.geometry import EARTH_RADIUS_M
+from app.services.scorer_registry import registered_scorers, rescale_to_total
+from app.services.site_context import GridContext
+
+# imported for their @register_layer side effect
+from app.services import cloud_service, elevation_service, infra_service  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+Bbox = Tuple[float, float, float, float]
+
+
+@dataclass
+class Heatmap:
+    bbox: Bbox
+    score: np.ndarray  # (height, width) float32, NaN = no data
+    layers: Dict[str, np.ndarray] = field(default_factory=dict)  # normalized 0–1
+    degraded: List[str] = field(default_factory=list)  # layers that failed
+    # layers that succeeded with some cells missing, and why
+    partial: Dict[str, str] = field(default_factory=dict)
+
+
+def plan_grid(bbox: Bbox, cell_size_m: float) -> Tuple[int, int]:
+    """(width, height) in cells of about `cell_size_m` over `bbox`."""
+    minx, miny, maxx, maxy = bbox
+    if not (minx < maxx and miny < maxy):
+        raise ValueError("bbox must be (min_lon, min_lat, max_lon, max_lat)")
+
+    m_per_deg = math.pi / 180.0 * EARTH_RADIUS_M
+    mid_lat = math.radians((miny + maxy) / 2.0)
+    width = math.ceil((maxx - minx) * m_per_deg * math.cos(mid_lat) / cell_size_m)
+    height = math.ceil((maxy - miny) * m_per_deg / cell_size_m)
+
+    if max(width, height) > settings.HEATMAP_MAX_SIDE:
+        raise ValueError(
+            f"Grid of {width}x{height} cells exceeds HEATMAP_MAX_SIDE "
+            f"({settings.HEATMAP_MAX_SIDE}); use a larger cell size"
+        )
+    return max(width, 1), max(height, 1)
+
+
+def combine_layers(
+    layers: Dict[str, np.ndarray], weights: Dict[str, float]
+) -> np.ndarray:
+    """
+    Weighted sum of normalized layers on the same scale as the site score.
+    `weights` holds every configured scorer's weight; the weight of layers
+    that failed (missing from `layers`) or have no data in a cell is spread
+    over the others, with the same rescaling as compute_site_score. Cells
+    with no data in any layer stay NaN.
+    """
+    total_weight = sum(weights.values())
+    num = None
+    den = None
+    for name, layer in layers.items():
+        ok = np.isfinite(layer)
+        w = weights[name]
+        contrib = np.where(ok, layer * w, 0.0)
+        have = np.where(ok, w, 0.0)
+        num = contrib if num is None else num + contrib
+        den = have if den is None else den + have
+
+    return rescale_to_total(num, den, total_weight, empty=np.nan).astype(np.float32)
+
+
+def compute_heatmap(
+    bbox: Bbox,
+    cell_size_m: float,
+    start_date: date,
+    end_date: date,
+) -> Heatmap:
+    """
+    Suitability score for every cell of a grid over `bbox`.
+
+    Each registered scorer's layer computes its whole grid in one vectorised
+    pass (the cloud layer from one set of Process API requests). Layers run
+    concurrently and are combined with the scorers' weights. A failing layer
+    is left out and listed in `degraded`; one that lost part of its input
+    (NaN cells, rescaled like missing data) is listed in `partial`.
+    """
+    width, height = plan_grid(bbox, cell_size_m)
+    grid = GridContext(bbox, width, height, start_date, end_date)
+
+    scorers = registered_scorers()
+    specs = {name: spec for name, spec in scorers.items() if spec.layer is not None}
+    if not specs:
+        raise RuntimeError("No heatmap layers registered")
+
+    layers: Dict[str, np.ndarray] = {}
+    degraded: List[str] = []
+    with ThreadPoolExecutor(
+        max_workers=len(specs), thread_name_prefix="heatmap"
+    ) as pool:
+        futures = {name: pool.submit(spec.layer, grid) for name, spec in specs.items()}
+        for name, future in futures.items():
+            try:
+                layer = np.asarray(future.result(), dtype=np.float32)
+            except Exception:
+                logger.warning("Heatmap layer %s failed", name, exc_info=True)
+                degraded.append(name)
+                continue
+            if layer.shape != (height, width):
+                logger.error("Heatmap layer %s has shape %s", name, layer.shape)
+                degraded.append(name)
+                continue
+            layers[name] = layer
+
+    if not layers:
+        raise RuntimeError("All heatmap layers failed")
+
+    # all scorers' weights, so the scale matches the site score; a scorer
+    # without a layer counts as degraded
+    degraded.extend(name for name in scorers if name not in specs)
+    score = combine_layers(
+        layers, {name: spec.weight for name, spec in scorers.items()}
+    )
+    partial = {name: why for name, why in grid.partial.items() if name in layers}
+    return Heatmap(
+        bbox=bbox, score=score, layers=layers, degraded=degraded, partial=partial
+    )
+
+
+# ---------- encoders ---------- #
+
+def encode_png(score: np.ndarray) -> bytes:
+    """8-bit grey (score * 255) plus alpha; no-data cells are transparent."""
+    ok = np.isfinite(score)
+    grey = np.zeros(score.shape, dtype=np.uint8)
+    grey[ok] = np.round(np.clip(score[ok], 0.0, 1.0) * 255).astype(np.uint8)
+    alpha = np.where(ok, 255, 0).astype(np.uint8)
+
+    buf = io.BytesIO()
+    Image.fromarray(np.dstack([grey, alpha]), mode="LA").save(
+        buf, format="PNG", optimize=True
+    )
+    return buf.getvalue()
+
+
+def encode_npy(score: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    np.save(buf, score.astype(np.float32, copy=False))
+    return buf.getvalue()
@@ -0,0 +1,241 @@
+# app/services/infra_index.py
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+import shapely
+from shapely import wkb
+from shapely.geometry import Point, Polygon
+from shapely.geometry.base import BaseGeometry
+
+from app.core.config import settings
+from app.services.geometry import EARTH_RADIUS_M
+
+if TYPE_CHECKING:
+    from app.services.infra_store import FlatInfraIndex
+
+logger = logging.getLogger(__name__)
+
+# Nearest-infrastructure lookups from a local OSM extract.
+#
+# Geometries are loaded once per kind ("roads", "grid"), projected to Web
+# Mercator and put in a shapely STRtree. Mercator stretches distances by
+# 1/cos(lat), so distances are scaled back by cos(lat) of the query point;
+# within the ~20 km that matter for scoring the error is well below 1%.
+#
+# If a flat index was built offline (see infra_store), it is memory-mapped
+# instead, so worker start-up doesn't re-read and re-index the extract.
+
+ROADS = "roads"
+GRID = "grid"
+
+
+# ---------- projection ---------- #
+
+def to_mercator(lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    """(N, 2) Web Mercator metres for lon/lat arrays."""
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.0, 85.0)
+    x = EARTH_RADIUS_M * np.radians(lon)
+    y = EARTH_RADIUS_M * np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+    return np.column_stack([x.ravel(), y.ravel()])
+
+
+def _project(geometries: List[BaseGeometry]) -> np.ndarray:
+    return shapely.transform(
+        np.asarray(geometries, dtype=object), lambda xy: to_mercator(xy[:, 0], xy[:, 1])
+    )
+
+
+# ---------- loaders ---------- #
+
+def _gpkg_wkb(blob: bytes) -> bytes:
+    """Strips the GeoPackage binary header, returning the WKB geometry."""
+    if blob[:2] != b"GP":
+        raise RuntimeError("Not a GeoPackage geometry blob")
+    flags = blob[3]
+    envelope = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}[(flags >> 1) & 0x07]
+    return blob[8 + envelope :]
+
+
+def load_gpkg(path: str, layers: Dict[str, str]) -> List[BaseGeometry]:
+    """
+    Geometries from a GeoPackage (EPSG:4326), read with sqlite3 + shapely.
+    `layers` maps table name → SQL WHERE clause selecting the features,
+    e.g. {"lines": "highway IS NOT NULL"} for an ogr2ogr OSM export.
+    """
+    geometries: List[BaseGeometry] = []
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for table, where in layers.items():
+            row = con.execute(
+                "SELECT column_name, srs_id FROM gpkg_geometry_columns "
+                "WHERE table_name = ?",
+                (table,),
+            ).fetchone()
+            if row is None:
+                logger.warning("GeoPackage %s has no layer %s", path, table)
+                continue
+            column, srs_id = row
+            if srs_id != 4326:
+                raise RuntimeError(
+                    f"{path}:{table} is in EPSG:{srs_id}, expected EPSG:4326"
+                )
+
+            sql = f'SELECT "{column}" FROM "{table}"'
+            if where:
+                sql += f" WHERE {where}"
+            for (blob,) in con.execute(sql):
+                if blob is None:
+                    continue
+                geom = wkb.loads(_gpkg_wkb(blob))
+                if not geom.is_empty:
+                    geometries.append(geom)
+    finally:
+        con.close()
+    return geometries
+
+
+def load_pbf(path: str, kind: str) -> List[BaseGeometry]:
+    """
+    Geometries from an OSM .pbf extract. Needs the optional `osmium`
+    package (pip install osmium).
+
+    roads: ways whose highway tag is in INFRA_ROAD_CLASSES.
+    grid: power lines / cables and substations (nodes and closed ways).
+    """
+    try:
+        import osmium
+    except ImportError as e:
+        raise RuntimeError("Reading .pbf extracts needs the osmium package") from e
+
+    road_classes = set(settings.INFRA_ROAD_CLASSES)
+    line_values = {"line", "minor_line", "cable"}
+    geometries: List[BaseGeometry] = []
+
+    class Handler(osmium.SimpleHandler):
+        def node(self, n) -> None:
+            if kind == GRID and n.tags.get("power") == "substation":
+                geometries.append(Point(n.location.lon, n.location.lat))
+
+        def way(self, w) -> None:
+            if kind == ROADS:
+                if w.tags.get("highway") not in road_classes:
+                    return
+            else:
+                power = w.tags.get("power")
+                if power not in line_values and power != "substation":
+                    return
+            try:
+                coords = [(nd.lon, nd.lat) for nd in w.nodes]
+            except osmium.InvalidLocationError:
+                return
+            if len(coords) < 2:
+                return
+            if (
+                kind == GRID
+                and w.tags.get("power") == "substation"
+                and w.is_closed()
+                and len(coords) >= 4
+            ):
+                geometries.append(Polygon(coords))
+            else:
+                geometries.append(shapely.LineString(coords))
+
+    Handler().apply_file(path, locations=True)
+    return geometries
+
+
+def load_geometries(kind: str) -> List[BaseGeometry]:
+    path = settings.INFRA_DATA_PATH
+    if not path:
+        raise RuntimeError("No infrastructure data configured (INFRA_DATA_PATH)")
+    if path.lower().endswith(".pbf"):
+        return load_pbf(path, kind)
+    layers = settings.INFRA_ROAD_LAYERS if kind == ROADS else settings.INFRA_GRID_LAYERS
+    return load_gpkg(path, layers)
+
+
+# ---------- index ---------- #
+
+class InfraIndex:
+    """STRtree over projected geometries with nearest-distance queries."""
+
+    def __init__(self, geometries: List[BaseGeometry]) -> None:
+        self.size = len(geometries)
+        self._tree = shapely.STRtree(_project(geometries)) if geometries else None
+
+    def nearest_m(
+        self, lon: np.ndarray, lat: np.ndarray, max_distance_m: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        Distance in metres from each point to the nearest geometry, for any
+        number of points in one vectorised query. inf where nothing lies
+        within `max_distance_m` (default INFRA_MAX_SEARCH_M).
+        """
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        out = np.full(lon.shape, np.inf)
+        if self._tree is None or lon.size == 0:
+            return out
+
+        if max_distance_m is None:
+            max_distance_m = settings.INFRA_MAX_SEARCH_M
+        scale = np.cos(np.radians(lat.ravel()))  # mercator metres → metres
+        points = shapely.points(to_mercator(lon, lat))
+
+        (point_idx, _), dist = self._tree.query_nearest(
+            points,
+            max_distance=max_distance_m / float(scale.min()),
+            return_distance=True,
+            all_matches=False,
+        )
+        flat = out.ravel()
+        flat[point_idx] = dist * scale[point_idx]
+        flat[flat > max_distance_m] = np.inf
+        return flat.reshape(lon.shape)
+
+
+class InfraIndexes:
+    """
+    Lazily loaded index per infrastructure kind, shared process-wide: the
+    prebuilt flat index when there is one, else an STRtree over the extract.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, "InfraIndex | FlatInfraIndex"] = {}
+
+    def get(self, kind: str) -> "InfraIndex | FlatInfraIndex":
+        from app.services.infra_store import open_store  # imports this module
+
+        with self._lock:
+            index = self._indexes.get(kind)
+            if index is None:
+                index = open_store(kind)
+                if index is not None:
+                    logger.info(
+                        "Mapped prebuilt %s index (%d segments)", kind, index.size
+                    )
+                    self._indexes[kind] = index
+                    return index
+                geometries = load_geometries(kind)
+                logger.info("Indexed %d %s geometries", len(geometries), kind)
+                index = self._indexes[kind] = InfraIndex(geometries)
+            return index
+
+    def nearest_m(self, kind: str, lon, lat) -> np.ndarray:
+        return self.get(kind).nearest_m(lon, lat)
+
+
+infra_indexes = InfraIndexes()
+
+
+def nearest_distance_m(kind: str, lon: float, lat: float) -> float:
+    """Scalar convenience wrapper; inf when nothing is within range."""
+    return float(infra_indexes.nearest_m(kind, lon, lat)[0])
@@ -1,51 +1,65 @@
+import math
+
+import numpy as np
+
 from app.schemas.site_score import FeatureScore
+from app.services.infra_index import GRID, ROADS, infra_indexes
+from app.services.scorer_registry import register_layer, register_scorer
+from app.services.site_context import GridContext, SiteContext
 
-def compute_road_access_score(
-    lat: float,
-    lon: float,
-    weight: float,
-) -> FeatureScore:
-    # TODO: query road data (OSM / some API) and compute nearest road distance
-    distance_m = 800  # placeholder
 
-    # Example normalization: 0–200m = 1.0, >2000m = 0.0
-    if distance_m <= 200:
-        normalized = 1.0
-    elif distance_m >= 2000:
-        normalized = 0.0
-    else:
-        normalized = 1.0 - (distance_m - 200) / 1800.0
+def normalize_road_distance(distance_m):
+    """Distance (scalar or array) → 0–1: 0–200m = 1.0, >2000m = 0.0."""
+    d = np.asarray(distance_m, dtype=np.float64)
+    return np.clip(1.0 - (d - 200.0) / 1800.0, 0.0, 1.0)
+
+
+def normalize_grid_distance(distance_m):
+    """Like roads, but stricter: 0–500m = 1.0, >5000m = 0.0."""
+    d = np.asarray(distance_m, dtype=np.float64)
+    return np.clip(1.0 - (d - 500.0) / 4500.0, 0.0, 1.0)
+
 
+def _distance_score(
+    distance_m: float, normalized: float, weight: float
+) -> FeatureScore:
     contribution = normalized * weight
 
     return FeatureScore(
-        raw_value=distance_m,
+        # None: nothing within INFRA_MAX_SEARCH_M
+        raw_value=distance_m if math.isfinite(distance_m) else None,
         normalized=normalized,
         weight=weight,
         contribution=contribution,
     )
 
-def compute_grid_access_score(
-    lat: float,
-    lon: float,
-    weight: float,
-) -> FeatureScore:
-    # TODO: query gridline data, compute nearest line / substation
-    distance_m = 3000  # placeholder
 
-    # normalization example similar to roads, but maybe stricter
-    if distance_m <= 500:
-        normalized = 1.0
-    elif distance_m >= 5000:
-        normalized = 0.0
-    else:
-        normalized = 1.0 - (distance_m - 500) / 4500.0
+@register_scorer("road_access", weight_setting="W_ROAD")
+def compute_road_access_score(ctx: SiteContext, weight: float) -> FeatureScore:
+    # nearest road from the local OSM extract (app/services/infra_index.py)
+    distance_m = float(infra_indexes.nearest_m(ROADS, ctx.lon, ctx.lat)[0])
 
-    contribution = normalized * weight
+    normalized = float(normalize_road_distance(distance_m))
 
-    return FeatureScore(
-        raw_value=distance_m,
-        normalized=normalized,
-        weight=weight,
-        contribution=contribution,
-    )
+    return _distance_score(distance_m, normalized, weight)
+
+@register_scorer("grid_access", weight_setting="W_GRID")
+def compute_grid_access_score(ctx: SiteContext, weight: float) -> FeatureScore:
+    # nearest power line / cable / substation
+    distance_m = float(infra_indexes.nearest_m(GRID, ctx.lon, ctx.lat)[0])
+
+    normalized = float(normalize_grid_distance(distance_m))
+
+    return _distance_score(distance_m, normalized, weight)
+
+
+@register_layer("road_access")
+def road_access_layer(grid: GridContext) -> np.ndarray:
+    lon, lat = grid.cell_centers
+    return normalize_road_distance(infra_indexes.nearest_m(ROADS, lon, lat))
+
+
+@register_layer("grid_access")
+def grid_access_layer(grid: GridContext) -> np.ndarray:
+    lon, lat = grid.cell_centers
+    return normalize_grid_distance(infra_indexes.nearest_m(GRID, lon, lat))
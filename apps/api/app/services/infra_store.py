@@ -0,0 +1,326 @@
+# app/services/infra_store.py
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from app.core.config import settings
+from app.services.infra_index import GRID, ROADS, load_geometries, to_mercator
+
+logger = logging.getLogger(__name__)
+
+# Flat-array infrastructure index, built offline and memory-mapped by every
+# worker:
+#
+#     python -m app.services.infra_store build
+#
+# One directory per kind under INFRA_STORE_DIR:
+#   segments.npy   int32 (N, 4): x0, y0, x1, y1 in Web Mercator decimetres
+#                  (points are zero-length segments)
+#   cell_start.npy int64 (nx * ny + 1): CSR offsets into cell_items
+#   cell_items.npy int32: segment ids per uniform grid cell, cell by cell
+#   meta.json      grid origin / size and build info
+#
+# A segment is listed in every cell its bounding box touches. Nearest
+# queries search rings of cells around the point until no closer segment
+# can exist; everything is read straight from the page cache.
+
+UNIT_M = 0.1  # mercator metres per stored integer unit
+_QUERY_CHUNK = 8192  # points per ring search; candidates are split further
+# rough working memory per (point, segment) candidate pair in a distance pass:
+# ids, gathered segment coordinates and float64 temporaries
+_PAIR_BYTES = 128
+
+
+# ---------- build ---------- #
+
+def _segments(geometries: List[BaseGeometry]) -> np.ndarray:
+    """(N, 4) float64 mercator segments of lines, polygon rings and points."""
+    parts = shapely.get_parts(np.asarray(geometries, dtype=object))
+    # polygons → their rings, so no segment jumps between rings
+    polys = shapely.get_type_id(parts) == 3
+    if polys.any():
+        rings = shapely.get_parts(shapely.boundary(parts[polys]))
+        parts = np.concatenate([parts[~polys], rings])
+
+    coords, index = shapely.get_coordinates(parts, return_index=True)
+    xy = to_mercator(coords[:, 0], coords[:, 1])
+
+    same = index[1:] == index[:-1]
+    segs = np.hstack([xy[:-1][same], xy[1:][same]])
+
+    # single-coordinate parts (points) become zero-length segments
+    counts = np.bincount(index, minlength=len(parts))
+    single = np.nonzero(counts == 1)[0]
+    if single.size:
+        first = np.searchsorted(index, single)
+        segs = np.vstack([segs, np.hstack([xy[first], xy[first]])])
+    return segs
+
+
+def _save(path: str, arr: np.ndarray) -> None:
+    # write next to the target and rename, so running workers never map a torn file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def build_kind(kind: str, out_root: str, cell_m: float) -> int:
+    """Builds the flat index of one kind; returns the segment count."""
+    out_dir = os.path.join(out_root, kind)
+    os.makedirs(out_dir, exist_ok=True)
+
+    segs = _segments(load_geometries(kind))
+    if segs.size == 0:
+        segs = np.zeros((0, 4))
+
+    seg_i = np.rint(segs / UNIT_M).astype(np.int32)
+    segs = seg_i.astype(np.float64) * UNIT_M  # index what queries will read back
+
+    if len(segs):
+        x_min = float(np.minimum(segs[:, 0], segs[:, 2]).min())
+        y_min = float(np.minimum(segs[:, 1], segs[:, 3]).min())
+        x_max = float(np.maximum(segs[:, 0], segs[:, 2]).max())
+        y_max = float(np.maximum(segs[:, 1], segs[:, 3]).max())
+    else:
+        x_min = y_min = x_max = y_max = 0.0
+    nx = int((x_max - x_min) // cell_m) + 1
+    ny = int((y_max - y_min) // cell_m) + 1
+
+    # cell range of every segment's bbox, expanded to (cell, segment) pairs
+    cx0 = ((np.minimum(segs[:, 0], segs[:, 2]) - x_min) // cell_m).astype(np.int64)
+    cx1 = ((np.maximum(segs[:, 0], segs[:, 2]) - x_min) // cell_m).astype(np.int64)
+    cy0 = ((np.minimum(segs[:, 1], segs[:, 3]) - y_min) // cell_m).astype(np.int64)
+    cy1 = ((np.maximum(segs[:, 1], segs[:, 3]) - y_min) // cell_m).astype(np.int64)
+    wx, wy = cx1 - cx0 + 1, cy1 - cy0 + 1
+    per_seg = wx * wy
+
+    seg_ids = np.repeat(np.arange(len(segs), dtype=np.int64), per_seg)
+    k = np.arange(per_seg.sum()) - np.repeat(np.cumsum(per_seg) - per_seg, per_seg)
+    cells = (np.repeat(cy0, per_seg) + k // np.repeat(wx, per_seg)) * nx + (
+        np.repeat(cx0, per_seg) + k % np.repeat(wx, per_seg)
+    )
+
+    order = np.argsort(cells, kind="stable")
+    cell_items = seg_ids[order].astype(np.int32)
+    cell_start = np.zeros(nx * ny + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cells, minlength=nx * ny), out=cell_start[1:])
+
+    _save(os.path.join(out_dir, "segments.npy"), seg_i)
+    _save(os.path.join(out_dir, "cell_items.npy"), cell_items)
+    _save(os.path.join(out_dir, "cell_start.npy"), cell_start)
+
+    meta = {
+        "kind": kind,
+        "source": os.path.abspath(settings.INFRA_DATA_PATH or ""),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "unit_m": UNIT_M,
+        "cell_m": cell_m,
+        "x_min": x_min,
+        "y_min": y_min,
+        "nx": nx,
+        "ny": ny,
+        "segments": int(len(segs)),
+    }
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, "meta.json"))
+    return len(segs)
+
+
+# ---------- query ---------- #
+
+def _point_segment_distance(px, py, segs: np.ndarray) -> np.ndarray:
+    x0, y0, x1, y1 = segs[:, 0], segs[:, 1], segs[:, 2], segs[:, 3]
+    dx, dy = x1 - x0, y1 - y0
+    len2 = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(len2 > 0, ((px - x0) * dx + (py - y0) * dy) / len2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(px - (x0 + t * dx), py - (y0 + t * dy))
+
+
+def _ring(k: int) -> np.ndarray:
+    """(M, 2) cell offsets at Chebyshev distance exactly k."""
+    if k == 0:
+        return np.zeros((1, 2), dtype=np.int64)
+    r = np.arange(-k, k + 1)
+    top = np.column_stack([r, np.full_like(r, -k)])
+    bottom = np.column_stack([r, np.full_like(r, k)])
+    inner = np.arange(-k + 1, k)
+    left = np.column_stack([np.full_like(inner, -k), inner])
+    right = np.column_stack([np.full_like(inner, k), inner])
+    return np.vstack([top, bottom, left, right])
+
+
+class FlatInfraIndex:
+    """Read side of one kind's flat index; arrays are memory-mapped read-only."""
+
+    def __init__(self, directory: str) -> None:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        self.meta = meta
+        self.unit_m = meta["unit_m"]
+        self.cell_m = meta["cell_m"]
+        self.x_min = meta["x_min"]
+        self.y_min = meta["y_min"]
+        self.nx = meta["nx"]
+        self.ny = meta["ny"]
+        self.size = meta["segments"]
+
+        self._segments = np.load(os.path.join(directory, "segments.npy"), mmap_mode="r")
+        self._cell_start = np.load(
+            os.path.join(directory, "cell_start.npy"), mmap_mode="r"
+        )
+        self._cell_items = np.load(
+            os.path.join(directory, "cell_items.npy"), mmap_mode="r"
+        )
+
+    def nearest_m(
+        self, lon: np.ndarray, lat: np.ndarray, max_distance_m: Optional[float] = None
+    ) -> np.ndarray:
+        """Same contract as InfraIndex.nearest_m."""
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        out = np.full(lon.size, np.inf)
+        if self.size == 0 or lon.size == 0:
+            return out.reshape(lon.shape)
+        if max_distance_m is None:
+            max_distance_m = settings.INFRA_MAX_SEARCH_M
+
+        xy = to_mercator(lon, lat)
+        scale = np.cos(np.radians(lat.ravel()))  # mercator metres → metres
+        limit = max_distance_m / scale  # per point, in mercator metres
+
+        for s in range(0, lon.size, _QUERY_CHUNK):
+            chunk = slice(s, s + _QUERY_CHUNK)
+            out[chunk] = self._nearest_mercator(xy[chunk], limit[chunk]) * scale[chunk]
+
+        out[out > max_distance_m] = np.inf
+        return out.reshape(lon.shape)
+
+    def _nearest_mercator(self, xy: np.ndarray, limit: np.ndarray) -> np.ndarray:
+        n = len(xy)
+        best = np.full(n, np.inf)
+        cx = np.floor((xy[:, 0] - self.x_min) / self.cell_m).astype(np.int64)
+        cy = np.floor((xy[:, 1] - self.y_min) / self.cell_m).astype(np.int64)
+        active = np.arange(n)
+
+        k = 0
+        max_k = int(np.ceil(limit.max() / self.cell_m)) + 1
+        while active.size and k <= max_k:
+            ring = _ring(k)
+            # (active point, ring cell) pairs that fall on the grid
+            pts = np.repeat(active, len(ring))
+            gx = cx[pts] + np.tile(ring[:, 0], active.size)
+            gy = cy[pts] + np.tile(ring[:, 1], active.size)
+            on_grid = (gx >= 0) & (gx < self.nx) & (gy >= 0) & (gy < self.ny)
+            pts, cells = pts[on_grid], (gy * self.nx + gx)[on_grid]
+
+            starts = self._cell_start[cells]
+            lens = self._cell_start[cells + 1] - starts
+            self._scan(xy, best, pts, starts, lens)
+
+            # anything outside ring k is at least k cells away
+            done = (best[active] <= k * self.cell_m) | (k * self.cell_m > limit[active])
+            active = active[~done]
+            k += 1
+
+        return best
+
+    def _scan(
+        self,
+        xy: np.ndarray,
+        best: np.ndarray,
+        pts: np.ndarray,
+        starts: np.ndarray,
+        lens: np.ndarray,
+    ) -> None:
+        """
+        Lowers `best` with the distances to the segments of each (point,
+        cell) pair. Pairs are processed in runs of at most about
+        INFRA_QUERY_MAX_BYTES of candidates, so dense cells can't blow up
+        memory; a single cell over the budget is still scanned in one pass.
+        """
+        if not lens.size:
+            return
+        max_pairs = max(1, settings.INFRA_QUERY_MAX_BYTES // _PAIR_BYTES)
+        cum = np.cumsum(lens)
+        cuts = np.searchsorted(
+            cum, np.arange(max_pairs, int(cum[-1]), max_pairs), side="left"
+        )
+        bounds = np.unique(np.concatenate([[0], cuts + 1, [lens.size]]))
+        bounds = bounds[bounds <= lens.size]
+
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            run_lens = lens[a:b]
+            total = int(run_lens.sum())
+            if not total:
+                continue
+            pair_pts = np.repeat(pts[a:b], run_lens)
+            offsets = np.cumsum(run_lens) - run_lens - starts[a:b]
+            items = np.arange(total) - np.repeat(offsets, run_lens)
+            segs = (
+                self._segments[self._cell_items[items]].astype(np.float64) * self.unit_m
+            )
+            d = _point_segment_distance(xy[pair_pts, 0], xy[pair_pts, 1], segs)
+            np.minimum.at(best, pair_pts, d)
+
+
+def open_store(kind: str) -> Optional[FlatInfraIndex]:
+    """The prebuilt index of `kind`, or None if it was never built."""
+    directory = os.path.join(settings.INFRA_STORE_DIR, kind)
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        return None
+    return FlatInfraIndex(directory)
+
+
+# ---------- CLI ---------- #
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.services.infra_store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser(
+        "build", help="build flat road / grid indexes from INFRA_DATA_PATH"
+    )
+    build.add_argument(
+        "--out", default=settings.INFRA_STORE_DIR, help="output directory"
+    )
+    build.add_argument(
+        "--cell-m",
+        type=float,
+        default=settings.INFRA_STORE_CELL_M,
+        help="grid cell size (m)",
+    )
+    build.add_argument(
+        "--kind", choices=[ROADS, GRID], action="append", help="only these kinds"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "build":
+        for kind in args.kind or [ROADS, GRID]:
+            t0 = time.perf_counter()
+            n = build_kind(kind, args.out, args.cell_m)
+            logger.info(
+                "Built %s index: %d segments in %.1fs",
+                kind,
+                n,
+                time.perf_counter() - t0,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# app/services/raster_cache.py
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# temp files older than this are left over from a crashed write; younger
+# ones may still be in progress in another worker
+_ORPHAN_TMP_AGE_S = 3600.0
+
+
+class RasterCache:
+    """
+    Content-addressed on-disk cache for decoded Process API rasters.
+
+    - Keys are the SHA-256 of the canonical JSON request payload, so bbox,
+      dates, output size and evalscript are all part of the key.
+    - Values are stored as .npy files and loaded memory-mapped (read-only).
+    - Total size is bounded; least recently used files are evicted first.
+      Recency survives restarts because hits touch the file's mtime.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, LRU first
+        self._total_bytes = 0
+        self._loaded = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ------------------------ helpers ------------------------ #
+
+    @staticmethod
+    def key_for(payload: Dict[str, Any]) -> str:
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.npy")
+
+    def _load_index(self) -> None:
+        """
+        Scans the cache directory once, ordering entries by mtime and
+        removing orphaned temp files.
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+
+        found = []
+        orphan_before = time.time() - _ORPHAN_TMP_AGE_S
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith((".npy", ".tmp")):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    if name.endswith(".tmp"):
+                        if st.st_mtime < orphan_before:
+                            os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                found.append((st.st_mtime, name[:-4], st.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    # ------------------------ public API ------------------------ #
+
+    def load_index(self) -> None:
+        """Indexes the cache directory now instead of on first use."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._load_index()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        try:
+            arr = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            # missing, evicted by another worker, or a torn file
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._load_index()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return arr
+
+    def put(self, key: str, arr: np.ndarray) -> None:
+        if not self.enabled:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write to a temp file first so readers never see a partial array
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(arr))
+            os.replace(tmp, path)
+            size = os.path.getsize(path)
+        except OSError:
+            logger.warning("Could not write raster cache entry %s", key, exc_info=True)
+            return
+
+        with self._lock:
+            self._load_index()
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._load_index()
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Singleton instance to use from other modules
+raster_cache = RasterCache(
+    directory=settings.RASTER_CACHE_DIR,
+    max_bytes=settings.RASTER_CACHE_MAX_BYTES,
+    enabled=settings.RASTER_CACHE_ENABLED,
+)
@@ -0,0 +1,92 @@
+# app/services/scorer_registry.py
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.schemas.site_score import FeatureScore
+    from app.services.site_context import GridContext, SiteContext
+
+# A scorer turns the shared per-site context and its weight into a FeatureScore
+ScorerFn = Callable[["SiteContext", float], "FeatureScore"]
+# A layer is the vectorised form: a (height, width) array of 0–1 scores
+# (NaN = no data) for every cell of a heatmap grid
+LayerFn = Callable[["GridContext"], "np.ndarray"]
+
+
+@dataclass(frozen=True)
+class ScorerSpec:
+    name: str  # key in SiteScoreResponse.features
+    fn: ScorerFn
+    weight_setting: Optional[str] = None  # Settings field holding the weight
+    default_weight: float = 0.0
+    layer: Optional[LayerFn] = None  # see register_layer
+
+    @property
+    def weight(self) -> float:
+        if self.weight_setting is None:
+            return self.default_weight
+        return float(getattr(settings, self.weight_setting, self.default_weight))
+
+
+_registry: Dict[str, ScorerSpec] = {}
+
+
+def register_scorer(
+    name: str,
+    weight_setting: Optional[str] = None,
+    default_weight: float = 0.0,
+) -> Callable[[ScorerFn], ScorerFn]:
+    """
+    Decorator adding a scorer to the site score. Scorers are called
+    concurrently, each with the same SiteContext, so they should get shared
+    inputs (geometry, masks, remote fetches) from the context.
+    """
+
+    def decorator(fn: ScorerFn) -> ScorerFn:
+        if name in _registry:
+            raise ValueError(f"Scorer {name!r} is already registered")
+        _registry[name] = ScorerSpec(name, fn, weight_setting, default_weight)
+        return fn
+
+    return decorator
+
+
+def register_layer(name: str) -> Callable[[LayerFn], LayerFn]:
+    """
+    Decorator attaching a heatmap layer to the already registered scorer
+    `name`; the layer is weighted like the scorer.
+    """
+
+    def decorator(fn: LayerFn) -> LayerFn:
+        if name not in _registry:
+            raise ValueError(f"Register scorer {name!r} before its layer")
+        _registry[name] = replace(_registry[name], layer=fn)
+        return fn
+
+    return decorator
+
+
+def registered_scorers() -> Dict[str, ScorerSpec]:
+    """Registered scorers, in registration order."""
+    return dict(_registry)
+
+
+def rescale_to_total(ok_sum, ok_weight, total_weight: float, empty: float = 0.0):
+    """
+    Weighted score from the features that succeeded: their contribution sum
+    `ok_sum` rescaled from their weight `ok_weight` to the total configured
+    weight, so failed features' weight is spread over the others. `empty`
+    where nothing succeeded. Scalars or arrays (e.g. per heatmap cell).
+    """
+    ok_sum = np.asarray(ok_sum, dtype=np.float64)
+    ok_weight = np.asarray(ok_weight, dtype=np.float64)
+    out = np.full(np.broadcast(ok_sum, ok_weight).shape, empty, dtype=np.float64)
+    np.divide(ok_sum * total_weight, ok_weight, out=out, where=ok_weight > 0)
+    return out
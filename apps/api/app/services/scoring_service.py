@@ -1,65 +1,270 @@
-from datetime import date
+import logging
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
 from app.schemas.site_score import (
+    FeatureScore,
+    SiteLocation,
     SiteScoreRequest,
     SiteScoreResponse,
+    TimeRange,
 )
-from app.services.cloud_service import compute_cloud_score
-from app.services.elevation_service import compute_elevation_score
-from app.services.infra_service import (
-    compute_road_access_score,
-    compute_grid_access_score,
-)
+from app.services.geometry import EARTH_RADIUS_M, circle_to_bbox
+from app.services.scorer_registry import registered_scorers, rescale_to_total
+from app.services.site_context import SiteContext, SiteGroup
 from app.core.config import settings
 
+# imported for their @register_scorer side effect; order = response order
+from app.services import cloud_service, elevation_service, infra_service  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# Scorer pool of interactive /site-score requests: SCORER_MAX_WORKERS /
+# number of scorers requests run at once, later ones queue. Batch scoring
+# has its own pool (see score_sites), so a batch never starves them.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.SCORER_MAX_WORKERS, thread_name_prefix="scorer"
+)
+
+
+# ---------- scorer execution engine ---------- #
+
+class _Started:
+    """Set by a scorer when a worker picks it up, with the start time."""
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.at = 0.0
+
+
+def _timed(
+    fn: Callable[[], FeatureScore], started: _Started
+) -> Tuple[FeatureScore, float]:
+    started.at = t0 = time.perf_counter()
+    started.event.set()
+    score = fn()
+    return score, (time.perf_counter() - t0) * 1000.0
+
+
+def _degraded(
+    weight: float, status: str, elapsed_ms: float, error: str
+) -> FeatureScore:
+    return FeatureScore(
+        raw_value=None,
+        normalized=0.0,
+        weight=weight,
+        contribution=0.0,
+        status=status,
+        elapsed_ms=elapsed_ms,
+        error=error,
+    )
+
+
+def run_scorers(
+    scorers: Dict[str, Tuple[Callable[[], FeatureScore], float]],
+    executor: ThreadPoolExecutor = _executor,
+) -> Dict[str, FeatureScore]:
+    """
+    Runs independent scorers concurrently on `executor`.
+
+    `scorers` maps a feature name to (zero-arg scorer, weight). Each scorer
+    gets its own deadline (SCORER_TIMEOUTS_S[name], else SCORER_TIMEOUT_S)
+    counted from when it starts running; one still queued after that long
+    is given up. A scorer that raises or misses its deadline yields a
+    degraded FeatureScore instead of failing the whole request.
+    """
+    started = {name: _Started() for name in scorers}
+    futures: Dict[str, Future] = {
+        name: executor.submit(_timed, fn, started[name])
+        for name, (fn, _) in scorers.items()
+    }
+
+    results: Dict[str, FeatureScore] = {}
+    for name, future in futures.items():
+        weight = scorers[name][1]
+        timeout_s = settings.SCORER_TIMEOUTS_S.get(name, settings.SCORER_TIMEOUT_S)
+
+        if not started[name].event.wait(timeout_s) and future.cancel():
+            logger.warning("Scorer %s still queued after %gs", name, timeout_s)
+            results[name] = _degraded(
+                weight, "timeout", 0.0, f"not started within {timeout_s:g}s"
+            )
+            continue
+        start = started[name].at
+        remaining = max(0.0, start + timeout_s - time.perf_counter())
+
+        try:
+            score, elapsed_ms = future.result(timeout=remaining)
+        except FutureTimeout:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            logger.warning("Scorer %s timed out after %.0f ms", name, elapsed_ms)
+            results[name] = _degraded(
+                weight, "timeout", elapsed_ms, f"timed out after {timeout_s:g}s"
+            )
+            continue
+        except Exception as exc:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            logger.warning("Scorer %s failed", name, exc_info=True)
+            results[name] = _degraded(
+                weight, "error", elapsed_ms, f"{type(exc).__name__}: {exc}"
+            )
+            continue
+
+        results[name] = score.model_copy(update={"elapsed_ms": elapsed_ms})
+
+    return results
+
+
+def _final_score(scores: Dict[str, FeatureScore]) -> float:
+    """
+    Sum of contributions, rescaled so degraded features' weight is spread
+    over the ones that succeeded.
+    """
+    total_weight = sum(s.weight for s in scores.values())
+    ok_weight = sum(s.weight for s in scores.values() if s.status == "ok")
+    ok_sum = sum(s.contribution for s in scores.values() if s.status == "ok")
+    return float(rescale_to_total(ok_sum, ok_weight, total_weight))
+
+
+# ---------- main function ---------- #
+
 def compute_site_score(request: SiteScoreRequest) -> SiteScoreResponse:
     loc = request.location
     tr = request.time_range
 
-    # weights can come from settings (env vars / config)
-    w_cloud = settings.W_CLOUD
-    w_elev = settings.W_ELEVATION
-    w_road = settings.W_ROAD
-    w_grid = settings.W_GRID
-
-    cloud = compute_cloud_score(
+    # one context per site: geometry and fetches are shared by all scorers
+    ctx = SiteContext(
         lat=loc.lat,
         lon=loc.lon,
         radius_m=loc.radius_m,
         start_date=tr.start_date,
         end_date=tr.end_date,
-        weight=w_cloud,
     )
+    return _score_context(ctx)
 
-    elevation = compute_elevation_score(
-        lat=loc.lat,
-        lon=loc.lon,
-        radius_m=loc.radius_m,
-        weight=w_elev,
-    )
 
-    road = compute_road_access_score(
-        lat=loc.lat,
-        lon=loc.lon,
-        weight=w_road,
+def _score_context(
+    ctx: SiteContext, executor: ThreadPoolExecutor = _executor
+) -> SiteScoreResponse:
+    # weights can come from settings (env vars / config), see ScorerSpec.weight
+    scores = run_scorers(
+        {
+            name: (lambda spec=spec: spec.fn(ctx, spec.weight), spec.weight)
+            for name, spec in registered_scorers().items()
+        },
+        executor,
     )
 
-    grid = compute_grid_access_score(
-        lat=loc.lat,
-        lon=loc.lon,
-        weight=w_grid,
+    return SiteScoreResponse(
+        final_score=_final_score(scores),
+        cloud=scores.get("cloud"),
+        elevation=scores.get("elevation"),
+        road_access=scores.get("road_access"),
+        grid_access=scores.get("grid_access"),
+        features=scores,
+        degraded=[name for name, s in scores.items() if s.status != "ok"],
+        timings_ms={name: s.elapsed_ms or 0.0 for name, s in scores.items()},
     )
 
-    final_score = (
-        cloud.contribution
-        + elevation.contribution
-        + road.contribution
-        + grid.contribution
-    )
 
-    return SiteScoreResponse(
-        final_score=final_score,
-        cloud=cloud,
-        elevation=elevation,
-        road_access=road,
-        grid_access=grid,
+# ---------- batch scoring: many sites, one time range ---------- #
+
+# Batch workers block on their scorers, which run on a scorer pool of their
+# own with room for every batch worker's scorers at once
+_batch_executor = ThreadPoolExecutor(
+    max_workers=settings.SITE_BATCH_MAX_WORKERS, thread_name_prefix="site-batch"
+)
+_batch_scorer_executor = ThreadPoolExecutor(
+    max_workers=settings.SITE_BATCH_MAX_WORKERS * len(registered_scorers()),
+    thread_name_prefix="batch-scorer",
+)
+
+
+def group_sites(locations: Sequence[SiteLocation]) -> List[List[int]]:
+    """
+    Buckets site indices by a SITE_BATCH_GROUP_CELL_M grid cell, so sites
+    close enough to share catalogue results end up in the same group.
+    """
+    cell_deg = settings.SITE_BATCH_GROUP_CELL_M / EARTH_RADIUS_M * (180.0 / math.pi)
+    groups: Dict[Tuple[int, int], List[int]] = {}
+    for i, loc in enumerate(locations):
+        row = math.floor(loc.lat / cell_deg)
+        # cell width in degrees of longitude grows towards the poles
+        lon_cell = cell_deg / max(math.cos(math.radians((row + 0.5) * cell_deg)), 1e-6)
+        groups.setdefault((row, math.floor(loc.lon / lon_cell)), []).append(i)
+    return list(groups.values())
+
+
+def _union_bbox(locations: Sequence[SiteLocation]) -> Tuple[float, float, float, float]:
+    boxes = [circle_to_bbox(loc.lat, loc.lon, loc.radius_m) for loc in locations]
+    return (
+        min(b[0] for b in boxes),
+        min(b[1] for b in boxes),
+        max(b[2] for b in boxes),
+        max(b[3] for b in boxes),
     )
+
+
+def score_sites(
+    locations: Sequence[SiteLocation],
+    time_range: TimeRange,
+) -> Iterator[Tuple[int, Union[SiteScoreResponse, Exception]]]:
+    """
+    Scores many sites on the batch worker pool and yields (index, result)
+    as each site finishes, in completion order. A site that fails yields its
+    exception instead of stopping the batch.
+
+    Sites are submitted group by group (see group_sites); sites in a group
+    share one SiteGroup, so the catalogue is searched once per group. Process
+    API rasters are still fetched per site: the raster cache is keyed by the
+    exact request, which differs for every site. At most a few sites per
+    worker are in flight, so huge batches don't queue up front; closing the
+    iterator stops submitting new sites.
+    """
+    def contexts() -> Iterator[Tuple[int, SiteContext]]:
+        for indices in group_sites(locations):
+            group = SiteGroup(bbox=_union_bbox([locations[i] for i in indices]))
+            for i in indices:
+                loc = locations[i]
+                yield i, SiteContext(
+                    lat=loc.lat,
+                    lon=loc.lon,
+                    radius_m=loc.radius_m,
+                    start_date=time_range.start_date,
+                    end_date=time_range.end_date,
+                    group=group,
+                )
+
+    pending_sites = contexts()
+    in_flight: Dict[Future, int] = {}
+    max_in_flight = 4 * settings.SITE_BATCH_MAX_WORKERS
+
+    def submit_more() -> None:
+        while len(in_flight) < max_in_flight:
+            item = next(pending_sites, None)
+            if item is None:
+                return
+            future = _batch_executor.submit(
+                _score_context, item[1], _batch_scorer_executor
+            )
+            in_flight[future] = item[0]
+
+    try:
+        submit_more()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = in_flight.pop(future)
+                try:
+                    yield index, future.result()
+                except Exception as exc:
+                    logger.warning("Site %d failed", index, exc_info=True)
+                    yield index, exc
+            submit_more()
+    finally:
+        for future in in_flight:
+            future.cancel()
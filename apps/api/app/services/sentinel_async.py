@@ -0,0 +1,201 @@
+# app/services/sentinel_async.py
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.services.catalogue_cache import (
+    catalogue_cache,
+    contiguous_runs,
+    month_buckets,
+    select_features,
+    split_by_bucket,
+)
+from app.services.sentinel_client import (
+    RETRY_STATUSES,
+    S2_L2A_PRODUCT_TYPE,
+    backoff_delay,
+    client as sync_client,
+    parse_retry_after,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSentinelClient:
+    """
+    asyncio-native counterpart of SentinelClient, for use from the FastAPI
+    event loop without holding a worker thread per request.
+
+    Same public surface (search_s2_products / process_request), same
+    catalogue cache, retry policy and timeouts; all requests share one
+    httpx connection pool. OAuth tokens come from the sync client's
+    TokenManager, so the process holds a single token.
+    """
+
+    def __init__(self) -> None:
+        self.catalog_url = settings.CDS_CATALOG_URL
+        self.process_url = settings.CDS_PROCESS_URL
+
+        self.tokens = sync_client.tokens
+
+        self._http: Optional[httpx.AsyncClient] = None
+
+    # ------------------------ transport ------------------------ #
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        # created lazily so the pool binds to the running event loop
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.CDS_HTTP_POOL_SIZE,
+                    max_keepalive_connections=settings.CDS_HTTP_POOL_SIZE,
+                ),
+                timeout=httpx.Timeout(
+                    settings.CDS_PROCESS_TIMEOUT_S,
+                    connect=settings.CDS_CONNECT_TIMEOUT_S,
+                ),
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def _send(
+        self, method: str, url: str, read_timeout: float, **kwargs: Any
+    ) -> httpx.Response:
+        """Async version of SentinelClient._send (same retry policy)."""
+        timeout = httpx.Timeout(read_timeout, connect=settings.CDS_CONNECT_TIMEOUT_S)
+        max_retries = settings.CDS_HTTP_MAX_RETRIES
+
+        for attempt in range(max_retries + 1):
+            try:
+                r = await self.http.request(method, url, timeout=timeout, **kwargs)
+            except (httpx.TransportError, httpx.TimeoutException):
+                if attempt == max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(
+                    "%s %s failed, retrying in %.1fs", method, url, delay, exc_info=True
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            if r.status_code not in RETRY_STATUSES or attempt == max_retries:
+                return r
+
+            delay = backoff_delay(
+                attempt, parse_retry_after(r.headers.get("Retry-After"))
+            )
+            logger.warning(
+                "%s %s returned %s, retrying in %.1fs",
+                method,
+                url,
+                r.status_code,
+                delay,
+            )
+            await asyncio.sleep(delay)
+
+        raise AssertionError("unreachable")
+
+    # ------------------------ token handling ------------------------ #
+
+    async def _auth_headers(self) -> Dict[str, str]:
+        # fast path never blocks; a renewal runs in a worker thread
+        token = self.tokens.peek_token() or await asyncio.to_thread(
+            self.tokens.get_token
+        )
+        return {"Authorization": f"Bearer {token}"}
+
+    # ------------------------ HTTP helpers ------------------------ #
+
+    async def _authorized(
+        self, method: str, url: str, read_timeout: float, **kwargs: Any
+    ) -> httpx.Response:
+        headers = await self._auth_headers()
+        r = await self._send(method, url, read_timeout, headers=headers, **kwargs)
+
+        if r.status_code == 401:
+            self.tokens.invalidate(headers["Authorization"][len("Bearer ") :])
+            headers = await self._auth_headers()
+            r = await self._send(method, url, read_timeout, headers=headers, **kwargs)
+
+        r.raise_for_status()
+        return r
+
+    # ------------------------ public API ------------------------ #
+
+    async def _search_range(
+        self, geometry_wkt: str, start: date, end: date
+    ) -> List[Dict[str, Any]]:
+        page_size = settings.CDS_CATALOG_PAGE_SIZE
+        params: Dict[str, Any] = {
+            "startDate": f"{start.isoformat()}T00:00:00Z",
+            "completionDate": f"{end.isoformat()}T23:59:59Z",
+            "productType": S2_L2A_PRODUCT_TYPE,  # L2A
+            "geometry": geometry_wkt,
+            "maxRecords": page_size,
+            "page": 1,
+        }
+
+        features: List[Dict[str, Any]] = []
+        while True:
+            r = await self._authorized(
+                "GET", self.catalog_url, settings.CDS_CATALOG_TIMEOUT_S, params=params
+            )
+            page = r.json().get("features", [])
+            features.extend(page)
+            if len(page) < page_size:
+                return features
+            params["page"] += 1
+
+    async def search_s2_products(
+        self,
+        geometry_wkt: str,
+        start_date: str,
+        end_date: str,
+        max_records: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """See SentinelClient.search_s2_products."""
+        start = date.fromisoformat(start_date[:10])
+        end = date.fromisoformat(end_date[:10])
+
+        aoi_key = catalogue_cache.aoi_key(geometry_wkt, S2_L2A_PRODUCT_TYPE)
+        buckets = month_buckets(start, end)
+        found, missing = catalogue_cache.lookup(aoi_key, buckets)
+
+        runs = contiguous_runs(missing)
+        results = await asyncio.gather(
+            *(
+                self._search_range(geometry_wkt, run_start, run_end)
+                for run_start, run_end in runs
+            )
+        )
+        for (run_start, run_end), features in zip(runs, results):
+            run_buckets = [b for b in missing if run_start <= b[0] <= run_end]
+            by_bucket = split_by_bucket(features, run_buckets)
+            for bucket, bucket_features in by_bucket.items():
+                catalogue_cache.store(aoi_key, bucket, bucket_features)
+                found[bucket] = bucket_features
+
+        return select_features(found, start, end, max_records)
+
+    async def process_request(self, payload: Dict[str, Any]) -> bytes:
+        """Calls the /process endpoint and returns the raw response bytes."""
+        r = await self._authorized(
+            "POST", self.process_url, settings.CDS_PROCESS_TIMEOUT_S, json=payload
+        )
+        return r.content
+
+
+# Singleton instance to use from async code paths
+async_client = AsyncSentinelClient()
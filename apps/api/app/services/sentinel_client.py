@@ -2,17 +2,88 @@
 
 from __future__ import annotations
 
+import logging
+import random
+import time
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
 import requests
-from typing import Any, Dict, List, Optional, Tuple
+from requests.adapters import HTTPAdapter
 
 from app.core.config import settings
+from app.services.cdse_auth import TokenManager
+from app.services.catalogue_cache import (
+    catalogue_cache,
+    contiguous_runs,
+    month_buckets,
+    select_features,
+    split_by_bucket,
+)
+
+logger = logging.getLogger(__name__)
+
+S2_L2A_PRODUCT_TYPE = "S2MSI2A"
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+# ------------------------ retry helpers ------------------------ #
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Full-jitter exponential backoff for the given (0-based) retry attempt.
+    A server-provided Retry-After is treated as a lower bound.
+    """
+    cap = min(
+        settings.CDS_HTTP_BACKOFF_MAX_S, settings.CDS_HTTP_BACKOFF_BASE_S * 2**attempt
+    )
+    delay = random.uniform(0, cap)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _build_session() -> requests.Session:
+    """Session with a keep-alive connection pool sized for our worker threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=settings.CDS_HTTP_POOL_SIZE,
+        max_retries=0,  # retries are handled in SentinelClient._send
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
 
 class SentinelClient:
     """
     Minimal client for Copernicus Dataspace (CDSE) / Sentinel-2.
 
-    - Manages access + refresh tokens (handles 401 by refreshing)
+    - Manages access + refresh tokens through a TokenManager (refreshed
+      ahead of expiry; a 401 forces a refresh)
+    - Reuses pooled keep-alive connections and retries 429/5xx responses
+      with jittered exponential backoff
     - Exposes helper methods for catalogue search and process calls.
     """
 
@@ -25,107 +96,185 @@ class SentinelClient:
         self.catalog_url = settings.CDS_CATALOG_URL
         self.process_url = settings.CDS_PROCESS_URL
 
-        self._access_token: Optional[str] = None
-        self._refresh_token: Optional[str] = None
+        self._session = _build_session()
+
+        self.tokens = TokenManager(
+            request_token=self._request_token,
+            client_id=self.client_id,
+            username=self.username,
+            password=self.password,
+            refresh_margin_s=settings.CDS_TOKEN_REFRESH_MARGIN_S,
+            cache_path=settings.CDS_TOKEN_CACHE_PATH,
+        )
+
+    # ------------------------ transport ------------------------ #
+
+    def _send(
+        self, method: str, url: str, read_timeout: float, **kwargs: Any
+    ) -> requests.Response:
+        """
+        Sends a request over the pooled session. Connection errors, timeouts
+        and RETRY_STATUSES responses are retried up to CDS_HTTP_MAX_RETRIES
+        times; the last response (or error) is returned (or raised).
+        """
+        timeout = (settings.CDS_CONNECT_TIMEOUT_S, read_timeout)
+        max_retries = settings.CDS_HTTP_MAX_RETRIES
+
+        for attempt in range(max_retries + 1):
+            try:
+                r = self._session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(
+                    "%s %s failed, retrying in %.1fs", method, url, delay, exc_info=True
+                )
+                time.sleep(delay)
+                continue
+
+            if r.status_code not in RETRY_STATUSES or attempt == max_retries:
+                return r
+
+            delay = backoff_delay(
+                attempt, parse_retry_after(r.headers.get("Retry-After"))
+            )
+            logger.warning(
+                "%s %s returned %s, retrying in %.1fs",
+                method,
+                url,
+                r.status_code,
+                delay,
+            )
+            r.close()
+            time.sleep(delay)
+
+        raise AssertionError("unreachable")
 
     # ------------------------ token handling ------------------------ #
 
-    def _login(self) -> None:
-        resp = requests.post(
-            self.token_url,
-            data={
-                "client_id": self.client_id,
-                "username": self.username,
-                "password": self.password,
-                "grant_type": "password",
-            },
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        self._access_token = data["access_token"]
-        self._refresh_token = data.get("refresh_token")
-
-    def _refresh(self) -> None:
-        if not self._refresh_token:
-            # if no refresh token yet, just log in again
-            self._login()
-            return
-
-        resp = requests.post(
-            self.token_url,
-            data={
-                "client_id": self.client_id,
-                "grant_type": "refresh_token",
-                "refresh_token": self._refresh_token,
-            },
+    def _request_token(self, data: Dict[str, str]) -> Dict[str, Any]:
+        resp = self._send(
+            "POST", self.token_url, settings.CDS_TOKEN_TIMEOUT_S, data=data
         )
         resp.raise_for_status()
-        data = resp.json()
-        self._access_token = data["access_token"]
-        self._refresh_token = data.get("refresh_token")
+        return resp.json()
 
     def _auth_headers(self) -> Dict[str, str]:
-        if not self._access_token:
-            self._login()
-        assert self._access_token is not None
-        return {"Authorization": f"Bearer {self._access_token}"}
+        return {"Authorization": f"Bearer {self.tokens.get_token()}"}
+
+    def _invalidate(self, headers: Dict[str, str]) -> None:
+        self.tokens.invalidate(headers["Authorization"][len("Bearer ") :])
 
     # ------------------------ HTTP helpers ------------------------ #
 
-    def _authorized_get(self, url: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+    def _authorized_get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        timeout = timeout or settings.CDS_CATALOG_TIMEOUT_S
         headers = self._auth_headers()
-        r = requests.get(url, headers=headers, params=params)
+        r = self._send("GET", url, timeout, headers=headers, params=params)
 
         if r.status_code == 401:
-            self._refresh()
+            self._invalidate(headers)
             headers = self._auth_headers()
-            r = requests.get(url, headers=headers, params=params)
+            r = self._send("GET", url, timeout, headers=headers, params=params)
 
         r.raise_for_status()
         return r
 
-    def _authorized_post(self, url: str, payload: Dict[str, Any]) -> requests.Response:
+    def _authorized_post(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        timeout = timeout or settings.CDS_PROCESS_TIMEOUT_S
         headers = self._auth_headers()
-        r = requests.post(url, headers=headers, json=payload)
+        r = self._send("POST", url, timeout, headers=headers, json=payload)
 
         if r.status_code == 401:
-            self._refresh()
+            self._invalidate(headers)
             headers = self._auth_headers()
-            r = requests.post(url, headers=headers, json=payload)
+            r = self._send("POST", url, timeout, headers=headers, json=payload)
 
         r.raise_for_status()
         return r
 
     # ------------------------ public API ------------------------ #
 
+    def _search_range(
+        self, geometry_wkt: str, start: date, end: date
+    ) -> List[Dict[str, Any]]:
+        """
+        Runs one catalogue query for [start, end] and follows its pages until
+        a short page, so results are never truncated at maxRecords.
+        """
+        page_size = settings.CDS_CATALOG_PAGE_SIZE
+        params = {
+            "startDate": f"{start.isoformat()}T00:00:00Z",
+            "completionDate": f"{end.isoformat()}T23:59:59Z",
+            "productType": S2_L2A_PRODUCT_TYPE,  # L2A
+            "geometry": geometry_wkt,
+            "maxRecords": page_size,
+            "page": 1,
+        }
+
+        features: List[Dict[str, Any]] = []
+        while True:
+            r = self._authorized_get(
+                self.catalog_url, params=params, timeout=settings.CDS_CATALOG_TIMEOUT_S
+            )
+            page = r.json().get("features", [])
+            features.extend(page)
+            if len(page) < page_size:
+                return features
+            params["page"] += 1
+
     def search_s2_products(
         self,
         geometry_wkt: str,
         start_date: str,
         end_date: str,
-        max_records: int = 50,
+        max_records: Optional[int] = None,
     ) -> List[Dict[str, Any]]:
         """
         Query the Sentinel-2 L2A catalogue for a WKT geometry and time range.
-        Returns the list of 'features' from the catalogue JSON.
+        Returns the list of 'features' from the catalogue JSON, oldest first.
+
+        The range is split into calendar months per AOI; months already in
+        catalogue_cache are reused and only the missing ones are queried
+        (adjacent missing months in a single paginated query).
+        `max_records` optionally caps the number of returned features.
         """
-        params = {
-            "startDate": start_date,
-            "completionDate": end_date,
-            "productType": "S2MSI2A",  # L2A
-            "geometry": geometry_wkt,
-            "maxRecords": max_records,
-        }
-        r = self._authorized_get(self.catalog_url, params=params)
-        data = r.json()
-        return data.get("features", [])
+        start = date.fromisoformat(start_date[:10])
+        end = date.fromisoformat(end_date[:10])
+
+        aoi_key = catalogue_cache.aoi_key(geometry_wkt, S2_L2A_PRODUCT_TYPE)
+        buckets = month_buckets(start, end)
+        found, missing = catalogue_cache.lookup(aoi_key, buckets)
+
+        for run_start, run_end in contiguous_runs(missing):
+            run_buckets = [b for b in missing if run_start <= b[0] <= run_end]
+            features = self._search_range(geometry_wkt, run_start, run_end)
+            by_bucket = split_by_bucket(features, run_buckets)
+            for bucket, bucket_features in by_bucket.items():
+                catalogue_cache.store(aoi_key, bucket, bucket_features)
+                found[bucket] = bucket_features
+
+        return select_features(found, start, end, max_records)
 
     def process_request(self, payload: Dict[str, Any]) -> bytes:
         """
         Calls the /process endpoint with the given JSON payload and
         returns raw bytes (PNG) as in your Colab script.
         """
-        r = self._authorized_post(self.process_url, payload)
+        r = self._authorized_post(
+            self.process_url, payload, timeout=settings.CDS_PROCESS_TIMEOUT_S
+        )
         return r.content
 
 
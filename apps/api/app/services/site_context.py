@@ -0,0 +1,159 @@
+# app/services/site_context.py
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from datetime import date
+from functools import cached_property
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+import numpy as np
+from shapely.geometry import Polygon, shape
+
+from app.services.geometry import (
+    circle_to_bbox,
+    circle_to_polygon,
+    disk_mask,
+    to_local_m,
+)
+
+T = TypeVar("T")
+
+
+class _Memo:
+    __slots__ = ("lock", "done", "value")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.done = False
+        self.value: Any = None
+
+
+class _MemoStore:
+    """Keyed single-flight memo: the first caller computes, the others wait."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._memo: Dict[Hashable, _Memo] = {}
+
+    def fetch(self, key: Hashable, compute: Callable[[], T]) -> T:
+        with self._lock:
+            memo = self._memo.get(key)
+            if memo is None:
+                memo = self._memo[key] = _Memo()
+
+        with memo.lock:
+            if not memo.done:
+                memo.value = compute()
+                memo.done = True
+            return memo.value
+
+
+@dataclass(eq=False)
+class SiteGroup:
+    """
+    Nearby sites scored together (see score_sites). `bbox` covers all of
+    their circles, so one catalogue search over it serves every site;
+    `fetch` memoises such group-wide lookups like SiteContext.fetch.
+    """
+
+    bbox: Tuple[float, float, float, float]
+
+    _store: _MemoStore = field(default_factory=_MemoStore, init=False, repr=False)
+
+    def fetch(self, key: Hashable, compute: Callable[[], T]) -> T:
+        return self._store.fetch(key, compute)
+
+
+@dataclass(eq=False)
+class SiteContext:
+    """
+    Everything the feature scorers share for one site, computed once.
+
+    Geometry is derived lazily and cached on first use. `fetch` memoises
+    expensive lookups (rasters, catalogue searches, DEM windows) by key, with
+    single-flight semantics since scorers run concurrently: the first caller
+    computes, the others wait and reuse the result.
+    """
+
+    lat: float
+    lon: float
+    radius_m: float
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    group: Optional[SiteGroup] = None
+
+    _store: _MemoStore = field(default_factory=_MemoStore, init=False, repr=False)
+
+    # ------------------------ geometry ------------------------ #
+
+    @cached_property
+    def bbox(self) -> Tuple[float, float, float, float]:
+        """(min_lon, min_lat, max_lon, max_lat) around the circle."""
+        return circle_to_bbox(self.lat, self.lon, self.radius_m)
+
+    @cached_property
+    def aoi_geojson(self) -> Dict[str, Any]:
+        """Circle as a GeoJSON polygon in EPSG:4326."""
+        return circle_to_polygon(self.lat, self.lon, self.radius_m)
+
+    @cached_property
+    def aoi(self) -> Polygon:
+        """Circle as a shapely polygon in EPSG:4326."""
+        return shape(self.aoi_geojson)
+
+    @cached_property
+    def aoi_local(self) -> Polygon:
+        """Circle in local metres around the site centre (see to_local_m)."""
+        ring = np.asarray(self.aoi_geojson["coordinates"][0])
+        x, y = self.to_local(ring[:, 0], ring[:, 1])
+        return Polygon(np.column_stack([x, y]))
+
+    def to_local(
+        self, lon: np.ndarray, lat: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        return to_local_m(lon, lat, self.lon, self.lat)
+
+    def disk_mask(self, width: int, height: int) -> np.ndarray:
+        """Pixels of a (height, width) grid over `bbox` that fall in the circle."""
+        return disk_mask(width, height)
+
+    # ------------------------ shared fetches ------------------------ #
+
+    def fetch(self, key: Hashable, compute: Callable[[], T]) -> T:
+        """
+        Returns the memoised result for `key`, calling `compute` once.
+        Failures are not cached, so a later caller retries.
+        """
+        return self._store.fetch(key, compute)
+
+
+@dataclass(eq=False)
+class GridContext:
+    """
+    A heatmap grid: `width` × `height` cells over `bbox`, rows north → south
+    (the Process API layout). Shared by all layers like SiteContext is
+    shared by scorers.
+    """
+
+    bbox: Tuple[float, float, float, float]
+    width: int
+    height: int
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    # layer name -> why some of its cells have no data, set by the layers
+    partial: Dict[str, str] = field(default_factory=dict, init=False)
+
+    _store: _MemoStore = field(default_factory=_MemoStore, init=False, repr=False)
+
+    @cached_property
+    def cell_centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(lon, lat) of every cell centre, each (height, width)."""
+        minx, miny, maxx, maxy = self.bbox
+        lon = minx + (np.arange(self.width) + 0.5) * (maxx - minx) / self.width
+        lat = maxy - (np.arange(self.height) + 0.5) * (maxy - miny) / self.height
+        return np.meshgrid(lon, lat)
+
+    def fetch(self, key: Hashable, compute: Callable[[], T]) -> T:
+        return self._store.fetch(key, compute)
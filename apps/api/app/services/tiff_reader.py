@@ -0,0 +1,200 @@
+# app/services/tiff_reader.py
+
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+# Minimal baseline TIFF reader for Process API responses.
+#
+# PIL only understands TIFFs with 1–4 bands, while the multi-temporal
+# evalscripts return 2 bands per date. This reader handles what the
+# Process API produces: a single image, integer/float samples, strips or
+# tiles, uncompressed or deflate-compressed. The header helpers are also
+# used by the DEM reader (app/services/dem.py) on memory-mapped files.
+
+_TAG_IMAGE_WIDTH = 256
+_TAG_IMAGE_LENGTH = 257
+_TAG_BITS_PER_SAMPLE = 258
+_TAG_COMPRESSION = 259
+_TAG_STRIP_OFFSETS = 273
+_TAG_SAMPLES_PER_PIXEL = 277
+_TAG_ROWS_PER_STRIP = 278
+_TAG_STRIP_BYTE_COUNTS = 279
+_TAG_PLANAR_CONFIG = 284
+_TAG_PREDICTOR = 317
+_TAG_TILE_WIDTH = 322
+_TAG_TILE_LENGTH = 323
+_TAG_TILE_OFFSETS = 324
+_TAG_TILE_BYTE_COUNTS = 325
+_TAG_SAMPLE_FORMAT = 339
+
+_COMPRESSION_NONE = 1
+_COMPRESSION_DEFLATE = (8, 32946)
+
+# TIFF field type → (struct code, size in bytes)
+_FIELD_TYPES = {
+    1: ("B", 1),  # BYTE
+    2: ("c", 1),  # ASCII
+    3: ("H", 2),  # SHORT
+    4: ("I", 4),  # LONG
+    6: ("b", 1),  # SBYTE
+    7: ("B", 1),  # UNDEFINED
+    8: ("h", 2),  # SSHORT
+    9: ("i", 4),  # SLONG
+    11: ("f", 4),  # FLOAT
+    12: ("d", 8),  # DOUBLE
+    16: ("Q", 8),  # LONG8 (BigTIFF)
+}
+
+# SampleFormat → numpy kind
+_SAMPLE_KINDS = {1: "u", 2: "i", 3: "f"}
+
+
+def _read_ifd(raw: Any, order: str, offset: int) -> Dict[int, Tuple]:
+    (count,) = struct.unpack_from(order + "H", raw, offset)
+    tags: Dict[int, Tuple] = {}
+
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        tag, ftype, n = struct.unpack_from(order + "HHI", raw, entry)
+        if ftype not in _FIELD_TYPES:
+            continue
+        code, size = _FIELD_TYPES[ftype]
+        value_offset = entry + 8
+        if size * n > 4:
+            (value_offset,) = struct.unpack_from(order + "I", raw, value_offset)
+        tags[tag] = struct.unpack_from(f"{order}{n}{code}", raw, value_offset)
+
+    return tags
+
+
+def read_tiff_tags(raw: Any) -> Tuple[str, Dict[int, Tuple]]:
+    """
+    (byte order, tags of the first IFD) for a TIFF in any buffer (bytes,
+    mmap). BigTIFF is not supported.
+    """
+    if raw[:2] == b"II":
+        order = "<"
+    elif raw[:2] == b"MM":
+        order = ">"
+    else:
+        raise RuntimeError("Not a TIFF file")
+
+    (magic, ifd_offset) = struct.unpack_from(order + "HI", raw, 2)
+    if magic != 42:
+        raise RuntimeError(f"Unsupported TIFF variant (magic={magic})")
+
+    return order, _read_ifd(raw, order, ifd_offset)
+
+
+def sample_dtype(tags: Dict[int, Tuple], order: str) -> np.dtype:
+    bits = set(tags.get(_TAG_BITS_PER_SAMPLE, (1,)))
+    if len(bits) != 1:
+        raise RuntimeError(f"Mixed bits per sample are not supported: {sorted(bits)}")
+    (nbits,) = bits
+    if nbits % 8:
+        raise RuntimeError(f"Unsupported bits per sample: {nbits}")
+
+    kind = _SAMPLE_KINDS.get(tags.get(_TAG_SAMPLE_FORMAT, (1,))[0])
+    if kind is None:
+        raise RuntimeError(f"Unsupported sample format: {tags[_TAG_SAMPLE_FORMAT]}")
+
+    return np.dtype(f"{'<' if order == '<' else '>'}{kind}{nbits // 8}")
+
+
+def undo_predictor(block: np.ndarray, predictor: int) -> np.ndarray:
+    if predictor == 1:
+        return block
+    if predictor == 2 and block.dtype.kind in "ui":
+        # horizontal differencing along the row, wraps modulo the dtype
+        return np.cumsum(block, axis=1, dtype=block.dtype)
+    raise RuntimeError(f"Unsupported TIFF predictor: {predictor}")
+
+
+def decode_tiff(raw: bytes) -> np.ndarray:
+    """
+    Decodes the first image of a TIFF into an array of shape (bands, H, W).
+
+    For uncompressed, contiguously stored images the result is a read-only
+    view over `raw` (np.frombuffer), so no pixel data is copied.
+    """
+    order, tags = read_tiff_tags(raw)
+
+    width = tags[_TAG_IMAGE_WIDTH][0]
+    height = tags[_TAG_IMAGE_LENGTH][0]
+    bands = tags.get(_TAG_SAMPLES_PER_PIXEL, (1,))[0]
+    planar = tags.get(_TAG_PLANAR_CONFIG, (1,))[0]
+    compression = tags.get(_TAG_COMPRESSION, (_COMPRESSION_NONE,))[0]
+    predictor = tags.get(_TAG_PREDICTOR, (1,))[0]
+    dtype = sample_dtype(tags, order)
+
+    if compression != _COMPRESSION_NONE and compression not in _COMPRESSION_DEFLATE:
+        raise RuntimeError(f"Unsupported TIFF compression: {compression}")
+
+    # samples per stored pixel and number of separate planes
+    spp, planes = (bands, 1) if planar == 1 else (1, bands)
+
+    def block(offset: int, nbytes: int, rows: int, cols: int) -> np.ndarray:
+        if compression == _COMPRESSION_NONE:
+            buf = np.frombuffer(
+                raw, dtype=dtype, count=rows * cols * spp, offset=offset
+            )
+        else:
+            data = zlib.decompress(raw[offset : offset + nbytes])
+            buf = np.frombuffer(data, dtype=dtype, count=rows * cols * spp)
+        return undo_predictor(buf.reshape(rows, cols, spp), predictor)
+
+    if _TAG_TILE_OFFSETS in tags:
+        tw = tags[_TAG_TILE_WIDTH][0]
+        th = tags[_TAG_TILE_LENGTH][0]
+        offsets = tags[_TAG_TILE_OFFSETS]
+        counts = tags[_TAG_TILE_BYTE_COUNTS]
+        tiles_across = -(-width // tw)
+        tiles_down = -(-height // th)
+
+        out = np.empty((planes, height, width, spp), dtype=dtype)
+        for i, (off, nbytes) in enumerate(zip(offsets, counts)):
+            plane, rest = divmod(i, tiles_across * tiles_down)
+            ty, tx = divmod(rest, tiles_across)
+            y0, x0 = ty * th, tx * tw
+            tile = block(off, nbytes, th, tw)
+            rows = min(th, height - y0)
+            cols = min(tw, width - x0)
+            out[plane, y0 : y0 + rows, x0 : x0 + cols] = tile[:rows, :cols]
+    else:
+        offsets = tags[_TAG_STRIP_OFFSETS]
+        counts = tags[_TAG_STRIP_BYTE_COUNTS]
+        rows_per_strip = min(tags.get(_TAG_ROWS_PER_STRIP, (height,))[0], height)
+        strips_per_plane = -(-height // rows_per_strip)
+        plane_bytes = height * width * spp * dtype.itemsize
+
+        contiguous = all(
+            offsets[i] + counts[i] == offsets[i + 1] for i in range(len(offsets) - 1)
+        )
+        if (
+            compression == _COMPRESSION_NONE
+            and predictor == 1
+            and contiguous
+            and sum(counts) >= plane_bytes * planes
+        ):
+            # fast path: the whole image is one contiguous run of bytes
+            out = np.frombuffer(
+                raw, dtype=dtype, count=planes * height * width * spp, offset=offsets[0]
+            ).reshape(planes, height, width, spp)
+        else:
+            parts: List[np.ndarray] = []
+            for i, (off, nbytes) in enumerate(zip(offsets, counts)):
+                y0 = (i % strips_per_plane) * rows_per_strip
+                rows = min(rows_per_strip, height - y0)
+                parts.append(block(off, nbytes, rows, width))
+            out = np.concatenate(parts, axis=0).reshape(planes, height, width, spp)
+
+    if planar == 1:
+        # (1, H, W, bands) → (bands, H, W)
+        return out[0].transpose(2, 0, 1)
+    return out[..., 0]
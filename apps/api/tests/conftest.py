@@ -0,0 +1,5 @@
+import os
+
+# app.core.config requires the CDSE credentials; tests never reach CDSE
+os.environ.setdefault("CDS_USERNAME", "test")
+os.environ.setdefault("CDS_PASSWORD", "test")
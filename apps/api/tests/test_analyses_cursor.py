@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints.analyses import (
+    _decode_cursor,
+    _encode_cursor,
+    list_analyses,
+    list_analyses_page,
+)
+from app.core.database import Base
+from app.models.analysis import Analysis
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 17, 12, 30, 5, 123456, tzinfo=timezone.utc)
+
+    cursor = _encode_cursor(created_at, 42)
+
+    assert "=" not in cursor  # URL-safe without padding
+    assert _decode_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bnVsbA", "WzEsIDJd"])
+def test_invalid_cursor_is_a_400(cursor):
+    # "bnVsbA": JSON null; "WzEsIDJd": [1, 2], no timestamp
+    with pytest.raises(HTTPException) as exc_info:
+        _decode_cursor(cursor)
+
+    assert exc_info.value.status_code == 400
+
+
+def _page(session, **params):
+    params = {"limit": 100, "cursor": None, "fields": None} | params
+    return asyncio.run(list_analyses_page(db=session, **params))
+
+
+@pytest.fixture
+def session():
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    engine = create_async_engine("sqlite+aiosqlite://")
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session = AsyncSession(engine, expire_on_commit=False)
+        # several rows share a created_at, so the id breaks ties
+        session.add_all(
+            Analysis(
+                id=i + 1,
+                location_name=f"site {i}",
+                latitude=46.0,
+                longitude=23.0,
+                created_at=base + timedelta(minutes=i // 3),
+            )
+            for i in range(10)
+        )
+        await session.commit()
+        return session
+
+    session = asyncio.run(setup())
+    yield session
+    asyncio.run(session.close())
+    asyncio.run(engine.dispose())
+
+
+def test_pages_walk_every_row_newest_first(session):
+    seen = []
+    cursor = None
+    while True:
+        page = _page(session, limit=4, cursor=cursor)
+        seen += [(item.created_at, item.id) for item in page.items]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert [analysis_id for _, analysis_id in seen] == list(range(10, 0, -1))
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_last_page_has_no_cursor(session):
+    page = _page(session, limit=10)
+
+    assert len(page.items) == 10
+    assert page.next_cursor is None
+
+
+def test_plain_list_keeps_offset_pagination_by_id(session):
+    analyses = asyncio.run(list_analyses(skip=2, limit=3, db=session))
+
+    assert [analysis.id for analysis in analyses] == [3, 4, 5]
+
+
+def test_fields_projection_keeps_the_key(session):
+    page = _page(session, limit=2, fields="location_name")
+
+    assert page.items[0].model_dump(exclude_unset=True).keys() == {
+        "id",
+        "created_at",
+        "location_name",
+    }
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from app.schemas.site_score import FeatureScore
+from app.services.heatmap_service import combine_layers
+from app.services.scoring_service import _final_score
+
+WEIGHTS = {"cloud": 0.4, "elevation": 0.2, "infra": 0.4}
+
+
+def _feature(normalized, weight, status="ok"):
+    return FeatureScore(
+        raw_value=None,
+        normalized=normalized,
+        weight=weight,
+        contribution=normalized * weight,
+        status=status,
+    )
+
+
+def test_all_layers_give_the_weighted_sum():
+    layers = {
+        "cloud": np.array([[0.5, 1.0]]),
+        "elevation": np.array([[0.25, 0.0]]),
+        "infra": np.array([[1.0, 0.5]]),
+    }
+
+    score = combine_layers(layers, WEIGHTS)
+
+    expected = 0.4 * layers["cloud"] + 0.2 * layers["elevation"] + 0.4 * layers["infra"]
+    np.testing.assert_allclose(score, expected, rtol=1e-6)
+    assert score.dtype == np.float32
+
+
+def test_failed_layer_matches_the_site_score():
+    # the elevation scorer failed: its layer is missing from the heatmap and
+    # its feature is degraded in the site score
+    layers = {"cloud": np.array([[0.5]]), "infra": np.array([[1.0]])}
+    features = {
+        "cloud": _feature(0.5, 0.4),
+        "elevation": _feature(0.0, 0.2, status="error"),
+        "infra": _feature(1.0, 0.4),
+    }
+
+    score = combine_layers(layers, WEIGHTS)
+
+    assert score[0, 0] == pytest.approx(_final_score(features), rel=1e-6)
+    assert score[0, 0] == pytest.approx((0.2 + 0.4) * 1.0 / 0.8, rel=1e-6)
+
+
+def test_cells_without_data_are_rescaled_per_cell():
+    layers = {
+        "cloud": np.array([[0.5, np.nan, np.nan]]),
+        "elevation": np.array([[0.5, 0.5, np.nan]]),
+        "infra": np.array([[0.5, 1.0, np.nan]]),
+    }
+
+    score = combine_layers(layers, WEIGHTS)
+
+    assert score[0, 0] == pytest.approx(0.5)
+    assert score[0, 1] == pytest.approx((0.2 * 0.5 + 0.4 * 1.0) / 0.6)
+    assert np.isnan(score[0, 2])
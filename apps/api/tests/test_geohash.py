@@ -0,0 +1,108 @@
+import math
+
+import pytest
+
+from app.core import geohash
+from app.services.geometry import EARTH_RADIUS_M
+
+
+def _circle(lat, lon, radius_m, n=72):
+    """Points on a circle of `radius_m` (spherical destination formula)."""
+    d = radius_m / EARTH_RADIUS_M
+    phi1, lam1 = math.radians(lat), math.radians(lon)
+    for i in range(n):
+        theta = 2 * math.pi * i / n
+        phi2 = math.asin(
+            math.sin(phi1) * math.cos(d)
+            + math.cos(phi1) * math.sin(d) * math.cos(theta)
+        )
+        lam2 = lam1 + math.atan2(
+            math.sin(theta) * math.sin(d) * math.cos(phi1),
+            math.cos(d) - math.sin(phi1) * math.sin(phi2),
+        )
+        yield math.degrees(phi2), (math.degrees(lam2) + 180.0) % 360.0 - 180.0
+
+
+def test_encode_known_value():
+    assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_decode_bbox_contains_the_point():
+    lat, lon = 46.7712, 23.6236
+    min_lat, min_lon, max_lat, max_lon = geohash.decode_bbox(
+        geohash.encode(lat, lon, 7)
+    )
+
+    assert min_lat <= lat < max_lat
+    assert min_lon <= lon < max_lon
+
+
+def test_neighbors_are_adjacent_cells_of_the_same_size():
+    cell = geohash.encode(46.7712, 23.6236, 6)
+    min_lat, min_lon, max_lat, max_lon = geohash.decode_bbox(cell)
+
+    cells = geohash.neighbors(cell)
+
+    assert len(set(cells)) == 8 and cell not in cells
+    for other in cells:
+        o_min_lat, o_min_lon, o_max_lat, o_max_lon = geohash.decode_bbox(other)
+        assert len(other) == len(cell)
+        assert o_max_lat >= min_lat and o_min_lat <= max_lat
+        assert o_max_lon >= min_lon and o_min_lon <= max_lon
+
+
+@pytest.mark.parametrize(
+    "lat, lon, radius_m",
+    [
+        (46.7712, 23.6236, 50.0),
+        (46.7712, 23.6236, 1000.0),
+        (-33.8688, 151.2093, 25_000.0),
+        (0.0, 0.0, 100_000.0),
+        (64.1466, -21.9426, 5000.0),
+    ],
+)
+def test_covering_cells_cover_the_circle(lat, lon, radius_m):
+    cells = geohash.covering_cells(lat, lon, radius_m)
+
+    assert cells
+    assert len(cells[0]) == geohash.precision_for_radius(lat, radius_m)
+    for p_lat, p_lon in _circle(lat, lon, radius_m):
+        assert geohash.encode(p_lat, p_lon)[: len(cells[0])] in cells
+
+
+@pytest.mark.parametrize("lat, precision", [(62.0, 2), (80.0, 2), (-75.0, 3)])
+def test_covering_cells_at_high_latitude_from_a_cell_corner(lat, precision):
+    # centre in the poleward east corner of a cell, radius as wide as the
+    # cell at the centre's latitude: the circle is wider further poleward
+    cell = geohash.encode(lat, 10.3, precision)
+    min_lat, min_lon, max_lat, max_lon = geohash.decode_bbox(cell)
+    c_lat = max_lat - 1e-9 if lat > 0 else min_lat + 1e-9
+    c_lon = max_lon - 1e-9
+    _, w_deg = geohash.cell_size_deg(precision)
+    radius_m = math.radians(w_deg) * EARTH_RADIUS_M * math.cos(math.radians(c_lat))
+
+    cells = geohash.covering_cells(c_lat, c_lon, radius_m)
+
+    for p_lat, p_lon in _circle(c_lat, c_lon, radius_m, n=720):
+        assert geohash.encode(p_lat, p_lon)[: len(cells[0])] in cells
+
+
+def test_covering_cells_wrap_the_antimeridian():
+    cells = geohash.covering_cells(0.0, 179.9999, 1000.0)
+
+    for p_lat, p_lon in _circle(0.0, 179.9999, 1000.0):
+        assert geohash.encode(p_lat, p_lon)[: len(cells[0])] in cells
+
+
+def test_precision_shrinks_as_the_radius_grows():
+    precisions = [
+        geohash.precision_for_radius(46.0, r) for r in (10, 100, 1000, 10_000, 100_000)
+    ]
+
+    assert precisions == sorted(precisions, reverse=True)
+    assert precisions[0] > precisions[-1]
+
+
+def test_no_covering_cells_next_to_the_pole():
+    assert geohash.precision_for_radius(89.99, 100_000.0) == 0
+    assert geohash.covering_cells(89.99, 0.0, 100_000.0) == []
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from shapely.geometry import LineString, Point, Polygon
+
+from app.core.config import settings
+from app.services import infra_store
+from app.services.infra_index import ROADS, InfraIndex
+
+
+def _geometries():
+    rng = np.random.default_rng(1)
+    geometries = []
+    for _ in range(40):
+        lon, lat = rng.uniform(23.0, 23.4), rng.uniform(46.3, 46.6)
+        steps = rng.normal(0.0, 0.01, (5, 2)).cumsum(axis=0)
+        geometries.append(
+            LineString(np.column_stack([lon + steps[:, 0], lat + steps[:, 1]]))
+        )
+    geometries += [Point(23.2, 46.45), Point(23.05, 46.35)]
+    geometries.append(
+        Polygon([(23.3, 46.5), (23.31, 46.5), (23.31, 46.51), (23.3, 46.51)])
+    )
+    return geometries
+
+
+@pytest.fixture
+def geometries():
+    return _geometries()
+
+
+@pytest.fixture
+def flat_index(tmp_path, monkeypatch, geometries):
+    monkeypatch.setattr(infra_store, "load_geometries", lambda kind: geometries)
+    infra_store.build_kind(ROADS, str(tmp_path), cell_m=2000.0)
+    return infra_store.FlatInfraIndex(str(tmp_path / ROADS))
+
+
+def _query_points(n=300):
+    rng = np.random.default_rng(2)
+    return rng.uniform(22.9, 23.5, n), rng.uniform(46.2, 46.7, n)
+
+
+def test_matches_the_strtree(flat_index, geometries):
+    lon, lat = _query_points()
+
+    expected = InfraIndex(geometries).nearest_m(lon, lat)
+    got = flat_index.nearest_m(lon, lat)
+
+    assert np.isfinite(expected).all()
+    # the flat index stores coordinates at UNIT_M resolution
+    np.testing.assert_allclose(got, expected, atol=0.5)
+
+
+def test_small_query_budget_gives_the_same_distances(flat_index, monkeypatch):
+    lon, lat = _query_points(100)
+    expected = flat_index.nearest_m(lon, lat)
+
+    monkeypatch.setattr(settings, "INFRA_QUERY_MAX_BYTES", infra_store._PAIR_BYTES * 7)
+
+    np.testing.assert_array_equal(flat_index.nearest_m(lon, lat), expected)
+
+
+def test_points_beyond_the_search_radius_are_inf(flat_index, geometries):
+    lon, lat = _query_points()
+
+    expected = InfraIndex(geometries).nearest_m(lon, lat, max_distance_m=1000.0)
+    got = flat_index.nearest_m(lon, lat, max_distance_m=1000.0)
+
+    assert np.isinf(expected).any() and np.isfinite(expected).any()
+    np.testing.assert_array_equal(np.isinf(got), np.isinf(expected))
+    finite = np.isfinite(expected)
+    np.testing.assert_allclose(got[finite], expected[finite], atol=0.5)
+
+
+def test_keeps_the_query_shape(flat_index):
+    lon, lat = _query_points(12)
+
+    out = flat_index.nearest_m(lon.reshape(3, 4), lat.reshape(3, 4))
+
+    assert out.shape == (3, 4)
+    np.testing.assert_array_equal(out.ravel(), flat_index.nearest_m(lon, lat))
+
+
+def test_open_store_without_a_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INFRA_STORE_DIR", str(tmp_path))
+
+    assert infra_store.open_store(ROADS) is None
@@ -0,0 +1,61 @@
+from app.services.cloud_service import plan_scenes
+
+
+def _feature(product_id, start, title=None):
+    props = {"startDate": start}
+    if title is not None:
+        props["title"] = title
+    return {"id": product_id, "properties": props}
+
+
+def _title(tile, baseline="N0509", processed="20230105T120000"):
+    return f"S2A_MSIL2A_20230105T101234_{baseline}_R022_T{tile}_{processed}"
+
+
+def test_same_day_products_collapse_into_one_plan():
+    features = [
+        _feature("a", "2023-01-05T10:12:34.000Z", _title("34TFS")),
+        _feature("b", "2023-01-05T10:12:38.000Z", _title("34TGS")),
+        # reprocessed baseline of the first product
+        _feature(
+            "c",
+            "2023-01-05T10:12:34.000Z",
+            _title("34TFS", baseline="N0510", processed="20230301T080000"),
+        ),
+    ]
+
+    plans = plan_scenes(features)
+
+    assert len(plans) == 1
+    assert plans[0].day == "2023-01-05"
+    assert plans[0].product_ids == ["a", "b", "c"]
+    assert plans[0].tiles == ["34TFS", "34TGS"]
+
+
+def test_plans_are_chronological():
+    features = [
+        _feature("late", "2023-03-01T10:00:00Z"),
+        _feature("early", "2023-01-01T10:00:00Z"),
+        _feature("mid", "2023-02-01T10:00:00Z"),
+    ]
+
+    days = [p.day for p in plan_scenes(features)]
+    assert days == ["2023-01-01", "2023-02-01", "2023-03-01"]
+
+
+def test_duplicate_products_are_listed_once():
+    features = [_feature("a", "2023-01-05T10:00:00Z")] * 2
+
+    assert plan_scenes(features)[0].product_ids == ["a"]
+
+
+def test_features_without_a_start_date_are_skipped():
+    features = [
+        {"id": "x", "properties": {}},
+        _feature("y", ""),
+        {"id": "z", "properties": {"startdate": "2023-01-05T10:00:00Z"}},
+    ]
+
+    plans = plan_scenes(features)
+
+    assert [(p.day, p.product_ids) for p in plans] == [("2023-01-05", ["z"])]
@@ -0,0 +1,161 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from app.services.tiff_reader import decode_tiff
+
+_SAMPLE_FORMATS = {"u": 1, "i": 2, "f": 3}
+
+
+def _encode(block, compression, predictor):
+    if predictor == 2:
+        # horizontal differencing along each row, as the writer would
+        block = block.copy()
+        block[:, 1:] = block[:, 1:] - block[:, :-1]
+    data = np.ascontiguousarray(block).tobytes()
+    return zlib.compress(data) if compression == 8 else data
+
+
+def _make_tiff(
+    image,
+    compression=1,
+    predictor=1,
+    planar=1,
+    rows_per_strip=None,
+    tile=None,
+):
+    """Little-endian baseline TIFF of `image` (bands, H, W)."""
+    bands, height, width = image.shape
+    if planar == 1:
+        planes = [image.transpose(1, 2, 0)]  # (H, W, bands)
+    else:
+        planes = [band[:, :, None] for band in image]
+
+    blocks = []
+    for plane in planes:
+        if tile is None:
+            rows = rows_per_strip or height
+            for y0 in range(0, height, rows):
+                blocks.append(_encode(plane[y0 : y0 + rows], compression, predictor))
+        else:
+            th, tw = tile
+            for y0 in range(0, height, th):
+                for x0 in range(0, width, tw):
+                    padded = np.zeros((th, tw, plane.shape[2]), dtype=image.dtype)
+                    part = plane[y0 : y0 + th, x0 : x0 + tw]
+                    padded[: part.shape[0], : part.shape[1]] = part
+                    blocks.append(_encode(padded, compression, predictor))
+
+    offsets, pos = [], 8
+    for b in blocks:
+        offsets.append(pos)
+        pos += len(b)
+    counts = [len(b) for b in blocks]
+
+    entries = {
+        256: (3, [width]),
+        257: (3, [height]),
+        258: (3, [image.dtype.itemsize * 8] * bands),
+        259: (3, [compression]),
+        277: (3, [bands]),
+        284: (3, [planar]),
+        317: (3, [predictor]),
+        339: (3, [_SAMPLE_FORMATS[image.dtype.kind]] * bands),
+    }
+    if tile is None:
+        entries[273] = (4, offsets)
+        entries[278] = (4, [rows_per_strip or height])
+        entries[279] = (4, counts)
+    else:
+        entries[322] = (3, [tile[1]])
+        entries[323] = (3, [tile[0]])
+        entries[324] = (4, offsets)
+        entries[325] = (4, counts)
+
+    ifd_offset = pos
+    extra_offset = ifd_offset + 2 + 12 * len(entries) + 4
+    ifd = struct.pack("<H", len(entries))
+    extra = b""
+    for tag in sorted(entries):
+        field_type, values = entries[tag]
+        code = "H" if field_type == 3 else "I"
+        packed = struct.pack(f"<{len(values)}{code}", *values)
+        if len(packed) <= 4:
+            value = packed.ljust(4, b"\0")
+        else:
+            value = struct.pack("<I", extra_offset + len(extra))
+            extra += packed
+        ifd += struct.pack("<HHI", tag, field_type, len(values)) + value
+    ifd += struct.pack("<I", 0)
+
+    return b"II*\0" + struct.pack("<I", ifd_offset) + b"".join(blocks) + ifd + extra
+
+
+def _image(bands, height, width, dtype):
+    rng = np.random.default_rng(0)
+    if np.dtype(dtype).kind == "f":
+        return rng.random((bands, height, width)).astype(dtype)
+    info = np.iinfo(dtype)
+    return rng.integers(info.min, info.max, (bands, height, width), dtype=dtype)
+
+
+def test_uncompressed_single_strip():
+    image = _image(1, 10, 7, np.uint16)
+
+    out = decode_tiff(_make_tiff(image))
+
+    assert out.dtype == np.uint16
+    np.testing.assert_array_equal(out, image)
+
+
+def test_uncompressed_strips_are_a_view_over_the_input():
+    image = _image(3, 9, 5, np.uint8)
+
+    out = decode_tiff(_make_tiff(image, rows_per_strip=4))
+
+    np.testing.assert_array_equal(out, image)
+    assert not out.flags.writeable  # np.frombuffer over the raw bytes
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.int16, np.float32])
+def test_deflate_strips_with_several_bands(dtype):
+    image = _image(4, 11, 6, dtype)
+
+    out = decode_tiff(_make_tiff(image, compression=8, rows_per_strip=3))
+
+    assert out.dtype == dtype
+    np.testing.assert_array_equal(out, image)
+
+
+@pytest.mark.parametrize("compression", [1, 8])
+def test_tiles_cropped_at_the_image_edges(compression):
+    image = _image(2, 23, 37, np.uint16)
+
+    raw = _make_tiff(image, compression=compression, tile=(16, 16))
+
+    np.testing.assert_array_equal(decode_tiff(raw), image)
+
+
+def test_deflate_tiles_in_separate_planes():
+    image = _image(3, 20, 18, np.float32)
+
+    raw = _make_tiff(image, compression=8, planar=2, tile=(16, 16))
+
+    np.testing.assert_array_equal(decode_tiff(raw), image)
+
+
+def test_horizontal_predictor():
+    image = _image(2, 8, 9, np.int16)
+
+    raw = _make_tiff(image, compression=8, predictor=2, rows_per_strip=5)
+
+    np.testing.assert_array_equal(decode_tiff(raw), image)
+
+
+def test_unsupported_compression_raises():
+    raw = _make_tiff(_image(1, 4, 4, np.uint8), compression=5)
+
+    with pytest.raises(RuntimeError, match="compression"):
+        decode_tiff(raw)